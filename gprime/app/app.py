@@ -34,8 +34,14 @@ from passlib.hash import sha256_crypt as crypt
 from collections import defaultdict
 
 from .handlers import *
+from .handlers.imagehandler import (FileSystemCacher, ImageRenderer,
+                                    prewarm_media)
 from .forms import *
 from .forms.actionform import import_file
+from .executor import DatabaseExecutor
+from .jobs import JobQueue
+from .users import UserCache
+from .fragments import FragmentCache
 from ..db import DbTxn
 from ..version import VERSION
 
@@ -72,8 +78,15 @@ class GPrimeApp(Application):
         import gprime.const
         self.options = options
         self.prefix = self.options.prefix
-        self.user_data = {} # user to user_data map
+        self.users = UserCache(database)
+        self.fragments = FragmentCache(database)
         self.database = database
+        self.executor = DatabaseExecutor(database, options.db_workers)
+        self.jobs = JobQueue(database, options.site_dir, options.job_workers)
+        self.cacher = FileSystemCacher(
+            os.path.join(options.site_dir, "media", "cache"),
+            options.media_cache_size * 1024 * 1024)
+        self.renderer = ImageRenderer(self.cacher, options.image_workers)
         self.sitename = options.sitename
         settings = kwargs
         settings.update(self.default_settings())
@@ -108,6 +121,10 @@ class GPrimeApp(Application):
              LogoutHandler, "logout", self.make_env({})),
             (self.make_url(r'/action/?(.*)'),
              ActionHandler, "action", self.make_env({})),
+            (self.make_url(r'/job/(.*)/download'),
+             JobDownloadHandler, "job_download", self.make_env({})),
+            (self.make_url(r'/job/(.*)'),
+             JobHandler, "job", self.make_env({})),
             (self.make_url(r'/person/(.*)/name/(.*)/surname/(.*)'),
              SurnameHandler, "surname", self.make_env({})),
             (self.make_url(r'/person/(.*)/name/(.*)/?(.*)'),
@@ -141,6 +158,10 @@ class GPrimeApp(Application):
             })),
             (self.make_url(r"/json/"),
              JsonHandler, "json", self.make_env({})),
+            (self.make_url(r"/json/references/(.*)"),
+             ReferencesHandler, "references", self.make_env({})),
+            (self.make_url(r"/metrics"),
+             MetricsHandler, "metrics", self.make_env({})),
             (self.make_url(r"/data/(.*)"),
              StaticFileHandler, "data", {
                 'path': gprime.const.DATA_DIR,
@@ -187,64 +208,22 @@ class GPrimeApp(Application):
         return env
 
     def clear_user_data(self, user):
-        if user in self.user_data:
-            del self.user_data[user]
+        self.users.clear(user)
+
+    def get_user_data(self, user):
+        """
+        Return the cached data of the user (see UserCache).
+        """
+        return self.users.get(user)
 
     def get_translate_func(self, user):
-        from gprime.utils.locale import Locale, _
-        def func(*args, **kwargs):
-            if user not in self.user_data:
-                try:
-                    user_data = self.database.get_user_data(user)
-                except:
-                    user_data = {}
-                if user_data:
-                    self.user_data[user] = user_data
-                else:
-                    self.user_data[user] = {}
-            if "language" in self.user_data[user] and self.user_data[user]["language"]:
-                self.user_data[user]["glocale"] = Locale(lang=self.user_data[user]["language"])
-                self.user_data[user]["_"] = self.user_data[user]["glocale"].translation.gettext
-            else:
-                self.user_data[user]["language"] = "en"
-                self.user_data[user]["glocale"] = Locale
-                self.user_data[user]["_"] = _
-            return self.user_data[user]["_"](*args, **kwargs)
-        return func
+        return self.users.get(user)["_"]
 
     def get_css(self, user):
-        if user not in self.user_data:
-            try:
-                user_data = self.database.get_user_data(user)
-            except:
-                user_data = {}
-            if user_data:
-                self.user_data[user] = user_data
-            else:
-                self.user_data[user] = {}
-        if "css" in self.user_data[user]:
-            if not self.user_data[user]["css"]:
-                self.user_data[user]["css"] = "Web_Mainz.css"
-        else:
-            self.user_data[user]["css"] = "Web_Mainz.css"
-        return self.user_data[user]["css"]
+        return self.users.get(user)["css"]
 
     def get_permissions(self, user):
-        if user not in self.user_data:
-            try:
-                user_data = self.database.get_user_data(user)
-            except:
-                user_data = {}
-            if user_data:
-                self.user_data[user] = user_data
-            else:
-                self.user_data[user] = {}
-        if "permissions" in self.user_data[user]:
-            if not self.user_data[user]["permissions"]:
-                self.user_data[user]["permissions"] = set()
-        else:
-            self.user_data[user]["permissions"] = set()
-        return self.user_data[user]["permissions"]
+        return self.users.get(user)["permissions"]
 
     def can_add(self, user):
         return "add" in self.get_permissions(user)
@@ -410,6 +389,22 @@ def run_app():
            help="Show the version of gprime (%s)" % VERSION, type=bool)
     define("info", default=False,
            help="Show information about the database", type=bool)
+    define("db-workers", default=8,
+           help="Number of threads serving database requests", type=int)
+    define("job-workers", default=2,
+           help="Number of processes running reports, exports and imports",
+           type=int)
+    define("image-workers", default=4,
+           help="Number of processes rendering images", type=int)
+    define("media-cache-size", default=512,
+           help="Megabytes of rendered images kept in the media cache",
+           type=int)
+    define("prewarm-media", default=False,
+           help="Render the thumbnails of all media into the media cache",
+           type=bool)
+    define("set-serializer", default=None,
+           help="Convert the stored objects to this serializer (json, marshal)",
+           type=str)
     # Let's go!
     # Really, just need the config-file:
     tornado.options.parse_command_line()
@@ -558,6 +553,21 @@ def run_app():
                     else:
                         tornado.log.logging.warning("Media file not found: `%s`" % media.path)
                 database.set_mediapath(os.path.abspath(media_dir)) # relative or absolute
+    elif options.set_serializer:
+        options.server = False
+        database.set_serializer(options.set_serializer)
+        tornado.log.logging.info("Objects stored with the `%s` serializer" %
+                                 options.set_serializer)
+    elif options.prewarm_media:
+        options.server = False
+        database.set_mediapath(os.path.abspath(media_dir))
+        cacher = FileSystemCacher(media_cache_dir,
+                                  options.media_cache_size * 1024 * 1024)
+        count = prewarm_media(database, cacher,
+                              lambda media: get_image_path_from_media(database,
+                                                                      media))
+        tornado.log.logging.info("%s thumbnails added to the media cache" %
+                                 count)
     # Start server up, or exit:
     if not options.server:
         database.close()
@@ -584,7 +594,8 @@ def run_app():
     tornado.log.logging.info("    DATA_DIR = " + gprime.const.DATA_DIR)
     tornado.log.logging.info("    serving  = http://%s:%s%s" % (options.hostname, options.port, options.prefix))
     for key in ["port", "site_dir", "hostname", "sitename",
-                "debug", "xsrf", "config_file"]:
+                "debug", "xsrf", "config_file", "db_workers",
+                "job_workers", "image_workers", "media_cache_size"]:
         tornado.log.logging.info("    " + key + " = " + repr(getattr(options, key)))
     tornado.log.logging.info("Control+C twice to stop server. Running...")
     # Open up a browser window:
@@ -612,6 +623,9 @@ def run_app():
     except KeyboardInterrupt:
         tornado.log.logging.info("gPrime received interrupt...")
     tornado.log.logging.info("gPrime shutting down...")
+    app.executor.shutdown()
+    app.jobs.shutdown()
+    app.renderer.shutdown()
     if app.database:
         tornado.log.logging.info("gPrime closing database...")
         app.database.close()
@@ -36,6 +36,8 @@ class DictionaryDb(DbGeneric):
     """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Objects are already in memory, no need to cache their data:
+        self.set_cache_size(0)
             # Handle dicts:
         self._person_dict = {}
         self._family_dict = {}
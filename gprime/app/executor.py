@@ -0,0 +1,136 @@
+#
+# gPrime - a web-based genealogy program
+#
+# Copyright (c) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Run database work in a bounded pool of threads, off the IOLoop.
+"""
+
+## Python imports
+import time
+import threading
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.ioloop
+
+# Number of most recent jobs kept for the latency percentiles:
+LATENCY_SAMPLES = 1000
+
+def percentile(samples, fraction):
+    """
+    Return the value below which the fraction of the samples fall, or
+    0.0 without samples.
+    """
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+class DatabaseExecutor:
+    """
+    A pool of worker threads in which handlers run their database work,
+    so that a slow query does not hold up the requests of other users.
+
+    Backends that give each thread its own connection (threadsafe) run
+    jobs concurrently; writers are serialized by the database itself. On
+    other backends, jobs run one at a time.
+    """
+    def __init__(self, database, workers):
+        self.database = database
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers,
+                                       thread_name_prefix="gprime-db")
+        if getattr(getattr(database, "dbapi", None), "threadsafe", False):
+            self.job_lock = None
+        else:
+            self.job_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.waits = deque(maxlen=LATENCY_SAMPLES)
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def run(self, func, *args, **kwargs):
+        """
+        Return a future of func(*args, **kwargs), run in a worker thread.
+        """
+        with self.lock:
+            self.queued += 1
+        return tornado.ioloop.IOLoop.current().run_in_executor(
+            self.pool, functools.partial(self._run_job, time.perf_counter(),
+                                         func, *args, **kwargs))
+
+    def _run_job(self, submitted, func, *args, **kwargs):
+        started = time.perf_counter()
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+            self.waits.append(started - submitted)
+        failed = True
+        try:
+            if self.job_lock:
+                with self.job_lock:
+                    retval = func(*args, **kwargs)
+            else:
+                retval = func(*args, **kwargs)
+            failed = False
+            return retval
+        finally:
+            with self.lock:
+                self.running -= 1
+                if failed:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                self.latencies.append(time.perf_counter() - submitted)
+
+    def get_metrics(self):
+        """
+        Return a dictionary of the queue depth, job counts, and the
+        median and 99th percentile of the time jobs waited for a worker
+        and of their total latency, in milliseconds, over the last
+        LATENCY_SAMPLES jobs.
+        """
+        with self.lock:
+            waits = list(self.waits)
+            latencies = list(self.latencies)
+            metrics = {
+                "workers": self.workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+        metrics.update({
+            "wait_p50_ms": percentile(waits, 0.50) * 1000,
+            "wait_p99_ms": percentile(waits, 0.99) * 1000,
+            "latency_p50_ms": percentile(latencies, 0.50) * 1000,
+            "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+        })
+        return metrics
+
+    def shutdown(self):
+        """
+        Wait for the running jobs, and stop the worker threads.
+        """
+        self.pool.shutdown(wait=True)
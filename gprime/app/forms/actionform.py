@@ -26,9 +26,8 @@ import os
 from .forms import Form, Column, Row
 
 # Gramps imports:
-from gprime.cli.plug import BasePluginManager, run_report
+from gprime.cli.plug import BasePluginManager
 from ..dictionarydb import DictionaryDb
-from gprime.cli.user import User
 
 # Classes:
 class Action(object):
@@ -219,57 +218,17 @@ class ActionForm(Form):
         return action.name
 
     def run_action(self, action, handler):
+        """
+        Queue a job running the action with the options of the request,
+        and send the user to the page following its progress.
+        """
         options, options_help = self.get_plugin_options(action.handle)
         args = {}
         for key, default_value in options.items():
             args[key] = handler.get_argument(key)
-        if action.ptype == "Report":
-            output_file = "/tmp/%s.pdf" % action.name
-            clr = run_report(self.gramps_database,
-                             action.handle,
-                             username=self.handler.current_user,
-                             of=output_file,
-                             off="pdf", **args)
-            # can check for results with clr
-            if clr:
-                download_to_user(output_file, self.handler)
-            else:
-                handler.send_message("Error in report")
-                handler.redirect(self.handler.app.make_url("/action"))
-        elif action.ptype == "Import":
-            filename = upload(args["i"], "/tmp/%s-%s-%s.%s" % (str(profile.user.username),
-                                                                 str(handle),
-                                                                 timestamp(),
-                                                                 args["iff"]))
-            if filename is not None:
-                result = import_file(self.gramps_database, filename, User()) # callback
-                if result:
-                    handler.redirect(self.handler.app.make_url("/action"))
-                else:
-                    handler.send_message("Error in import")
-                    handler.redirect(self.handler.app.make_url("/action"))
-        elif action.ptype == "Export":
-            pmgr = BasePluginManager.get_instance()
-            pdata = pmgr.get_plugin(action.handle)
-            output_file = "/tmp/export." + pdata.extension
-            result = export_file(self.gramps_database, output_file, User()) # callback
-            if result:
-                download_to_user(output_file, self.handler)
-            else:
-                handler.send_message("Error in export")
-                handler.redirect(self.handler.app.make_url("/action"))
-
-def download_to_user(file_name, header, content_type='application/octet-stream'):
-    buf_size = 4096
-    header.set_header('Content-Type', content_type)
-    header.set_header('Content-Disposition', 'attachment; filename=' + os.path.basename(file_name))
-    with open(file_name, 'rb') as f:
-        while True:
-            data = f.read(buf_size)
-            if not data:
-                break
-            header.write(data)
-    header.finish()
+        job_id = handler.app.jobs.submit(handler.current_user, action.ptype,
+                                         action.handle, args)
+        handler.redirect(handler.app.make_url("/job/%s" % job_id))
 
 ## Copied from django-webapp; need to integrate:
 
@@ -29,6 +29,7 @@ import re
 from gprime.display.name import NameDisplay
 from gprime.datehandler import displayer, parser
 from gprime.simple import SimpleAccess
+from gprime.app.prefetch import Prefetcher
 from gprime.utils.id import create_id
 
 nd = NameDisplay().display
@@ -65,6 +66,9 @@ class Form(object):
     search_terms = {}
     link = None
     where = None
+    cursor = None
+    next_cursor = None
+    previous_cursor = None
     page_size = 25
     count_width = 5
     table = None
@@ -85,6 +89,7 @@ class Form(object):
         self.log = logging.getLogger(".Form")
         self.set_post_process_functions()
         self.sa = SimpleAccess(self.database)
+        self.prefetcher = None
         self.original_select_fields = self.select_fields
 
     def make_url(self, *parts):
@@ -144,12 +149,24 @@ class Form(object):
         records = self.rows.total
         matching = len(self.rows)
         total_pages = math.ceil(records / self.page_size)
+        # Next and previous pages are sought from the rows of this one,
+        # first and last are at a position:
+        if page > 1:
+            previous_query = self.make_query(page=page - 1,
+                                             cursor=self.previous_cursor)
+        else:
+            previous_query = self.make_query(page=1)
+        if page < total_pages:
+            next_query = self.make_query(page=page + 1,
+                                         cursor=self.next_cursor)
+        else:
+            next_query = self.make_query(page=page, cursor=self.cursor)
         return ("""<div align="center" style="background-color: lightgray; border: 1px solid black; border-radius:5px; margin: 0px 1px; padding: 1px;">""" +
                 self.make_button("<<", self.make_url(self.make_query(page=1))) +
                 " | " +
-                self.make_button("<", "/" + self.view + (self.make_query(page=max(page - 1, 1)))) +
+                self.make_button("<", "/" + self.view + previous_query) +
                 (" | <b>Page</b> %s of %s | " % (page, total_pages)) +
-                self.make_button(">", "/" + self.view + self.make_query(page=min(page + 1, total_pages))) +
+                self.make_button(">", "/" + self.view + next_query) +
                 " | " +
                 self.make_button(">>", "/" + self.view + self.make_query(page=total_pages)) +
                 (" | <b>Showing</b> %s/%s <b>of</b> %s <b>in</b> %.4g seconds" % (matching, records, total, round(self.rows.time, 4))) +
@@ -252,10 +269,19 @@ class Form(object):
             retval.append(field)
         return retval
 
-    def select(self, page=1, search=None):
+    def select(self, page=1, search=None, cursor=None):
+        """
+        Select the rows of a page. cursor, by default the cursor argument
+        of the request, is a token of the next or previous page (see
+        QuerySet.seek), which saves going through all the rows before
+        the page.
+        """
         self.page = page - 1
         self.search = search
         self.where = None
+        if cursor is None:
+            cursor = self.handler.get_argument("cursor", None)
+        self.cursor = cursor
         if search:
             select_fields, where = self.parse(search)
             if select_fields:
@@ -288,18 +314,24 @@ class Form(object):
         self.log.debug("where: " + str(self.where))
         self.log.debug("select: " + str(self.select_fields))
         queryset = self.database.get_queryset_by_table_name(self.table)
-        queryset.limit(start=self.page * self.page_size, count=self.page_size)
+        if cursor:
+            queryset.seek(cursor)
+            queryset.limit(count=self.page_size)
+        else:
+            queryset.limit(start=self.page * self.page_size,
+                           count=self.page_size)
         queryset.order_by = self.order_by
         queryset.where_by = self.where
         class Result(list):
             time = 0
             total = 0
         start_time = time.time()
-        self.rows = Result(queryset.select(*(self.get_select_fields() + self.env_fields)))
-        queryset = self.database.get_queryset_by_table_name(self.table)
-        queryset.where_by = self.where
-        self.rows.total = queryset.count()
+        rows, total = queryset.page(*(self.get_select_fields() + self.env_fields))
+        self.rows = Result(rows)
+        self.rows.total = total
         self.rows.time = time.time() - start_time
+        self.next_cursor = queryset.next_cursor
+        self.previous_cursor = queryset.previous_cursor
         return ""
 
     def get_select_fields(self):
@@ -630,6 +662,16 @@ class Form(object):
     def preview(self, text, env):
         return text[:100]
 
+    def get_prefetcher(self):
+        """
+        Return the Prefetcher of this request, having loaded the objects
+        that the tabs of the instance refer to.
+        """
+        if self.prefetcher is None or self.prefetcher.instance is not self.instance:
+            self.prefetcher = Prefetcher(self.database)
+            self.prefetcher.prefetch(self.instance)
+        return self.prefetcher
+
     def birth_date(self, person):
         return self.sa.birth_date(person)
 
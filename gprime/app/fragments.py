@@ -0,0 +1,95 @@
+#
+# gPrime - a web-based genealogy program
+#
+# Copyright (c) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Keep the HTML of the tabs of object pages, until the database signals a
+change to the objects they show.
+"""
+
+## Python imports
+import threading
+from collections import OrderedDict, defaultdict
+
+# Number of fragments kept:
+FRAGMENT_CACHE_SIZE = 5000
+
+# Object types, as in the names of the database signals:
+OBJECT_TYPES = ['person', 'family', 'event', 'place', 'source', 'citation',
+                'media', 'note', 'repository', 'tag']
+
+class FragmentCache:
+    """
+    A least-recently-used cache of HTML fragments.
+
+    Each object type has a generation, counting the add, update, delete
+    and rebuild signals of the type. A fragment's key includes the
+    generations of the types of the objects it shows, so a change to any
+    of them makes a new key, and the old fragment ages out.
+    """
+    def __init__(self, database, size=FRAGMENT_CACHE_SIZE):
+        self.size = size
+        self.lock = threading.Lock()
+        self.fragments = OrderedDict()
+        self.generations = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        for obj_type in OBJECT_TYPES:
+            for op in ['add', 'update', 'delete', 'rebuild']:
+                # callbacks must be functions or methods:
+                database.connect(obj_type + '-' + op,
+                                 lambda *args, obj_type=obj_type:
+                                 self.changed(obj_type))
+
+    def changed(self, obj_type):
+        with self.lock:
+            self.generations[obj_type] += 1
+
+    def get_generations(self, obj_types):
+        """
+        Return the generations of the object types, for a key.
+        """
+        with self.lock:
+            return tuple(self.generations[obj_type] for obj_type in obj_types)
+
+    def get(self, key):
+        """
+        Return the fragment of the key, or None.
+        """
+        with self.lock:
+            html = self.fragments.get(key)
+            if html is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.fragments.move_to_end(key)
+            return html
+
+    def put(self, key, html):
+        with self.lock:
+            self.fragments[key] = html
+            self.fragments.move_to_end(key)
+            while len(self.fragments) > self.size:
+                self.fragments.popitem(last=False)
+
+    def get_metrics(self):
+        with self.lock:
+            return {"fragments": len(self.fragments),
+                    "hits": self.hits,
+                    "misses": self.misses}
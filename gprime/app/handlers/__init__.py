@@ -22,8 +22,9 @@ from .handlers import *
 from .personhandler import PersonHandler
 from .familyhandler import FamilyHandler
 from .imagehandler import ImageHandler
-from .jsonhandler import JsonHandler
+from .jsonhandler import JsonHandler, ReferencesHandler
 from .actionhandler import ActionHandler
+from .jobhandler import JobHandler, JobDownloadHandler
 from .notehandler import NoteHandler
 from .citationhandler import CitationHandler
 from .eventhandler import EventHandler
@@ -18,13 +18,14 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
-from .handlers import BaseHandler
+from .handlers import BaseHandler, run_in_executor
 from ..forms.actionform import ActionForm, Action, Table
 
 import tornado.web
 
 class ActionHandler(BaseHandler):
     @tornado.web.authenticated
+    @run_in_executor
     def get(self, path=""):
         """
         HANDLE
@@ -68,6 +69,7 @@ class ActionHandler(BaseHandler):
                     )
 
     @tornado.web.authenticated
+    @run_in_executor
     def post(self, handle):
         _ = self.app.get_translate_func(self.current_user)
         # Use dict db for place to put Action Table:
@@ -20,6 +20,8 @@
 
 import tornado.web
 import sys
+import functools
+import threading
 import logging
 import hmac
 import json
@@ -28,9 +30,56 @@ from passlib.hash import sha256_crypt as crypt
 from gprime.utils.locale import Locale, _
 from gprime.const import VERSION
 
-template_functions = {}
-exec("from gprime.app.template_functions import *",
-     globals(), template_functions)
+# gprime.app is still being imported here, so the module is bound
+# directly rather than looked up as an attribute of the package:
+from gprime.app import template_functions as _template_functions
+
+# The names of template_functions, given to all templates through the
+# namespace of their loader, built once:
+template_functions = {name: value for (name, value)
+                      in vars(_template_functions).items()
+                      if not name.startswith("_")}
+
+def run_in_executor(method):
+    """
+    Decorator for handler methods that use the database: the method runs
+    in a worker thread of the app's DatabaseExecutor, and the IOLoop
+    serves other requests meanwhile.
+
+    RequestHandler is not thread-safe, so the worker thread only reads
+    the request, the database and the templates: the calls the method
+    makes that change the response (see held_in_worker), rendering one
+    included, are held back, and made on the IOLoop once the method is
+    done. The value of the method is returned to the awaiting coroutine.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        self.loop_thread = threading.get_ident()
+        self.held_calls = []
+        try:
+            retval = await self.app.executor.run(method, self, *args, **kwargs)
+            held_calls = self.held_calls
+        finally:
+            self.held_calls = None
+        for (name, call_args, call_kwargs) in held_calls:
+            getattr(self, name)(*call_args, **call_kwargs)
+        return retval
+    return wrapper
+
+def held_in_worker(name):
+    """
+    Return a method that calls the RequestHandler method of the name, or
+    holds the call back when made in a worker thread (see
+    run_in_executor).
+    """
+    def method(self, *args, **kwargs):
+        if self.in_worker():
+            self.held_calls.append((name, args, kwargs))
+            return None
+        return getattr(tornado.web.RequestHandler, name)(self, *args,
+                                                          **kwargs)
+    method.__name__ = name
+    return method
 
 class BaseHandler(tornado.web.RequestHandler):
     def __init__(self, *args, **kwargs):
@@ -38,12 +87,47 @@ class BaseHandler(tornado.web.RequestHandler):
         self.database = None
         self.sitename = None
         self.opts = None
+        self.loop_thread = None
+        self.held_calls = None
         for name in ["database", "sitename", "opts", "app"]:
             if name in kwargs:
                 setattr(self, name, kwargs[name])
                 del kwargs[name]
         super().__init__(*args, **kwargs)
 
+    def in_worker(self):
+        """
+        Return True in the worker thread of a run_in_executor method.
+        """
+        return (self.held_calls is not None and
+                threading.get_ident() != self.loop_thread)
+
+    # The methods that change the response:
+    set_status = held_in_worker("set_status")
+    set_header = held_in_worker("set_header")
+    add_header = held_in_worker("add_header")
+    clear_header = held_in_worker("clear_header")
+    set_cookie = held_in_worker("set_cookie")
+    clear_cookie = held_in_worker("clear_cookie")
+    clear_all_cookies = held_in_worker("clear_all_cookies")
+    clear = held_in_worker("clear")
+    write = held_in_worker("write")
+    flush = held_in_worker("flush")
+    redirect = held_in_worker("redirect")
+    send_error = held_in_worker("send_error")
+    finish = held_in_worker("finish")
+
+    def render(self, template_name, **kwargs):
+        if self.in_worker():
+            # the template, which reads the database, is rendered here,
+            # and the page sent on the IOLoop; the modules of the
+            # templates (xsrf_form_html) add no JavaScript or CSS that
+            # render() would insert:
+            html = self.render_string(template_name, **kwargs)
+            self.held_calls.append(("finish", (html,), {}))
+            return None
+        return super().render(template_name, **kwargs)
+
     def get_template_namespace(self):
         ns = super(BaseHandler, self).get_template_namespace()
         ns['_T_'] = lambda *x: '"{0}"'.format(ns['_'](*x))
@@ -64,6 +148,7 @@ class BaseHandler(tornado.web.RequestHandler):
         return user
 
     def get_template_dict(self, **kwargs):
+        user_data = self.app.get_user_data(self.current_user)
         dict = {
             "database": self.database,
             "menu": [],
@@ -71,17 +156,21 @@ class BaseHandler(tornado.web.RequestHandler):
             "user": self.current_user,
             "sitename": self.sitename,
             "opts": self.opts,
-            "css_theme": self.app.get_css(self.current_user),
-            "_": self.app.get_translate_func(self.current_user),
+            "css_theme": user_data["css"],
+            "_": user_data["_"],
             "gprime_version": VERSION,
             "messages": self.get_messages(),
             "next": self.get_argument("next", None),
             "make_url": self.make_url
         }
-        dict.update(template_functions)
         dict.update(kwargs)
         return dict
 
+    def create_template_loader(self, template_path):
+        loader = super().create_template_loader(template_path)
+        loader.namespace.update(template_functions)
+        return loader
+
     def make_url(self, url):
         return self.app.make_url(url)
 
@@ -126,6 +215,7 @@ class BaseHandler(tornado.web.RequestHandler):
 
 class HomeHandler(BaseHandler):
     @tornado.web.authenticated
+    @run_in_executor
     def get(self):
         self.render('home.html', **self.get_template_dict())
 
@@ -133,6 +223,7 @@ class LoginHandler(BaseHandler):
     def get(self):
         self.render('login.html',
                     **self.get_template_dict())
+    @run_in_executor
     def post(self):
         getusername = self.get_argument("username")
         getpassword = self.get_argument("password")
@@ -150,6 +241,21 @@ class LogoutHandler(BaseHandler):
         self.redirect(self.get_argument("next",
                                         self.reverse_url("main")))
 
+class MetricsHandler(BaseHandler):
+    """
+    Report the load of the database executor, of the image renderer,
+    and the use of the fragment cache, as JSON.
+    """
+    @tornado.web.authenticated
+    def get(self):
+        if not self.app.is_admin(self.current_user):
+            raise tornado.web.HTTPError(403)
+        metrics = self.app.executor.get_metrics()
+        metrics["images"] = self.app.renderer.get_metrics()
+        metrics["fragments"] = self.app.fragments.get_metrics()
+        self.set_header('Content-Type', 'application/json')
+        self.write(json.dumps(metrics))
+
 class My404Handler(BaseHandler):
     # Override prepare() instead of get() to cover all possible HTTP methods.
     def prepare(self):
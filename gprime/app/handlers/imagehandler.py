@@ -30,9 +30,27 @@ import glob
 import hashlib
 import io
 import re
+import logging
+import datetime
+import tempfile
+import threading
+import asyncio
+import functools
+import email.utils
+import multiprocessing
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
 from PIL import Image
 
-from .handlers import BaseHandler
+from .handlers import BaseHandler, run_in_executor
+
+LOG = logging.getLogger(".imageserver")
+
+# encoding param for PIL
+JPEG_QUALITY = 90
+
+# Bytes sent at a time when streaming an image:
+IMAGE_CHUNK_SIZE = 64 * 1024
 
 class Abort(Exception):
     """
@@ -603,66 +621,333 @@ class FileSystemResolver(object):
                 raise Abort404(identifier.make_error_message("Image Not Found"))
 
 class FileSystemCacher(object):
-    def __init__(self, app):
-        self.application = app
-        self.directory = app.config.CACHEDIR
+    """
+    Renderings of images, and their info.json, kept in files of the cache
+    directory up to max_size bytes in all; the least recently used are
+    removed to make room for new ones.
 
-    def cache(self, path, data):
-        (dirp, filep) = os.path.split(path)
-        paths = dirp.split(os.sep)
+    A rendering is stored under a key made from the canonical IIIF path
+    and the name, modification time and size of the source image, so a
+    changed image gets new keys and its old renderings age out.
+    """
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # key -> size, least recent first
+        self.size = 0
+        self.load()
 
-        for p in range(1,len(paths)+1):
-            pth = os.path.join(self.directory, *paths[:p])
-            if not os.path.exists(pth):
-                os.makedirs(pth, exist_ok=True)
+    KEY_RE = re.compile("^[0-9a-f]{40}$")
 
-        if not path.startswith(self.directory):
-            path = os.path.join(self.directory, path)
+    def load(self):
+        """
+        Find the renderings already in the cache directory; other files
+        (from older versions, or writes cut short) are removed.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for (dirpath, dirnames, filenames) in os.walk(self.directory,
+                                                      topdown=False):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                key = os.path.relpath(path, self.directory).replace(os.sep, "")
+                if (self.KEY_RE.match(key) and
+                        path == self.get_filename(key)):
+                    stat = os.stat(path)
+                    found.append((stat.st_mtime, key, stat.st_size))
+                else:
+                    os.remove(path)
+            if dirpath != self.directory and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+        for (mtime, key, size) in sorted(found):
+            self.entries[key] = size
+            self.size += size
+        self.remove(self.evict())
+
+    def make_key(self, filename, source, path):
+        """
+        Return the key of the rendering at the IIIF path of the image
+        file filename, whose os.stat() is source.
+        """
+        data = "%s\n%s\n%s\n%s" % (path, filename, source.st_mtime_ns,
+                                     source.st_size)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
 
-        fh = open(path, 'wb')
-        fh.write(data)
-        fh.close()
+    def get_filename(self, key):
+        return os.path.join(self.directory, key[:2], key[2:])
 
-    def exists(self, path):
-        if not path.startswith(self.directory):
-            path = os.path.join(self.directory, path)
-        return os.path.exists(path)
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
 
-    def fetch(self, path):
-        if not path.startswith(self.directory):
-            path = os.path.join(self.directory, path)
-        fh = open(path, "rb")
-        data = fh.read()
-        fh.close()
-        return data
+    def open(self, key):
+        """
+        Return the cached rendering as an open binary file, or None.
+        """
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+        try:
+            return open(self.get_filename(key), "rb")
+        except FileNotFoundError:
+            with self.lock:
+                self.size -= self.entries.pop(key, 0)
+            return None
 
-    def generate_media_type(self, path):
-        if path.endswith("info.json"):
-            # Check request headers for application/ld+json
-            inacc = self.request.headers.get('Accept', '')
-            if inacc.find('ld+json') > -1:
-                mimetype = "application/ld+json"
-            else:
-                mimetype = "application/json"
-        else:
-            # Check in config.extensions
-            dotidx = path.rfind('.')
-            ext = path[dotidx+1:]
+    def cache(self, key, data):
+        """
+        Store the rendering data (bytes) under key.
+        """
+        write_file(self.get_filename(key), data)
+        self.add(key, len(data))
+
+    def add(self, key, size):
+        """
+        Count the file of size bytes written for key (by write_file).
+        """
+        with self.lock:
+            self.size += size - self.entries.pop(key, 0)
+            self.entries[key] = size
+            evicted = self.evict()
+        self.remove(evicted)
+
+    def evict(self):
+        """
+        Drop the least recently used entries over the budget, and
+        return their keys. Call with the lock held.
+        """
+        evicted = []
+        while self.entries and self.size > self.max_size:
+            (key, size) = self.entries.popitem(last=False)
+            self.size -= size
+            evicted.append(key)
+        return evicted
+
+    def remove(self, keys):
+        for key in keys:
             try:
-                mimetype = self.application.config.extensions[ext]
-            except:
-                raise Abort400("Unsupported format: {0}".format(ext))
-        return mimetype
-
-    def send_file(self, path, mt="", status=200):
-        if not path.startswith(self.directory):
-            path = os.path.join(self.directory, path)
-        if not mt:
-            mt = self.generate_media_type(path)
-        fh = open(path, "rb")
-        data = fh.read()
-        fh.close()
-        return self.application.send(data, status=status, ct=mt)
+                os.remove(self.get_filename(key))
+            except FileNotFoundError:
+                pass
+
+def write_file(filename, data):
+    """
+    Write data (bytes) to filename, aside first, so that readers never
+    see part of the file.
+    """
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    (fd, tmp) = tempfile.mkstemp(dir=os.path.dirname(filename), prefix=".")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, filename)
+
+def render_image(image, box, size, mirror, rotation, quality, nformat,
+                 jpeg_quality):
+    """
+    Return the bytes of the region box (x, y, w, h) of image, resized to
+    size (w, h), mirrored, rotated clockwise by rotation degrees, in the
+    quality and PIL format nformat.
+
+    Raises SystemError for regions outside the image, and IOError for
+    modes that can't be saved in the format.
+    """
+    (x, y, w, h) = box
+    if (w, h) != image.size:
+        image = image.crop((x, y, x + w, y + h))
+    if size != (w, h):
+        image = image.resize(size)
+    if mirror:
+        image = image.transpose(Image.FLIP_LEFT_RIGHT)
+    if rotation != 0:
+        # NB Rotation in PIL can introduce extra pixels on edges, even for square
+        # PIL is counter-clockwise, so need to reverse
+        image = image.rotate(360 - rotation, expand=1)
+    if quality != 'default':
+        nquality = {'color':'RGB','gray':'L','bitonal':'1'}[quality]
+        image = image.convert(nquality)
+    # Can't save alpha mode in jpeg
+    if nformat == 'JPEG' and image.mode == 'P':
+        image = image.convert('RGB')
+    output = io.BytesIO()
+    image.save(output, format=nformat, quality=jpeg_quality)
+    return output.getvalue()
+
+# Widths of the thumbnails of Form.get_media, as used by the person and
+# media pages:
+THUMBNAIL_WIDTHS = [150]
+
+def get_thumbnail(identifier, image_size, width, rect=None):
+    """
+    Return the canonical IIIF path, region box and size of the thumbnail
+    of the given width that ImageHandler makes for the URL of
+    Form.get_media; rect is (x1, y1, x2, y2) in percents, or None for
+    the whole image. Return None for regions ImageHandler rejects.
+    """
+    (imageW, imageH) = image_size
+    if rect:
+        (x1, y1, x2, y2) = rect
+        x = int(x1 / 100.0 * imageW)
+        y = int(y1 / 100.0 * imageH)
+        w = int((x2 - x1) / 100.0 * imageW)
+        h = int((y2 - y1) / 100.0 * imageH)
+        if x > imageW or y > imageH or w < 1 or h < 1:
+            return None
+        w = min(w, imageW - x)
+        h = min(h, imageH - y)
+    else:
+        (x, y, w, h) = (0, 0, imageW, imageH)
+    if x == 0 and y == 0 and w == imageW and h == imageH:
+        region = "full"
+    else:
+        region = "{0},{1},{2},{3}".format(x, y, w, h)
+    sizeH = int(h * (width / float(w)))
+    if (width == imageW and sizeH == imageH) or (w == width and h == sizeH):
+        size = "full"
+    else:
+        size = "{0},".format(width)
+    path = "/".join([urllib.parse.quote(identifier, ''), region, size, "0",
+                     "default.jpg"])
+    return (path, (x, y, w, h), (width, sizeH))
+
+def render_file(filename, cache_file, box, size, mirror, rotation, quality,
+                nformat, jpeg_quality, degrade=None):
+    """
+    Render the image file (see render_image), write the result to
+    cache_file, and return it. degrade is the (width, height) and
+    quality, if any, of the degraded image; the region box is of the
+    degraded image then.
+
+    Runs in a worker process of ImageRenderer.
+    """
+    with Image.open(filename) as image:
+        if degrade:
+            (degraded_size, degraded_quality) = degrade
+            if degraded_size:
+                image = image.resize(degraded_size)
+            if degraded_quality:
+                image = image.convert({'gray':'L',
+                                       'bitonal':'1'}[degraded_quality])
+        elif image.format == "JPEG" and size[0] < box[2] and size[1] < box[3]:
+            # Let the decoder scale down by 1/2, 1/4 or 1/8, as long as
+            # the region stays larger than the size asked for:
+            (imageW, imageH) = image.size
+            (x, y, w, h) = box
+            image.draft(image.mode, (imageW * size[0] // w + 1,
+                                     imageH * size[1] // h + 1))
+            if image.size != (imageW, imageH):
+                scaleW = image.size[0] / imageW
+                scaleH = image.size[1] / imageH
+                box = (int(x * scaleW), int(y * scaleH),
+                       max(1, int(w * scaleW)), max(1, int(h * scaleH)))
+        data = render_image(image, box, size, mirror, rotation, quality,
+                            nformat, jpeg_quality)
+    write_file(cache_file, data)
+    return data
+
+class ImageRenderer(object):
+    """
+    Render images in a pool of worker processes, into the cacher.
+
+    Requests for a rendering that is already under way share it: they
+    get the same future, and the image is rendered, and cached, once.
+    """
+    def __init__(self, cacher, workers):
+        self.cacher = cacher
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"))
+        self.lock = threading.Lock()
+        self.pending = {} # key -> future
+        self.rendered = 0
+        self.coalesced = 0
+
+    def render(self, key, filename, box, size, mirror=False, rotation=0,
+               quality="default", nformat="JPEG", jpeg_quality=JPEG_QUALITY,
+               degrade=None):
+        """
+        Return a concurrent.futures.Future of the bytes of the rendering
+        of the image file (see render_file) with the cache key.
+        """
+        with self.lock:
+            future = self.pending.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = self.pool.submit(render_file, filename,
+                                      self.cacher.get_filename(key), box,
+                                      size, mirror, rotation, quality,
+                                      nformat, jpeg_quality, degrade)
+            self.pending[key] = future
+            self.rendered += 1
+        # outside the lock, as it runs at once if future is done:
+        future.add_done_callback(functools.partial(self.done, key))
+        return future
+
+    def done(self, key, future):
+        with self.lock:
+            self.pending.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self.cacher.add(key, len(future.result()))
+
+    def get_metrics(self):
+        """
+        Return a dictionary of the renderings made, under way, and of
+        the requests that shared one under way.
+        """
+        with self.lock:
+            return {"rendered": self.rendered,
+                    "pending": len(self.pending),
+                    "coalesced": self.coalesced}
+
+    def shutdown(self):
+        """
+        Stop the worker processes, once their renderings are done.
+        """
+        self.pool.shutdown(wait=True)
+
+def prewarm_media(database, cacher, get_image_path, workers=None):
+    """
+    Render the thumbnails that Form.get_media shows for all media, and
+    for the regions of them used by people, which are not yet in the
+    cacher, in a pool of worker processes. get_image_path(media) gives
+    the file of a media. Return the number of thumbnails made.
+    """
+    rects = defaultdict(set)
+    for person in database.iter_people():
+        if person.media_list and person.media_list[0].rect:
+            rects[person.media_list[0].ref].add(tuple(person.media_list[0].rect))
+    renderer = ImageRenderer(cacher, workers)
+    futures = {}
+    for media in database.iter_media():
+        filename = get_image_path(media)
+        try:
+            source = os.stat(filename)
+            with Image.open(filename) as image:
+                image_size = image.size
+        except (OSError, ValueError):
+            continue
+        for rect in [None] + sorted(rects[media.handle]):
+            for width in THUMBNAIL_WIDTHS:
+                thumbnail = get_thumbnail(media.handle, image_size, width,
+                                          rect)
+                if not thumbnail:
+                    continue
+                (path, box, size) = thumbnail
+                key = cacher.make_key(filename, source, path)
+                if key not in cacher:
+                    futures[renderer.render(key, filename, box, size)] = filename
+    count = 0
+    for future in as_completed(futures):
+        try:
+            future.result()
+            count += 1
+        except Exception as exc:
+            LOG.warning("Can't render a thumbnail of `%s`: %s",
+                        futures[future], exc)
+    renderer.shutdown()
+    return count
 
 class Config(object):
     def __init__(self, info):
@@ -820,8 +1105,10 @@ class ImageHandler(BaseHandler):
         self.badcharRe= re.compile('[\[\]?@#/]')
 
         # encoding param for PIL
-        self.jpegQuality = 90
+        self.jpegQuality = JPEG_QUALITY
         self.identifiers = {}
+        # (filename, os.stat()) of the image of the request:
+        self.source = None
 
     def send_file(self, filename, mt, status=200):
         if not filename.startswith(self.CACHEDIR):
@@ -958,23 +1245,73 @@ class ImageHandler(BaseHandler):
                 'profile': 'http://iiif.io/api/auth/0/token'})
 
         data = json.dumps(info, sort_keys=True)
+        self.app.cacher.cache(self.make_key(infoId + "/info.json"),
+                              data.encode("utf-8"))
+        return info
 
+    def make_key(self, path):
+        """
+        Return the cache key of the IIIF path of the image of the request.
+        """
+        (filename, source) = self.source
+        return self.app.cacher.make_key(filename, source, path)
+
+    def set_cache_headers(self, key):
+        """
+        Set the validators of the rendering with the cache key, and
+        return True if the client has it already (the status is then
+        set to 304).
+        """
+        mtime = self.source[1].st_mtime
+        etag = '"%s"' % key
+        self.set_header("Etag", etag)
+        self.set_header("Last-Modified",
+                        datetime.datetime.fromtimestamp(
+                            mtime, datetime.timezone.utc))
+        self.set_header("Cache-Control", "private, no-cache")
+        if self.request.headers.get("If-None-Match"):
+            # as check_etag_header(), which reads the Etag header back,
+            # while in a worker thread it is not set yet:
+            not_modified = any(
+                tag == "*" or tag.replace("W/", "", 1) == etag
+                for tag in (tag.strip() for tag in self.request.headers[
+                    "If-None-Match"].split(",")))
+        else:
+            not_modified = False
+            since = self.request.headers.get("If-Modified-Since")
+            if since:
+                try:
+                    date = email.utils.parsedate_to_datetime(since)
+                    not_modified = int(mtime) <= date.timestamp()
+                except (TypeError, ValueError):
+                    pass
+        if not_modified:
+            self.set_status(304)
+        return not_modified
+
+    async def stream(self, data, mimetype):
+        """
+        Send the binary file data, a chunk at a time, and close it.
+        """
         try:
-            os.makedirs(os.path.join(self.CACHEDIR,infoId), exist_ok=True)
-        except OSError:
-            # directory already exists
-            pass
-        fh = open(os.path.join(self.CACHEDIR, infoId, 'info.json'), 'w')
-        fh.write(data)
-        fh.close()
-        return info
+            self.set_header("Content-Type", mimetype)
+            self.set_header("Content-Length", data.seek(0, io.SEEK_END))
+            data.seek(0)
+            while True:
+                chunk = data.read(IMAGE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.write(chunk)
+                await self.flush()
+        finally:
+            data.close()
 
     def watermark(self, image):
         # Do watermarking here
         return image
 
     @tornado.web.authenticated
-    def get(self, path):
+    async def get(self, path):
         """
         Path is an IIIF image server set of parameters:
 
@@ -988,6 +1325,28 @@ class ImageHandler(BaseHandler):
           format - default, ...
           type - jpg, gif, or tiff
 
+        """
+        found = await self.find_image(path)
+        if found:
+            (data, mimetype) = found
+            if isinstance(data, Future):
+                # rendered in a worker process, meanwhile the IOLoop
+                # and the executor serve other requests:
+                try:
+                    data = io.BytesIO(await asyncio.wrap_future(data))
+                except SystemError:
+                    return self.error_msg('size', 'Unsupported size... tile cannot extend outside image', status=501)
+                except IOError:
+                    return self.error_msg('format', 'Unsupported format for format', status=501)
+            await self.stream(data, mimetype)
+
+    @run_in_executor
+    def find_image(self, path):
+        """
+        Return the image asked for by path as (binary file, mimetype)
+        from the cache, or as (future of its bytes, mimetype) when it is
+        to be rendered; or None when the response is done (an error, a
+        redirect, or not modified).
         """
         # First check auth
         #if self.DEGRADE_IMAGES:
@@ -1027,6 +1386,10 @@ class ImageHandler(BaseHandler):
                 filename = self.get_image_file(undegraded)
                 if not filename:
                     return self.error_msg('identifier', 'Not found: {0}'.format(identifier), status=404)
+                try:
+                    self.source = (filename, os.stat(filename))
+                except OSError:
+                    return self.error_msg('identifier', 'Not found: {0}'.format(identifier), status=404)
         else:
             return self.error_msg("identifier", "Identifier unspecified", status=400)
 
@@ -1068,12 +1431,17 @@ class ImageHandler(BaseHandler):
                 # Block access to images
                 return self.error_msg('auth', 'Not authenticated', status=401)
 
-        if os.path.exists(self.CACHEDIR + fp):
+        key = self.make_key(fp)
+        data = self.app.cacher.open(key)
+        if data:
             # Will only ever be canonical, otherwise would redirect
             self.set_header('Link',
                             self.request.headers.get("Link", "") +
                             ', <{0}{1}>;rel="canonical"'.format(self.BASEPREF, fp))
-            return self.send_file(fp, mimetype)
+            if self.set_cache_headers(key):
+                data.close()
+                return
+            return (data, mimetype)
 
         if bits:
             region = bits.pop(0)
@@ -1086,14 +1454,17 @@ class ImageHandler(BaseHandler):
                         mt = "application/ld+json"
                     else:
                         mt = "application/json"
-                    if not os.path.exists(infoId +'/'+region):
-                        image = Image.open(filename)
-                        self.make_info(infoId, image)
-                        try:
-                            image.close()
-                        except:
-                            pass
-                    return self.send_file(infoId +'/' + region, mt)
+                    # not in the cache, as the early check found none
+                    image = Image.open(filename)
+                    info = self.make_info(infoId, image)
+                    try:
+                        image.close()
+                    except:
+                        pass
+                    if self.set_cache_headers(self.make_key(infoId + '/' + region)):
+                        return
+                    data = json.dumps(info, sort_keys=True)
+                    return (io.BytesIO(data.encode("utf-8")), mt)
                 else:
                     return self.error_msg("region", "Region invalid: {0}".format(region), status = 400)
         # else is caught by checking identifier in early cache check
@@ -1133,16 +1504,15 @@ class ImageHandler(BaseHandler):
 
         # MUCH quicker to load JSON than the image to find h/w
         # Does json already exist?
-        if os.path.exists(self.CACHEDIR+infoId):
+        fh = self.app.cacher.open(self.make_key(infoId + '/info.json'))
+        if fh:
             # load JSON info file or image?
-            fh = open(os.path.join(self.CACHEDIR, infoId, 'info.json'))
-            info = json.load(fh)
+            info = json.loads(fh.read().decode("utf-8"))
             fh.close()
-            image = None
         else:
             # Need to load it up for the first time!
-            image = Image.open(filename)
-            info = self.make_info(infoId, image)
+            with Image.open(filename) as image:
+                info = self.make_info(infoId, image)
         imageW = info['width']
         imageH = info['height']
 
@@ -1317,78 +1687,25 @@ class ImageHandler(BaseHandler):
         # Won't regenerate needlessly as earlier cache check would have found it
         # if we're canonical already
 
-        # And finally, process the image!
-        if image == None:
-            try:
-                image = Image.open(filename)
-            except IOError:
-                return self.error_msg('identifier', 'Unsupported format for base image', status=501)
+        key = self.make_key(fn)
+        if self.set_cache_headers(key):
+            return
 
+        # And finally, process the image! (see get)
         if identifier.endswith(self.DEGRADED_IDENTIFIER):
             if self.DEGRADED_SIZE > 0:
                 # resize max size
-                image = image.resize((info['width'], info['height']))
-            if self.DEGRADED_QUALITY:
-                nquality = {'gray':'L','bitonal':'1'}[self.DEGRADED_QUALITY]
-                image = image.convert(nquality)
-
-        if (w != info['width'] or h != info['height']):
-            box = (x,y,x+w,y+h)
-            image = image.crop(box)
-
-        if sizeW != w or sizeH != h:
-            image = image.resize((sizeW, sizeH))
-        if mirror:
-            image = image.transpose(Image.FLIP_LEFT_RIGHT)
-
-        if rot != 0:
-            # NB Rotation in PIL can introduce extra pixels on edges, even for square
-            # PIL is counter-clockwise, so need to reverse
-            rot = 360 - rot
-            try:
-                image = image.rotate(rot, expand=1)
-            except:
-                # old version of PIL without expand
-                segx = image.size[0]
-                segy = image.size[1]
-                angle = radians(rot)
-                rx = abs(segx * cos(angle)) + abs(segy * sin(angle))
-                ry = abs(segy * cos(angle)) + abs(segx * sin(angle))
-
-                bg = Image.new("RGB", (rx, ry), (0, 0, 0))
-                tx = int((rx - segx)/2)
-                ty = int((ry - segy)/2)
-                bg.paste(image, (tx ,ty, tx + segx, ty + segy))
-                image = bg.rotate(rot)
-
-        if quality != 'default':
-            nquality = {'color':'RGB','gray':'L','bitonal':'1'}[quality]
-            image = image.convert(nquality)
-
-        # Can't save alpha mode in jpeg
-        if nformat == 'JPEG' and image.mode == 'P':
-            image = image.convert('RGB')
-
-        output = io.BytesIO()
-        try:
-            image.save(output,format=nformat, quality=self.jpegQuality)
-        except SystemError:
-            return self.error_msg('size', 'Unsupported size... tile cannot extend outside image', status=501)
-        except IOError:
-            return self.error_msg('format', 'Unsupported format for format', status=501)
-        contents = output.getvalue()
-        output.close()
-
-        # Write to disk cache
-        for p in range(1,len(paths)):
-            pth = os.path.join(self.CACHEDIR, *paths[:p])
-            if not os.path.exists(pth):
-                os.makedirs(pth, exist_ok=True)
-        fh = open(self.CACHEDIR + fn, 'wb')
-        fh.write(contents)
-        fh.close()
-
-        return self.send(contents, ct=mimetype)
+                degrade = ((info['width'], info['height']),
+                           self.DEGRADED_QUALITY)
+            else:
+                degrade = (None, self.DEGRADED_QUALITY)
+        else:
+            degrade = None
+        return (self.app.renderer.render(key, filename, (x, y, w, h),
+                                         (sizeW, sizeH), mirror, rot,
+                                         quality, nformat, self.jpegQuality,
+                                         degrade),
+                mimetype)
 
     def noaccess(self):
         noacc = {"@context": "http://iiif.io/api/image/2/context.json",
@@ -0,0 +1,87 @@
+#
+# gPrime - a web-based genealogy program
+#
+# Copyright (c) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import os
+import json
+
+import tornado.web
+
+from .handlers import BaseHandler, run_in_executor
+from ..jobs import DONE
+
+# Bytes sent at a time when downloading the output of a job:
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+class JobHandler(BaseHandler):
+    """
+    Follow the progress of a job (see jobs.JobQueue), as a page, or as
+    JSON with format=json.
+    """
+    def get_job(self, job_id):
+        job = self.app.jobs.get(job_id)
+        if job is None:
+            raise tornado.web.HTTPError(404)
+        if (job["username"] != self.current_user and
+                not self.app.is_admin(self.current_user)):
+            raise tornado.web.HTTPError(403)
+        return job
+
+    @tornado.web.authenticated
+    @run_in_executor
+    def get(self, job_id):
+        _ = self.app.get_translate_func(self.current_user)
+        job = self.get_job(job_id)
+        if self.get_argument("format", None) == "json":
+            download = None
+            if job["status"] == DONE and job["output"]:
+                download = self.app.make_url("/job/%s/download" % job_id)
+            self.set_header('Content-Type', 'application/json')
+            self.write(json.dumps({"status": job["status"],
+                                   "progress": job["progress"],
+                                   "error": job["error"],
+                                   "download": download}))
+            return
+        self.render("job.html",
+                    **self.get_template_dict(tview=_("job"),
+                                             page=None,
+                                             job=job))
+
+class JobDownloadHandler(JobHandler):
+    """
+    Send the output of a job, a chunk at a time, letting the IOLoop
+    serve other requests in between.
+    """
+    @tornado.web.authenticated
+    async def get(self, job_id):
+        job = await self.app.executor.run(self.get_job, job_id)
+        if job["status"] != DONE or not job["output"]:
+            raise tornado.web.HTTPError(404)
+        self.set_header('Content-Type', 'application/octet-stream')
+        self.set_header('Content-Disposition',
+                        'attachment; filename=' +
+                        os.path.basename(job["output"]))
+        with open(job["output"], 'rb') as fp:
+            while True:
+                data = fp.read(DOWNLOAD_CHUNK_SIZE)
+                if not data:
+                    break
+                self.write(data)
+                await self.flush()
+        self.finish()
@@ -22,7 +22,7 @@ import tornado.web
 import simplejson
 import re
 
-from .handlers import BaseHandler
+from .handlers import BaseHandler, run_in_executor
 from gprime.lib.gendertype import GenderType
 
 class JsonHandler(BaseHandler):
@@ -30,11 +30,13 @@ class JsonHandler(BaseHandler):
     Process an Ajax/Json query request.
     """
     @tornado.web.authenticated
+    @run_in_executor
     def get(self):
         field = self.get_argument("field", None)
         query = self.get_argument("q", "").strip()
         page = int(self.get_argument("p", "1"))
         size = int(self.get_argument("s", "10"))
+        cursor = self.get_argument("c", None)
         if field in ["mother", "father"]:
             table = "Person"
             fields = ["primary_name.first_name",
@@ -100,19 +102,45 @@ class JsonHandler(BaseHandler):
         ## ------------
         self.log.debug("received json query: " + str(where))
         queryset = self.database.get_queryset_by_table_name(table)
-        queryset.limit(start=(page - 1) * size, count=size)
+        if cursor: # from "next" or "previous" of another page
+            queryset.seek(cursor)
+            queryset.limit(count=size)
+        else:
+            queryset.limit(start=(page - 1) * size, count=size)
         queryset.where_by = where
         queryset.order_by = order_by
-        class Result(list):
-            total = 0
-        rows = Result(queryset.select("handle", *return_fields))
-        queryset = self.database.get_queryset_by_table_name(table)
-        queryset.where_by = where
-        rows.total = queryset.count()
-        response_data = {"results": [], "total": rows.total}
+        rows, total = queryset.page("handle", *return_fields)
+        response_data = {"results": [], "total": total,
+                         "next": queryset.next_cursor,
+                         "previous": queryset.previous_cursor}
         for row in rows:
             name = return_pattern % row
             response_data["results"].append({"id": row["handle"], "name": name})
         self.set_header('Content-Type', 'application/json')
         self.log.debug("results: " + simplejson.dumps(response_data))
         self.write(simplejson.dumps(response_data))
+
+class ReferencesHandler(BaseHandler):
+    """
+    Return a page of the objects referencing an object, for the
+    References tab (see reference_table).
+    """
+    @tornado.web.authenticated
+    @run_in_executor
+    def get(self, handle):
+        from gprime.app.template_functions import get_reference_page
+        cursor = self.get_argument("c", None)
+        try:
+            rows, next_cursor = get_reference_page(self.database, self.app,
+                                                   handle, cursor)
+        except ValueError as exp:
+            raise tornado.web.HTTPError(400, str(exp))
+        response_data = {"rows": [{"type": obj_type,
+                                   "description": description,
+                                   "gid": gid,
+                                   "url": url}
+                                  for (obj_type, description, gid, url)
+                                  in rows],
+                         "next": next_cursor}
+        self.set_header('Content-Type', 'application/json')
+        self.write(simplejson.dumps(response_data))
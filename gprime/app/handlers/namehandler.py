@@ -20,12 +20,13 @@
 
 import tornado.web
 
-from .handlers import BaseHandler
+from .handlers import BaseHandler, run_in_executor
 from ..forms import NameForm
 from gprime.lib.name import Name
 
 class NameHandler(BaseHandler):
     @tornado.web.authenticated
+    @run_in_executor
     def get(self, handle, row, action):
         """
         """
@@ -49,6 +50,7 @@ class NameHandler(BaseHandler):
         return
 
     @tornado.web.authenticated
+    @run_in_executor
     def post(self, handle, row, action):
         _ = self.app.get_translate_func(self.current_user)
         if "/" in row:
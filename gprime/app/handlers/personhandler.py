@@ -25,11 +25,12 @@ import tornado.web
 import json
 import html
 
-from .handlers import BaseHandler
+from .handlers import BaseHandler, run_in_executor
 from ..forms import PersonForm
 
 class PersonHandler(BaseHandler):
     @tornado.web.authenticated
+    @run_in_executor
     def get(self, path=""):
         """
         person
@@ -95,6 +96,7 @@ class PersonHandler(BaseHandler):
         )
 
     @tornado.web.authenticated
+    @run_in_executor
     def post(self, path):
         """
         """
@@ -20,11 +20,12 @@
 
 import tornado.web
 
-from .handlers import BaseHandler
+from .handlers import BaseHandler, run_in_executor
 from ..forms import SettingsForm
 
 class SettingsHandler(BaseHandler):
     @tornado.web.authenticated
+    @run_in_executor
     def get(self, path=""):
         """
         """
@@ -35,6 +36,7 @@ class SettingsHandler(BaseHandler):
         return
 
     @tornado.web.authenticated
+    @run_in_executor
     def post(self, path=""):
         _ = self.app.get_translate_func(self.current_user)
         form = SettingsForm(self)
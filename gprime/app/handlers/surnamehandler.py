@@ -20,12 +20,13 @@
 
 import tornado.web
 
-from .handlers import BaseHandler
+from .handlers import BaseHandler, run_in_executor
 from ..forms import SurnameForm
 from gprime.lib.surname import Surname
 
 class SurnameHandler(BaseHandler):
     @tornado.web.authenticated
+    @run_in_executor
     def get(self, handle, name_row, surname_row):
         """
         """
@@ -49,6 +50,7 @@ class SurnameHandler(BaseHandler):
         return
 
     @tornado.web.authenticated
+    @run_in_executor
     def post(self, handle, name_row, surname_row):
         if "/" in surname_row:
             surname_row, action = surname_row.split("/")
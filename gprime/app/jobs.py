@@ -0,0 +1,330 @@
+#
+# gPrime - a web-based genealogy program
+#
+# Copyright (c) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Run reports, exports and imports as jobs in a pool of worker processes,
+so that the request that starts one returns at once.
+
+The state of the jobs is kept in a table of its own, in a sqlite file
+of the jobs folder of the site, which the worker processes update with
+their progress. Each job writes in a folder of its own, in the jobs
+folder.
+"""
+
+## Python imports
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import logging
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+LOG = logging.getLogger(".jobs")
+
+# Job states:
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Jobs, and their files, are removed after this many days:
+JOB_DAYS = 7
+
+# Columns of the job table:
+JOB_COLUMNS = ["id", "username", "ptype", "pid", "options", "cache_key",
+               "status", "progress", "output", "error", "created",
+               "finished"]
+
+class JobStore:
+    """
+    The table of jobs. Each call opens its own connection, so that the
+    server and the worker processes can share the file.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL;")
+            connection.execute("""CREATE TABLE IF NOT EXISTS job (
+                                      id VARCHAR(50) PRIMARY KEY,
+                                      username TEXT,
+                                      ptype TEXT,
+                                      pid TEXT,
+                                      options TEXT,
+                                      cache_key TEXT,
+                                      status TEXT,
+                                      progress INTEGER,
+                                      output TEXT,
+                                      error TEXT,
+                                      created REAL,
+                                      finished REAL);""")
+            connection.execute("""CREATE INDEX IF NOT EXISTS job_cache_key
+                                  ON job(cache_key);""")
+
+    @contextlib.contextmanager
+    def connect(self):
+        """
+        Return a connection, committed and closed at the end of the
+        with block.
+        """
+        connection = sqlite3.connect(self.filename, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def add(self, username, ptype, pid, options, cache_key=None):
+        """
+        Add a queued job, and return its id.
+        """
+        job_id = uuid.uuid4().hex
+        with self.connect() as connection:
+            connection.execute(
+                """INSERT INTO job (id, username, ptype, pid, options,
+                                    cache_key, status, progress, created)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?);""",
+                [job_id, username, ptype, pid, json.dumps(options),
+                 cache_key, QUEUED, time.time()])
+        return job_id
+
+    def update(self, job_id, **fields):
+        """
+        Set the given columns of a job.
+        """
+        names = sorted(fields)
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE job SET %s WHERE id = ?;" %
+                ", ".join(["%s = ?" % name for name in names]),
+                [fields[name] for name in names] + [job_id])
+
+    def get(self, job_id):
+        """
+        Return the job as a dictionary, or None if there is no such job.
+        """
+        with self.connect() as connection:
+            row = connection.execute(
+                "SELECT %s FROM job WHERE id = ?;" % ", ".join(JOB_COLUMNS),
+                [job_id]).fetchone()
+        if row:
+            job = dict(zip(JOB_COLUMNS, row))
+            job["options"] = json.loads(job["options"])
+            return job
+        return None
+
+    def find_result(self, cache_key):
+        """
+        Return the id of the most recent job done with the cache_key
+        whose output is still there, or None.
+        """
+        with self.connect() as connection:
+            rows = connection.execute(
+                """SELECT id, output FROM job
+                   WHERE cache_key = ? AND status = ?
+                   ORDER BY finished DESC;""",
+                [cache_key, DONE]).fetchall()
+        for (job_id, output) in rows:
+            if output and os.path.exists(output):
+                return job_id
+        return None
+
+    def fail_unfinished(self, error):
+        """
+        Mark the jobs that are queued or running as failed.
+        """
+        with self.connect() as connection:
+            connection.execute(
+                """UPDATE job SET status = ?, error = ?, finished = ?
+                   WHERE status IN (?, ?);""",
+                [FAILED, error, time.time(), QUEUED, RUNNING])
+
+    def remove_older(self, created):
+        """
+        Remove the jobs created before the time created, and return
+        their ids.
+        """
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT id FROM job WHERE created < ?;", [created]).fetchall()
+            connection.execute("DELETE FROM job WHERE created < ?;",
+                               [created])
+        return [row[0] for row in rows]
+
+## The database of a worker process, opened by its first job:
+_DATABASE = None
+
+def init_worker(site_dir):
+    """
+    Set up a new worker process.
+    """
+    import gprime.const # initializes locale
+    gprime.const.set_site_dir(site_dir)
+
+def get_database(database_dir):
+    """
+    Return the database of the worker process, without the objects it
+    cached for earlier jobs, as the server may have changed them since.
+    """
+    global _DATABASE
+    if _DATABASE is None:
+        from gprime.dbstate import DbState
+        _DATABASE = DbState().open_database(database_dir)
+    else:
+        _DATABASE.clear_cache()
+    return _DATABASE
+
+def run_job(store_file, job_id, database_dir, job_dir):
+    """
+    Run a job, in a worker process. Its output goes in job_dir.
+    """
+    from gprime.cli.user import User
+    from gprime.cli.plug import BasePluginManager, run_report
+    from .forms.actionform import import_file, export_file, upload
+    store = JobStore(store_file)
+    job = store.get(job_id)
+    store.update(job_id, status=RUNNING)
+    def callback(percentage, text=None):
+        store.update(job_id, progress=percentage)
+    user = User(callback=callback, quiet=True)
+    options = job["options"]
+    output = None
+    try:
+        database = get_database(database_dir)
+        os.makedirs(job_dir, exist_ok=True)
+        if job["ptype"] == "Report":
+            output = os.path.join(job_dir, "%s.pdf" % job["pid"])
+            clr = run_report(database, job["pid"],
+                             username=job["username"],
+                             of=output, off="pdf", **options)
+            if not clr:
+                raise Exception("Error in report")
+        elif job["ptype"] == "Export":
+            pmgr = BasePluginManager.get_instance()
+            pdata = pmgr.get_plugin(job["pid"])
+            output = os.path.join(job_dir, "export." + pdata.extension)
+            if not export_file(database, output, user):
+                raise Exception("Error in export")
+        elif job["ptype"] == "Import":
+            filename = upload(options["i"],
+                              os.path.join(job_dir, "import." + options["iff"]))
+            if filename is None or not import_file(database, filename, user):
+                raise Exception("Error in import")
+        else:
+            raise Exception("Not supported: %s" % job["ptype"])
+    except Exception as exp:
+        LOG.exception("job %s failed", job_id)
+        store.update(job_id, status=FAILED, error=str(exp),
+                     finished=time.time())
+        return
+    store.update(job_id, status=DONE, progress=100, output=output,
+                 finished=time.time())
+
+class JobQueue:
+    """
+    Submit jobs to a pool of worker processes, which open the database
+    of the site themselves.
+
+    The results of reports and exports are reused: a job with the same
+    user, action and options as one done since the database last changed
+    gets the result of that job, without running again.
+    """
+    def __init__(self, database, site_dir, workers):
+        self.database = database
+        self.site_dir = site_dir
+        self.database_dir = os.path.join(site_dir, "database")
+        self.jobs_dir = os.path.join(site_dir, "jobs")
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self.store_file = os.path.join(self.jobs_dir, "jobs.db")
+        self.store = JobStore(self.store_file)
+        # the server stopped before these were done:
+        self.store.fail_unfinished("Interrupted")
+        for job_id in self.store.remove_older(time.time() -
+                                              JOB_DAYS * 24 * 60 * 60):
+            shutil.rmtree(self.get_job_dir(job_id), ignore_errors=True)
+        # worker processes start afresh, rather than as copies of the
+        # server with its threads and connections:
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(site_dir,))
+
+    def get_job_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def get_cache_key(self, username, ptype, pid, options):
+        """
+        Return the key of the result of an action run by the user with
+        the options on the database as it is now, or None if the result
+        can't be reused.
+
+        Reports are made with the settings of the user running them, and
+        only that user may see the job, so results are kept per user.
+        """
+        last_changed = self.database.get_last_changed()
+        if ptype == "Import" or last_changed is None:
+            return None
+        data = json.dumps([username, ptype, pid, options, last_changed],
+                          sort_keys=True)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def submit(self, username, ptype, pid, options):
+        """
+        Queue a job running the action pid, of type ptype ("Report",
+        "Export" or "Import") with the options, and return its id.
+        """
+        cache_key = self.get_cache_key(username, ptype, pid, options)
+        if cache_key:
+            job_id = self.store.find_result(cache_key)
+            if job_id:
+                return job_id
+        job_id = self.store.add(username, ptype, pid, options, cache_key)
+        future = self.pool.submit(run_job, self.store_file, job_id,
+                                  self.database_dir,
+                                  self.get_job_dir(job_id))
+        if ptype == "Import":
+            # the objects cached by the server are out of date:
+            future.add_done_callback(lambda future: self.imported())
+        return job_id
+
+    def imported(self):
+        """
+        Drop what the server knows of the database, after an import by
+        a worker process.
+        """
+        self.database.clear_cache()
+        self.database.request_rebuild()
+
+    def get(self, job_id):
+        """
+        Return the job as a dictionary, or None.
+        """
+        return self.store.get(job_id)
+
+    def shutdown(self):
+        """
+        Stop the worker processes, once their jobs are done.
+        """
+        self.pool.shutdown(wait=True)
@@ -0,0 +1,148 @@
+#
+# gPrime - a web-based genealogy program
+#
+# Copyright (c) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Load the objects that the tabs of an object page refer to, a table at a
+time, rather than one object per row of each tab.
+"""
+
+## gPrime imports
+from gprime.errors import HandleError
+from gprime.datehandler import displayer
+
+class Prefetcher:
+    """
+    The objects of a request, by table and handle.
+
+    prefetch(instance) plans what the tabs of the instance show: the
+    objects its reference lists point to, then the places of its events
+    and the birth events of its children. Each round loads the handles of
+    a table with one get_from_handles.
+    """
+    def __init__(self, database):
+        self.database = database
+        self.instance = None
+        self.objects = {}
+        self.queries = 0
+
+    def prefetch(self, instance):
+        """
+        Load the objects referred to by the tabs of the instance.
+        """
+        self.instance = instance
+        wanted = get_references(instance)
+        self.load_all(wanted)
+        # what those objects refer to in turn:
+        places = []
+        for handle in wanted.get("Event", []):
+            event = self.objects.get(("Event", handle))
+            if event and event.place:
+                places.append(event.place)
+        births = []
+        for child_ref in getattr(instance, "child_ref_list", []):
+            child = self.objects.get(("Person", child_ref.ref))
+            if child:
+                ref = child.get_birth_ref()
+                if ref and ref.ref:
+                    births.append(ref.ref)
+        self.load_all({"Place": places, "Event": births})
+
+    def load_all(self, wanted):
+        for (table, handles) in wanted.items():
+            self.load(table, handles)
+
+    def load(self, table, handles):
+        """
+        Load the objects of the handles that are not loaded yet. Objects
+        that are not found are left to get(), which raises HandleError
+        as a lookup of the handle does.
+        """
+        handles = [handle for handle in dict.fromkeys(handles)
+                   if handle and (table, handle) not in self.objects]
+        if not handles:
+            return
+        self.queries += 1
+        try:
+            objects = self.database.get_from_handles(table, handles)
+        except HandleError:
+            handle_func = self.database.get_table_func(table, "handle_func")
+            objects = []
+            for handle in list(handles):
+                try:
+                    objects.append(handle_func(handle))
+                except HandleError:
+                    handles.remove(handle)
+        for (handle, obj) in zip(handles, objects):
+            self.objects[(table, handle)] = obj
+
+    def get(self, table, handle):
+        """
+        Return the object of the table with the handle, loading it if it
+        was not prefetched, or None for an empty handle.
+        """
+        obj = self.objects.get((table, handle))
+        if obj is None:
+            obj = self.database.get_from_name_and_handle(table, handle)
+            if obj is not None:
+                self.objects[(table, handle)] = obj
+        return obj
+
+    def birth_date(self, person):
+        """
+        The displayed date of the person's birth, as
+        SimpleAccess.birth_date.
+        """
+        ref = person.get_birth_ref()
+        if ref and ref.ref:
+            event = self.get("Event", ref.ref)
+            date_obj = event.get_date_object()
+            if date_obj:
+                return displayer.display(date_obj)
+        return ""
+
+def get_references(instance):
+    """
+    Return a dictionary of table name to the handles that the reference
+    lists of the instance point to.
+    """
+    wanted = {}
+    def add(table, handles):
+        wanted.setdefault(table, []).extend(handles)
+    if hasattr(instance, "event_ref_list"):
+        add("Event", [ref.ref for ref in instance.event_ref_list])
+    if hasattr(instance, "child_ref_list"):
+        add("Person", [ref.ref for ref in instance.child_ref_list])
+    if hasattr(instance, "person_ref_list"):
+        add("Person", [ref.ref for ref in instance.person_ref_list])
+    if hasattr(instance, "placeref_list"):
+        add("Place", [ref.ref for ref in instance.placeref_list])
+    if hasattr(instance, "media_list"):
+        add("Media", [ref.ref for ref in instance.media_list])
+    if hasattr(instance, "reporef_list"):
+        add("Repository", [ref.ref for ref in instance.reporef_list])
+    if hasattr(instance, "citation_list"):
+        add("Citation", instance.citation_list)
+    if hasattr(instance, "note_list"):
+        add("Note", instance.note_list)
+    if hasattr(instance, "primary_name"):
+        for name in [instance.primary_name] + instance.alternate_names:
+            add("Citation", name.citation_list)
+            add("Note", name.note_list)
+    return wanted
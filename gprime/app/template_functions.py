@@ -27,10 +27,17 @@ from gprime.display.name import NameDisplay
 from gprime.datehandler import displayer
 
 # Python imports:
+import json
+import itertools
+import functools
 import tornado.log
 
 # Globals and functions:
 TAB_HEIGHT = 200
+# Number of objects shown at a time on the References tab:
+REFERENCE_PAGE_SIZE = 50
+# Order of the backlinks, for their cursors:
+REFERENCE_ORDER = [("obj_class", "ASC"), ("obj_handle", "ASC")]
 name_display = NameDisplay().display
 date_display = displayer.display
 
@@ -144,7 +151,51 @@ style="background:url(%s) no-repeat; font-size:0; width: 30px; height: 30px;" %s
         html += table
         return str(html) #.replace("&amp;nbsp;", "&nbsp;")
 
+def to_key(value):
+    """
+    Return a string of the value (lists of handles or of secondary
+    objects, and strings) for the key of a fragment.
+    """
+    def to_data(value):
+        if isinstance(value, (list, tuple)):
+            return [to_data(item) for item in value]
+        elif hasattr(value, "to_struct"):
+            return value.to_struct()
+        return value
+    return json.dumps(to_data(value), sort_keys=True, default=str)
+
+def cached_tab(*obj_types):
+    """
+    Decorator for tab renderers, whose HTML depends on the form's object,
+    and on the objects of obj_types that it refers to.
+
+    Tabs of objects being viewed are kept in the app's FragmentCache, by
+    renderer, object, arguments, the user's settings (see UserCache),
+    and the generations of the object types.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(form, user, action, *args):
+            app = form.handler.app
+            fragments = getattr(app, "fragments", None)
+            if action != "view" or fragments is None or not form.instance.handle:
+                return func(form, user, action, *args)
+            user_data = app.get_user_data(user)
+            key = (func.__name__, form.view, form.instance.handle,
+                   bool(user), user_data["settings"], to_key(args),
+                   fragments.get_generations(
+                       (form.instance.__class__.__name__.lower(),) +
+                       obj_types))
+            html = fragments.get(key)
+            if html is None:
+                html = func(form, user, action, *args)
+                fragments.put(key, html)
+            return html
+        return wrapper
+    return decorator
+
 #TODO: Ensure user and privacy levels are accounted for in tables
+@cached_tab("event", "place")
 def event_table(form, user, action):
     retval = ""
     has_data = False
@@ -161,16 +212,17 @@ def event_table(form, user, action):
         (event.get_label("place", form._), 19),
         (eventref.get_label("role", form._), 10),
     )
-    s = Struct.wrap(form.instance, form.database)
+    objects = form.get_prefetcher()
     count = 1
-    for event_ref in s.event_ref_list: # eventrefs
-        event = event_ref.ref
+    for event_ref in form.instance.event_ref_list:
+        event = objects.get("Event", event_ref.ref)
+        place = objects.get("Place", event.place)
         table.append_row(event.description,
-                         event.type.string,
+                         str(event.type),
                          event.gid,
                          event.date.text,
-                         event.place.name.value,
-                         event_ref.role.string,
+                         place.name.value if place else "",
+                         str(event_ref.role),
                          edit="event_ref_list/%s" % (count),
                          goto=form.make_url("event_ref_list", count))
         has_data = True
@@ -199,6 +251,7 @@ def event_table(form, user, action):
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
+@cached_tab("citation", "note")
 def name_table(form, user, action):
     retval = ""
     has_data = False
@@ -213,17 +266,18 @@ def name_table(form, user, action):
         (form._("Note"), 15),
     )
     if user or form.instance.public:
+        objects = form.get_prefetcher()
         count = 0
         for name in [form.instance.primary_name] + form.instance.alternate_names:
             citations = []
             for citation_handle in name.citation_list:
-                citation = form.database.get_citation_from_handle(citation_handle)
+                citation = objects.get("Citation", citation_handle)
                 if citation:
                     citations.append(citation)
             citationq = len(citations) > 0
             note_text = ""
             for note_handle in name.note_list:
-                note = form.database.get_note_from_handle(note_handle)
+                note = objects.get("Note", note_handle)
                 if note:
                     note_text = note.text.string[:50]
                     break
@@ -253,6 +307,7 @@ def name_table(form, user, action):
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
+@cached_tab()
 def surname_table(form, user, action, name_row):
     retval = ""
     has_data = False
@@ -295,6 +350,7 @@ def surname_table(form, user, action, name_row):
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
+@cached_tab("place")
 def enclosed_by_table(form, user, action, placeref_list):
     cssid = "tab-enclosed-by"
     retval = ""
@@ -308,9 +364,11 @@ def enclosed_by_table(form, user, action, placeref_list):
         (form._("Date"), 30),
     )
     if user or form.instance.public:
+        objects = form.get_prefetcher()
+        objects.load("Place", [ref.ref for ref in placeref_list])
         count = 1
         for ref in placeref_list:
-            place = form.database.get_place_from_handle(ref.ref)
+            place = objects.get("Place", ref.ref)
             table.append_row(place.gid,
                              place.name.value,
                              place.place_type,
@@ -343,6 +401,7 @@ def enclosed_by_table(form, user, action, placeref_list):
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
+@cached_tab()
 def alt_name_table(form, user, action, alt_names):
     cssid = "tab-alt-names"
     retval = ""
@@ -382,6 +441,7 @@ def alt_name_table(form, user, action, alt_names):
     return retval
 
 
+@cached_tab("citation")
 def citation_table(form, user, action, citation_list, path=""):
     # FIXME: how can citation_table and source_table both be on same
     # page? This causes problems with form names, tab names, etc.
@@ -396,10 +456,12 @@ def citation_table(form, user, action, citation_list, path=""):
         (form._("Page"), 30),
     )
     if user or form.instance.public:
+        objects = form.get_prefetcher()
+        objects.load("Citation", citation_list)
         count = 1
         for citation_ref in citation_list:
             if citation_ref:
-                citation = form.database.get_citation_from_handle(citation_ref)
+                citation = objects.get("Citation", citation_ref)
                 table.append_row(citation.gid,
                                  citation.confidence,
                                  citation.page,
@@ -431,6 +493,7 @@ def citation_table(form, user, action, citation_list, path=""):
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
+@cached_tab("repository")
 def repository_table(form, user, action, reporef_list):
     retval = ""
     has_data = False
@@ -444,10 +507,12 @@ def repository_table(form, user, action, reporef_list):
         (form._("Type"), 20),
     )
     if user or form.instance.public:
+        objects = form.get_prefetcher()
+        objects.load("Repository", [repo_ref.ref for repo_ref in reporef_list])
         count = 1
         for repo_ref in reporef_list:
             handle = repo_ref.ref
-            repo = form.database.get_repository_from_handle(handle)
+            repo = objects.get("Repository", handle)
             table.append_row(repo.gid,
                              repo.name,
                              repo_ref.call_number,
@@ -480,6 +545,7 @@ def repository_table(form, user, action, reporef_list):
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
+@cached_tab("note")
 def note_table(form, user, action, note_list, path=""):
     retval = ""
     has_data = False
@@ -492,9 +558,11 @@ def note_table(form, user, action, note_list, path=""):
         (form._("Note"), 59),
     )
     if user or form.instance.public:
+        objects = form.get_prefetcher()
+        objects.load("Note", note_list)
         count = 1
         for handle in note_list:
-            note = form.database.get_note_from_handle(handle)
+            note = objects.get("Note", handle)
             table.append_row(note.gid,
                              str(note.type.string),
                              note.text.string[:50],
@@ -526,6 +594,7 @@ def note_table(form, user, action, note_list, path=""):
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
+@cached_tab()
 def attribute_table(form, user, action, attribute_list, path=""):
     retval = ""
     has_data = False
@@ -569,6 +638,7 @@ def attribute_table(form, user, action, attribute_list, path=""):
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
+@cached_tab()
 def address_table(form, user, action, address_list):
     retval = ""
     has_data = False
@@ -610,6 +680,7 @@ def address_table(form, user, action, address_list):
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
+@cached_tab("media")
 def media_table(form, user, action, media_list):
     retval = ""
     has_data = False
@@ -623,8 +694,10 @@ def media_table(form, user, action, media_list):
     )
     count = 1
     if user or form.instance.public:
+        objects = form.get_prefetcher()
+        objects.load("Media", [media_ref.ref for media_ref in media_list])
         for media_ref in media_list:
-            media = form.database.get_media_from_handle(media_ref.ref)
+            media = objects.get("Media", media_ref.ref)
             table.append_row(media.desc,
                              media.mime,
                              media.path,
@@ -656,6 +729,7 @@ def media_table(form, user, action, media_list):
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
+@cached_tab()
 def internet_table(form, user, action, urls):
     retval = ""
     has_data = False
@@ -693,6 +767,7 @@ def internet_table(form, user, action, urls):
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
+@cached_tab("person")
 def association_table(form, user, action):
     retval = ""
     has_data = False
@@ -717,12 +792,13 @@ def association_table(form, user, action):
         retval += nbsp("") # to keep tabs same height
     retval += """</div>"""
     if user or form.instance.public:
-        s = Struct.wrap(form.instance, form.database)
+        objects = form.get_prefetcher()
         count = 1
-        for personref in s.person_ref_list:
+        for personref in form.instance.person_ref_list:
+            person = objects.get("Person", personref.ref)
             table.append_row(
-                name_display(personref.ref.instance),
-                personref.ref.gid,
+                name_display(person),
+                person.gid,
                 personref.rel,
                 edit="person_ref_list/%s" % count,
                 goto=form.make_url("person_ref_list", count))
@@ -736,6 +812,7 @@ def association_table(form, user, action):
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
+@cached_tab()
 def location_table(form, user, action):
     # obj is Place or Address
     retval = ""
@@ -785,6 +862,7 @@ def location_table(form, user, action):
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
+@cached_tab("place")
 def lds_table(form, user, action, lds_ord_list):
     retval = ""
     has_data = False
@@ -904,12 +982,38 @@ def person_reference_table(form, user, action):
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
-def reference_table(form, user, action):
+def get_reference_page(database, app, handle, cursor=None):
+    """
+    Return a list of (type, description, gid, url) for a page of the
+    objects referencing handle, and the cursor of the next page, or None
+    if this is the last one.
+    """
     from gprime.simple import SimpleAccess
-    sa = SimpleAccess(form.database)
+    from gprime.db.base import make_cursor, read_cursor
+    sa = SimpleAccess(database)
+    after = read_cursor(cursor, REFERENCE_ORDER)[0] if cursor else None
+    # one more, to know if there is a next page:
+    backlinks = database.get_backlinks(handle, after=after,
+                                       limit=REFERENCE_PAGE_SIZE + 1)
+    next_cursor = None
+    if len(backlinks) > REFERENCE_PAGE_SIZE:
+        backlinks = backlinks[:REFERENCE_PAGE_SIZE]
+        next_cursor = make_cursor(REFERENCE_ORDER, list(backlinks[-1]))
+    rows = []
+    for (obj_type, group) in itertools.groupby(backlinks,
+                                               key=lambda pair: pair[0]):
+        handles = [obj_handle for (class_name, obj_handle) in group]
+        for obj in database.get_from_handles(obj_type, handles):
+            rows.append((obj_type, sa.describe(obj), obj.gid,
+                         app.make_url(obj.make_url())))
+    return rows, next_cursor
+
+def reference_table(form, user, action):
+    """
+    The first page of the objects referencing the instance, with their
+    counts by type; the next pages are added from /json/references/.
+    """
     retval = ""
-    has_data = False
-    count = 0;
     cssid = "tab-references"
     table = Table(form)
     table.set_columns(
@@ -918,19 +1022,49 @@ def reference_table(form, user, action):
         (form._("Reference"), 69),
         (form._("ID"), 10),
         )
-    for ref_pair in form.database.find_backlink_handles(form.instance.handle):
-        obj_type, handle = ref_pair
-        obj = form.database.get_table_func(obj_type, "handle_func")(handle)
-        table.append_row(obj_type, sa.describe(obj), obj.gid,
-                         goto=form.handler.app.make_url(obj.make_url()),
-                         edit=None)
-        has_data = True
+    handle = form.instance.handle
+    counts = form.database.get_backlink_counts(handle)
+    rows, next_cursor = get_reference_page(form.database, form.handler.app,
+                                           handle)
+    for (obj_type, description, gid, url) in rows:
+        table.append_row(obj_type, description, gid, goto=url, edit=None)
     retval += table.get_html(action)
-    retval += nbsp("") # to keep tabs same height
-    if has_data:
+    retval += """<div style="background-color: lightgray; padding: 2px 0px 0px 2px">"""
+    retval += " | ".join(["<b>%s</b> %s" % (obj_type, counts[obj_type])
+                          for obj_type in sorted(counts)])
+    if next_cursor:
+        url = form.handler.app.make_url("/json/references/%s" % handle)
+        retval += """ | <input type="button" id="references-more" value="%s"
+onclick="loadReferences('%s', this.getAttribute('data-cursor'))"
+data-cursor="%s"/>""" % (form._("More"), url, next_cursor)
+        retval += """
+<SCRIPT LANGUAGE="JavaScript">
+function loadReferences(url, cursor) {
+  $.getJSON(url, {c: cursor}, function(data) {
+    var table = $("#%s table");
+    $.each(data.rows, function(i, row) {
+      var tr = $("<tr/>").append($("<td/>").addClass("TableDataCell"));
+      $.each([row.type, row.description, row.gid], function(j, value) {
+        tr.append($("<td/>").addClass("TableDataCell").append(
+          $("<a/>").attr("href", row.url).css("display", "block").text(value)));
+      });
+      table.append(tr);
+    });
+    if (data.next) {
+      $("#references-more").attr("data-cursor", data.next);
+    } else {
+      $("#references-more").remove();
+    }
+  });
+}
+</SCRIPT>
+""" % cssid
+    retval += "</div>"
+    if counts:
         retval += """ <SCRIPT LANGUAGE="JavaScript">setHasData("%s", 1)</SCRIPT>\n""" % cssid
     return retval
 
+@cached_tab("person", "event")
 def children_table(form, user, action):
     retval = ""
     has_data = False
@@ -946,17 +1080,18 @@ def children_table(form, user, action):
         (form._("Maternal"), 10),
         (form._("Birth Date"), 19),
     )
+    objects = form.get_prefetcher()
     count = 1
     for childref in form.instance.child_ref_list:
         handle = childref.ref
-        child = form.database.get_person_from_handle(handle)
+        child = objects.get("Person", handle)
         table.append_row(str(count),
                          "[%s]" % child.gid,
                          name_display(child),
                          render_gender(child.gender),
                          childref.frel.string,
                          childref.mrel.string,
-                         form.birth_date(child),
+                         objects.birth_date(child),
                          goto=form.make_url("child_ref_list", count),
                          edit="child_ref_list/%s" % count)
         has_data = True
@@ -0,0 +1,288 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+""" Tests for the web app """
+
+import os
+import json
+import types
+import shutil
+import tempfile
+import unittest
+import threading
+import contextlib
+from unittest import mock
+from concurrent.futures import Future
+
+from PIL import Image
+
+import tornado.gen
+import tornado.web
+import tornado.testing
+
+from gprime.db import make_database
+from gprime.lib import Person, Name, Surname, Event, EventRef, Place, Media
+
+USER = "tester"
+
+class AppTest(tornado.testing.AsyncHTTPTestCase):
+
+    def get_app(self):
+        from gprime.app.app import GPrimeApp
+        self.site_dir = tempfile.mkdtemp()
+        self.db = make_database("inmemorydb")
+        self.db.load(None)
+        self.db.add_user(username=USER, password="",
+                         permissions={"add", "edit"}, data={})
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            self.person = Person()
+            self.person.gid = "I0000"
+            self.person.gender = Person.MALE
+            self.person.primary_name = Name()
+            self.person.primary_name.surname_list.append(Surname())
+            self.person.primary_name.surname_list[0].surname = "Smith"
+            self.db.add_person(self.person, trans)
+        options = types.SimpleNamespace(
+            prefix="", sitename="gPrime", database="Test", debug=False,
+            xsrf=False, hostname="localhost", port=8000,
+            site_dir=self.site_dir, db_workers=4, job_workers=1,
+            image_workers=1, media_cache_size=1)
+        self.app = GPrimeApp(options, self.db)
+        return self.app
+
+    def tearDown(self):
+        super().tearDown()
+        self.app.executor.shutdown()
+        self.app.jobs.pool.shutdown()
+        self.app.renderer.pool.shutdown()
+        shutil.rmtree(self.site_dir)
+
+    def get_headers(self, user=USER):
+        cookie = tornado.web.create_signed_value(
+            self.app.settings["cookie_secret"], "user", user)
+        return {"Cookie": "user=" + cookie.decode()}
+
+    def get_page(self, path, user=USER):
+        return self.fetch(path, headers=self.get_headers(user))
+
+    def add_event(self):
+        """
+        Add an event at a place to the person, and return them.
+        """
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            place = Place()
+            place.name.value = "Oldtown"
+            self.db.add_place(place, trans)
+            event = Event()
+            event.description = "Moved away"
+            event.place = place.handle
+            self.db.add_event(event, trans)
+            event_ref = EventRef()
+            event_ref.ref = event.handle
+            self.person.add_event_ref(event_ref)
+            self.db.commit_person(self.person, trans)
+        return (event, place)
+
+    def add_media(self):
+        """
+        Add a media of a small JPEG image, and return it.
+        """
+        filename = os.path.join(self.site_dir, "image.jpg")
+        Image.new("RGB", (160, 120), (0, 0, 255)).save(filename)
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            media = Media()
+            media.set_path(filename)
+            media.set_mime_type("image/jpeg")
+            self.db.add_media(media, trans)
+        return media
+
+    def commit(self, obj):
+        with self.db.get_transaction_class()("Test", self.db) as trans:
+            getattr(self.db, "commit_" + obj.__class__.__name__.lower())(
+                obj, trans)
+
+    def test_start(self):
+        import gprime.app
+        self.assertTrue(callable(gprime.app.main))
+        response = self.get_page("/person/" + self.person.handle)
+        self.assertEqual(response.code, 200)
+        self.assertIn(b"Smith", response.body)
+
+    @tornado.testing.gen_test
+    async def test_concurrent_requests(self):
+        # the database work runs in the executor's threads, and the
+        # response is only changed on the IOLoop:
+        threads = set()
+        def watch(name):
+            method = getattr(tornado.web.RequestHandler, name)
+            def watched(handler, *args, **kwargs):
+                threads.add(threading.get_ident())
+                return method(handler, *args, **kwargs)
+            return mock.patch.object(tornado.web.RequestHandler, name,
+                                     watched)
+        requests = []
+        for i in range(10):
+            requests.append(("/person/" + self.person.handle, 200, b"Smith"))
+            requests.append(("/person/?search=Smith", 200, b"I0000"))
+            requests.append(("/json/?field=father&q=Smith", 200, b"Smith"))
+        requests.append(("/login", 302, b""))
+        with contextlib.ExitStack() as stack:
+            for name in ["set_status", "set_header", "set_cookie", "write",
+                         "flush", "redirect", "finish"]:
+                stack.enter_context(watch(name))
+            responses = await tornado.gen.multi([
+                self.http_client.fetch(
+                    self.get_url(path), headers=self.get_headers(),
+                    method="POST" if path == "/login" else "GET",
+                    body="username=%s&password=x" % USER
+                    if path == "/login" else None,
+                    follow_redirects=False, raise_error=False)
+                for (path, code, text) in requests])
+        for ((path, code, text), response) in zip(requests, responses):
+            self.assertEqual(response.code, code, path)
+            self.assertIn(text, response.body)
+        self.assertEqual(threads, {threading.get_ident()})
+        self.assertEqual(self.app.executor.get_metrics()["completed"],
+                         len(requests))
+
+    def test_cached_tabs(self):
+        (event, place) = self.add_event()
+        path = "/person/" + self.person.handle
+        self.assertIn(b"Moved away", self.get_page(path).body)
+        hits = self.app.fragments.get_metrics()["hits"]
+        self.assertIn(b"Oldtown", self.get_page(path).body)
+        self.assertGreater(self.app.fragments.get_metrics()["hits"], hits)
+        # a change to a referenced object shows:
+        event.description = "Stayed"
+        self.commit(event)
+        body = self.get_page(path).body
+        self.assertIn(b"Stayed", body)
+        self.assertNotIn(b"Moved away", body)
+        place.name.value = "Newtown"
+        self.commit(place)
+        body = self.get_page(path).body
+        self.assertIn(b"Newtown", body)
+        self.assertNotIn(b"Oldtown", body)
+
+    def test_cached_tabs_of_users(self):
+        self.db.add_user(username="other", password="",
+                         permissions={"add", "edit"},
+                         data={"css": "Web_Nebraska.css"})
+        self.db.add_user(username="same", password="",
+                         permissions={"add", "edit"}, data={})
+        path = "/person/" + self.person.handle
+        self.get_page(path)
+        hits = self.app.fragments.get_metrics()["hits"]
+        # other settings render their own tabs:
+        self.get_page(path, "other")
+        self.assertEqual(self.app.fragments.get_metrics()["hits"], hits)
+        self.db.update_user_data("other", {"css": ""})
+        self.get_page(path, "other")
+        self.assertGreater(self.app.fragments.get_metrics()["hits"], hits)
+        # the same settings share them:
+        hits = self.app.fragments.get_metrics()["hits"]
+        self.get_page(path, "same")
+        self.assertGreater(self.app.fragments.get_metrics()["hits"], hits)
+
+    def test_job_permissions(self):
+        self.db.add_user(username="other", password="",
+                         permissions={"add", "edit"}, data={})
+        self.db.add_user(username="admin", password="",
+                         permissions={"admin"}, data={})
+        job_id = self.app.jobs.store.add(USER, "Export", "ex_gramps", {})
+        # only its owner and admins may follow a job:
+        for (user, code) in [(USER, 200), ("admin", 200), ("other", 403)]:
+            for path in ["/job/%s", "/job/%s?format=json"]:
+                self.assertEqual(self.get_page(path % job_id, user).code,
+                                 code, (user, path))
+        # there is nothing to download yet:
+        for (user, code) in [(USER, 404), ("admin", 404), ("other", 403)]:
+            self.assertEqual(
+                self.get_page("/job/%s/download" % job_id, user).code,
+                code, user)
+        response = self.get_page("/job/%s?format=json" % job_id)
+        self.assertEqual(json.loads(response.body.decode())["status"],
+                         "queued")
+        self.assertEqual(self.get_page("/job/missing").code, 404)
+
+    def test_image_errors(self):
+        path = "/imageserver/%s/full/80,/0/default.jpg" % (
+            self.add_media().handle)
+        # as raised by render_image in the worker process:
+        for (error, param) in [(SystemError("tile"), "size"),
+                               (IOError("mode"), "format")]:
+            future = Future()
+            future.set_exception(error)
+            with mock.patch.object(self.app.renderer, "render",
+                                   return_value=future):
+                response = self.get_page(path)
+            self.assertEqual(response.code, 501, param)
+            self.assertIn("'%s' parameter" % param, response.body.decode())
+        response = self.get_page(path)
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.headers["Content-Type"], "image/jpeg")
+
+    def test_image_not_modified(self):
+        media = self.add_media()
+        path = "%s/full/80,/0/default.jpg" % media.handle
+        response = self.get_page("/imageserver/" + path)
+        self.assertEqual(response.code, 200)
+        etag = response.headers["Etag"]
+        last_modified = response.headers["Last-Modified"]
+        # from the cache:
+        for (headers, code) in [({"If-None-Match": etag}, 304),
+                                ({"If-None-Match": "W/" + etag}, 304),
+                                ({"If-None-Match": '"other", ' + etag}, 304),
+                                ({"If-None-Match": "*"}, 304),
+                                ({"If-None-Match": '"other"'}, 200),
+                                ({"If-Modified-Since": last_modified}, 304),
+                                ({"If-Modified-Since":
+                                  "Sat, 01 Jan 2000 00:00:00 GMT"}, 200),
+                                # If-None-Match comes first:
+                                ({"If-None-Match": '"other"',
+                                  "If-Modified-Since": last_modified}, 200)]:
+            headers.update(self.get_headers())
+            response = self.fetch("/imageserver/" + path, headers=headers)
+            self.assertEqual(response.code, code, headers)
+            self.assertEqual(response.headers["Etag"], etag)
+            if code == 304:
+                self.assertEqual(response.body, b"")
+        # a changed image has another tag, checked before rendering it:
+        filename = media.get_path()
+        os.utime(filename, (0, 1000000000))
+        key = self.app.cacher.make_key(filename, os.stat(filename), path)
+        self.assertNotEqual('"%s"' % key, etag)
+        with mock.patch.object(self.app.renderer, "render") as render:
+            headers = {"If-None-Match": '"%s"' % key}
+            headers.update(self.get_headers())
+            response = self.fetch("/imageserver/" + path, headers=headers)
+        self.assertEqual(response.code, 304)
+        self.assertFalse(render.called)
+        response = self.get_page("/imageserver/" + path)
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.headers["Etag"], '"%s"' % key)
+        self.assertEqual(response.headers["Last-Modified"],
+                         "Sun, 09 Sep 2001 01:46:40 GMT")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+""" Tests for the cache of HTML fragments """
+
+import unittest
+
+from gprime.db import make_database
+from gprime.lib import Event
+from gprime.app.fragments import FragmentCache
+
+class FragmentCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_database("inmemorydb")
+        self.db.load(None)
+        self.cache = FragmentCache(self.db, size=2)
+
+    def test_generations(self):
+        generations = self.cache.get_generations(("event", "place"))
+        with self.db.get_transaction_class()("Test", self.db) as trans:
+            self.db.add_event(Event(), trans)
+        self.assertNotEqual(self.cache.get_generations(("event", "place")),
+                            generations)
+        self.assertEqual(self.cache.get_generations(("place",)),
+                         generations[1:])
+        # batch transactions signal nothing, until a rebuild:
+        generations = self.cache.get_generations(("event", "place"))
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            self.db.add_event(Event(), trans)
+        self.assertEqual(self.cache.get_generations(("event", "place")),
+                         generations)
+        self.db.request_rebuild()
+        self.assertNotEqual(self.cache.get_generations(("event",)),
+                            generations[:1])
+        self.assertNotEqual(self.cache.get_generations(("place",)),
+                            generations[1:])
+
+    def test_least_recently_used(self):
+        self.cache.put("a", "A")
+        self.cache.put("b", "B")
+        self.assertEqual(self.cache.get("a"), "A")
+        self.cache.put("c", "C")
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), "A")
+        self.assertEqual(self.cache.get_metrics(),
+                         {"fragments": 2, "hits": 2, "misses": 1})
+
+if __name__ == "__main__":
+    unittest.main()
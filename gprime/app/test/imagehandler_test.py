@@ -0,0 +1,256 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+""" Tests for the rendering and caching of images """
+
+import io
+import os
+import hashlib
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from PIL import Image
+
+from gprime.app.handlers import imagehandler
+from gprime.app.handlers.imagehandler import (FileSystemCacher,
+                                              ImageRenderer, render_file)
+
+# Colors of the quarters of the test images:
+COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0)]
+
+def make_image(filename, size, nformat="JPEG"):
+    """
+    Write an image of the size, each quarter of a color of COLORS: top
+    left, top right, bottom left and bottom right.
+    """
+    (width, height) = size
+    image = Image.new("RGB", size)
+    for (i, color) in enumerate(COLORS):
+        x = (i % 2) * width // 2
+        y = (i // 2) * height // 2
+        image.paste(color, (x, y, x + width // 2, y + height // 2))
+    image.save(filename, nformat, quality=95)
+
+def get_color(data):
+    """
+    Return the color in the middle of the image data (bytes).
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        return image.convert("RGB").getpixel((image.size[0] // 2,
+                                              image.size[1] // 2))
+
+class FileSystemCacherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.directory = os.path.join(self.tmp_dir, "cache")
+        self.cacher = FileSystemCacher(self.directory, 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_key(self, path):
+        return hashlib.sha1(path.encode("utf-8")).hexdigest()
+
+    def test_evict(self):
+        keys = [self.make_key(str(i)) for i in range(4)]
+        for key in keys[:3]:
+            self.cacher.cache(key, b"x" * 40)
+        # over the budget, the least recently used is removed:
+        self.assertEqual(self.cacher.size, 80)
+        self.assertNotIn(keys[0], self.cacher)
+        self.assertFalse(os.path.exists(self.cacher.get_filename(keys[0])))
+        self.assertIsNone(self.cacher.open(keys[0]))
+        # opening one makes it the most recently used:
+        with self.cacher.open(keys[1]) as fp:
+            self.assertEqual(fp.read(), b"x" * 40)
+        self.cacher.cache(keys[3], b"x" * 40)
+        self.assertEqual(list(self.cacher.entries), [keys[1], keys[3]])
+        self.assertTrue(os.path.exists(self.cacher.get_filename(keys[1])))
+        self.assertFalse(os.path.exists(self.cacher.get_filename(keys[2])))
+        # a rendering larger than the budget is not kept:
+        self.cacher.cache(keys[0], b"x" * 101)
+        self.assertEqual((self.cacher.size, len(self.cacher.entries)), (0, 0))
+        self.assertEqual([filenames for (dirpath, dirnames, filenames)
+                          in os.walk(self.directory) if filenames], [])
+
+    def test_load(self):
+        keys = [self.make_key(str(i)) for i in range(3)]
+        for (i, key) in enumerate(keys):
+            self.cacher.cache(key, b"x" * 30)
+            # the least recently used is found by its modification time:
+            os.utime(self.cacher.get_filename(key), (i, i))
+        os.makedirs(os.path.join(self.directory, "identifier", "full"))
+        stale = [os.path.join(self.directory, "identifier", "full",
+                              "default.jpg"),
+                 os.path.join(self.directory, "info.json"),
+                 os.path.join(self.directory, keys[0][:2], ".tmp")]
+        for filename in stale:
+            with open(filename, "wb") as fp:
+                fp.write(b"stale")
+        cacher = FileSystemCacher(self.directory, 60)
+        self.assertEqual(list(cacher.entries), keys[1:])
+        self.assertEqual(cacher.size, 60)
+        for filename in stale:
+            self.assertFalse(os.path.exists(filename), filename)
+        self.assertFalse(os.path.exists(os.path.join(self.directory,
+                                                     "identifier")))
+        self.assertFalse(os.path.exists(cacher.get_filename(keys[0])))
+        with cacher.open(keys[2]) as fp:
+            self.assertEqual(fp.read(), b"x" * 30)
+
+    def test_make_key(self):
+        filename = os.path.join(self.tmp_dir, "image.jpg")
+        make_image(filename, (80, 60))
+        path = "image/full/full/0/default.jpg"
+        key = self.cacher.make_key(filename, os.stat(filename), path)
+        self.assertRegex(key, "^[0-9a-f]{40}$")
+        self.assertEqual(self.cacher.make_key(filename, os.stat(filename),
+                                              path), key)
+        self.assertNotEqual(self.cacher.make_key(
+            filename, os.stat(filename), "image/full/40,/0/default.jpg"),
+                            key)
+        # a changed image gets new keys:
+        source = os.stat(filename)
+        os.utime(filename, ns=(source.st_atime_ns,
+                               source.st_mtime_ns + 1000000000))
+        mtime_key = self.cacher.make_key(filename, os.stat(filename), path)
+        self.assertNotEqual(mtime_key, key)
+        os.utime(filename, ns=(source.st_atime_ns, source.st_mtime_ns))
+        with open(filename, "ab") as fp:
+            fp.write(b"\0")
+        os.utime(filename, ns=(source.st_atime_ns, source.st_mtime_ns))
+        self.assertEqual(os.stat(filename).st_mtime_ns, source.st_mtime_ns)
+        self.assertNotIn(self.cacher.make_key(filename, os.stat(filename),
+                                              path), [key, mtime_key])
+
+class ImageRendererTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, "image.jpg")
+        make_image(self.filename, (800, 600))
+        self.cacher = FileSystemCacher(os.path.join(self.tmp_dir, "cache"),
+                                       1024 * 1024)
+        self.renderer = ImageRenderer(self.cacher, 1)
+
+    def tearDown(self):
+        self.renderer.shutdown()
+        shutil.rmtree(self.tmp_dir)
+
+    def assertColor(self, data, color):
+        for (value, expected) in zip(get_color(data), color):
+            self.assertAlmostEqual(value, expected, delta=16)
+
+    def test_render(self):
+        key = self.cacher.make_key(self.filename, os.stat(self.filename),
+                                   "image/full/80,/0/default.jpg")
+        future = self.renderer.render(key, self.filename, (400, 0, 400, 300),
+                                      (80, 60))
+        data = future.result(timeout=60)
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual((image.format, image.size), ("JPEG", (80, 60)))
+        self.assertColor(data, COLORS[1])
+        with self.cacher.open(key) as fp:
+            self.assertEqual(fp.read(), data)
+        self.assertEqual(self.renderer.get_metrics(),
+                         {"rendered": 1, "pending": 0, "coalesced": 0})
+
+    def test_coalesce(self):
+        # concurrent requests for one rendering share it:
+        future = Future()
+        barrier = threading.Barrier(8)
+        def render():
+            return self.renderer.render("key", self.filename,
+                                        (0, 0, 800, 600), (80, 60))
+        def render_together():
+            barrier.wait()
+            return render()
+        with mock.patch.object(self.renderer.pool, "submit",
+                               return_value=future) as submit:
+            with ThreadPoolExecutor(8) as executor:
+                results = [executor.submit(render_together)
+                           for i in range(8)]
+                results = [result.result() for result in results]
+            self.assertEqual(submit.call_count, 1)
+            self.assertTrue(all(result is future for result in results))
+            self.assertEqual(self.renderer.get_metrics(),
+                             {"rendered": 1, "pending": 1, "coalesced": 7})
+            # done, it is counted in the cache, and no longer shared:
+            future.set_result(b"rendered")
+            self.assertEqual(self.renderer.get_metrics()["pending"], 0)
+            self.assertIn("key", self.cacher)
+            self.assertEqual(self.cacher.size, len(b"rendered"))
+            submit.return_value = Future()
+            self.assertIsNot(render(), future)
+            self.assertEqual(submit.call_count, 2)
+        # a failed rendering is not cached:
+        failed = Future()
+        with mock.patch.object(self.renderer.pool, "submit",
+                               return_value=failed):
+            self.renderer.render("failed", self.filename, (0, 0, 800, 600),
+                                 (80, 60))
+        failed.set_exception(IOError("failed"))
+        self.assertNotIn("failed", self.cacher)
+
+    def test_draft(self):
+        # the JPEG decoder scales the image down by 1/8, and the region
+        # of the bottom right quarter is scaled with it:
+        cache_file = os.path.join(self.tmp_dir, "draft.jpg")
+        with mock.patch.object(imagehandler, "render_image",
+                               wraps=imagehandler.render_image) as render:
+            data = render_file(self.filename, cache_file, (400, 300, 400, 300),
+                               (40, 30), False, 0, "default", "JPEG", 90)
+        (image, box, size) = render.call_args[0][:3]
+        self.assertEqual(image.size, (100, 75))
+        self.assertEqual(box, (50, 37, 50, 37))
+        self.assertEqual(size, (40, 30))
+        self.assertColor(data, COLORS[3])
+        with open(cache_file, "rb") as fp:
+            self.assertEqual(fp.read(), data)
+        # as without draft:
+        with Image.open(self.filename) as image:
+            full = imagehandler.render_image(image, (400, 300, 400, 300),
+                                             (40, 30), False, 0, "default",
+                                             "JPEG", 90)
+        self.assertColor(data, get_color(full))
+        # not when the size is larger than the region:
+        with mock.patch.object(imagehandler, "render_image",
+                               wraps=imagehandler.render_image) as render:
+            render_file(self.filename, cache_file, (0, 0, 100, 100),
+                        (200, 200), False, 0, "default", "JPEG", 90)
+        self.assertEqual(render.call_args[0][0].size, (800, 600))
+        self.assertEqual(render.call_args[0][1], (0, 0, 100, 100))
+        # nor for other formats:
+        png = os.path.join(self.tmp_dir, "image.png")
+        make_image(png, (800, 600), "PNG")
+        with mock.patch.object(imagehandler, "render_image",
+                               wraps=imagehandler.render_image) as render:
+            data = render_file(png, cache_file, (400, 300, 400, 300),
+                               (40, 30), False, 0, "default", "JPEG", 90)
+        self.assertEqual(render.call_args[0][0].size, (800, 600))
+        self.assertColor(data, COLORS[3])
+
+if __name__ == "__main__":
+    unittest.main()
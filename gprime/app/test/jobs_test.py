@@ -0,0 +1,159 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+""" Tests for the background job queue """
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from gprime.dbstate import DbState
+from gprime.lib import Person, Name, Surname
+from gprime.app import jobs
+from gprime.app.jobs import (JobQueue, JobStore, QUEUED, RUNNING, DONE,
+                             FAILED)
+
+# An export quick enough to run in every test:
+EXPORT = "JSON Export"
+
+class JobQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.site_dir = tempfile.mkdtemp()
+        self.db = DbState().create_database(
+            os.path.join(self.site_dir, "database"), "Test")
+        self.add_person("I0000")
+        self.queue = None
+
+    def tearDown(self):
+        if self.queue:
+            self.queue.shutdown()
+        self.db.close(update=False)
+        shutil.rmtree(self.site_dir)
+
+    def add_person(self, gid):
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            person = Person()
+            person.gid = gid
+            person.primary_name = Name()
+            person.primary_name.surname_list.append(Surname())
+            person.primary_name.surname_list[0].surname = "Smith"
+            self.db.add_person(person, trans)
+
+    def get_queue(self):
+        if self.queue is None:
+            self.queue = JobQueue(self.db, self.site_dir, 1)
+        return self.queue
+
+    def wait(self, job_id):
+        queue = self.get_queue()
+        for i in range(600):
+            job = queue.get(job_id)
+            if job["status"] not in [QUEUED, RUNNING]:
+                return job
+            time.sleep(0.1)
+        self.fail("job %s did not end" % job_id)
+
+    def test_submit(self):
+        job_id = self.get_queue().submit("owner", "Export", EXPORT, {})
+        job = self.wait(job_id)
+        self.assertEqual(job["status"], DONE, job["error"])
+        self.assertEqual(job["username"], "owner")
+        self.assertEqual(job["progress"], 100)
+        self.assertEqual(os.path.dirname(job["output"]),
+                         self.queue.get_job_dir(job_id))
+        with open(job["output"], encoding="utf-8") as fp:
+            self.assertIn('"I0000"', fp.read())
+        self.assertIsNone(self.queue.get("missing"))
+
+    def test_cache_per_user(self):
+        queue = self.get_queue()
+        job_id = queue.submit("owner", "Export", EXPORT, {})
+        self.assertEqual(self.wait(job_id)["status"], DONE)
+        # the same user gets the same result:
+        self.assertEqual(queue.submit("owner", "Export", EXPORT, {}), job_id)
+        # another user gets a job of their own:
+        other_id = queue.submit("other", "Export", EXPORT, {})
+        self.assertNotEqual(other_id, job_id)
+        other = self.wait(other_id)
+        self.assertEqual(other["status"], DONE)
+        self.assertEqual(other["username"], "other")
+        self.assertNotEqual(other["output"], queue.get(job_id)["output"])
+        # nor is it reused once the database has changed:
+        self.add_person("I0001")
+        new_id = queue.submit("owner", "Export", EXPORT, {})
+        self.assertNotIn(new_id, [job_id, other_id])
+        with open(self.wait(new_id)["output"], encoding="utf-8") as fp:
+            self.assertIn('"I0001"', fp.read())
+        # imports always run:
+        self.assertIsNone(queue.get_cache_key("owner", "Import", "im_ged",
+                                              {}))
+
+    def test_progress(self):
+        queue = self.get_queue()
+        job_id = queue.store.add("owner", "Export", EXPORT, {})
+        progress = []
+        def export_file(database, filename, user):
+            for percentage in [25, 50, 75]:
+                user.callback(percentage)
+                progress.append(queue.get(job_id)["progress"])
+            self.assertEqual(queue.get(job_id)["status"], RUNNING)
+            with open(filename, "w") as fp:
+                fp.write("exported")
+            return True
+        # run here rather than in a worker, to follow each update:
+        with mock.patch("gprime.app.forms.actionform.export_file",
+                        export_file), \
+             mock.patch.object(jobs, "_DATABASE", None):
+            jobs.run_job(queue.store_file, job_id, queue.database_dir,
+                         queue.get_job_dir(job_id))
+            jobs._DATABASE.close(update=False)
+        self.assertEqual(progress, [25, 50, 75])
+        job = queue.get(job_id)
+        self.assertEqual((job["status"], job["progress"]), (DONE, 100))
+
+    def test_fail_unfinished(self):
+        os.makedirs(os.path.join(self.site_dir, "jobs"))
+        store = JobStore(os.path.join(self.site_dir, "jobs", "jobs.db"))
+        queued = store.add("owner", "Export", EXPORT, {})
+        running = store.add("owner", "Export", EXPORT, {})
+        store.update(running, status=RUNNING, progress=50)
+        done = store.add("owner", "Export", EXPORT, {})
+        store.update(done, status=DONE, progress=100)
+        old = store.add("owner", "Export", EXPORT, {})
+        store.update(old, created=time.time() - (jobs.JOB_DAYS + 1) * 86400)
+        os.makedirs(os.path.join(self.site_dir, "jobs", old))
+        # as the server starts again:
+        queue = self.get_queue()
+        for job_id in [queued, running]:
+            job = queue.get(job_id)
+            self.assertEqual(job["status"], FAILED)
+            self.assertEqual(job["error"], "Interrupted")
+            self.assertIsNotNone(job["finished"])
+        self.assertEqual(queue.get(done)["status"], DONE)
+        self.assertIsNone(queue.get(old))
+        self.assertFalse(os.path.exists(queue.get_job_dir(old)))
+
+if __name__ == "__main__":
+    unittest.main()
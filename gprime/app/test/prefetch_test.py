@@ -0,0 +1,184 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+""" Tests for the prefetching of the objects of tabs """
+
+import types
+import unittest
+from unittest import mock
+
+from gprime.db import make_database
+from gprime.lib import (Person, Name, Surname, Family, ChildRef, Event,
+                        EventRef, EventType, Place, Citation)
+from gprime.errors import HandleError
+from gprime.app.prefetch import Prefetcher
+from gprime.app.forms.familyform import FamilyForm
+from gprime.app.template_functions import (event_table, children_table,
+                                           citation_table)
+
+USER = "tester"
+
+class PrefetcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_database("inmemorydb")
+        self.db.load(None)
+        self.family = self.add_family(3)
+
+    def add(self, obj, trans):
+        getattr(self.db, "add_" + obj.__class__.__name__.lower())(obj, trans)
+        return obj
+
+    def add_family(self, children):
+        """
+        Add a family with events at places, children born on a date, and
+        citations, and return it.
+        """
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            family = Family()
+            for i in range(children):
+                place = Place()
+                place.name.value = "Town %d" % i
+                self.add(place, trans)
+                event = Event()
+                event.type = EventType(EventType.BIRTH)
+                event.description = "Birth %d" % i
+                event.date.set_yr_mon_day(1900 + i, 1, 2)
+                event.place = place.handle
+                self.add(event, trans)
+                child = Person()
+                child.primary_name = Name()
+                child.primary_name.first_name = "Child%d" % i
+                child.primary_name.surname_list.append(Surname())
+                child.primary_name.surname_list[0].surname = "Smith"
+                event_ref = EventRef()
+                event_ref.ref = event.handle
+                child.add_event_ref(event_ref)
+                child.set_birth_ref(event_ref)
+                self.add(child, trans)
+                child_ref = ChildRef()
+                child_ref.ref = child.handle
+                family.add_child_ref(child_ref)
+                marriage = Event()
+                marriage.type = EventType(EventType.MARRIAGE)
+                marriage.description = "Wedding %d" % i
+                marriage.place = place.handle
+                self.add(marriage, trans)
+                event_ref = EventRef()
+                event_ref.ref = marriage.handle
+                family.add_event_ref(event_ref)
+                citation = Citation()
+                citation.page = "Page %d" % i
+                self.add(citation, trans)
+                family.add_citation(citation.handle)
+            self.add(family, trans)
+        return family
+
+    def get_form(self, family):
+        app = types.SimpleNamespace(prefix="",
+                                    get_translate_func=lambda user: str,
+                                    make_url=lambda url: url,
+                                    can_add=lambda user: True,
+                                    can_edit=lambda user: True)
+        handler = types.SimpleNamespace(database=self.db, app=app,
+                                        current_user=USER)
+        return FamilyForm(handler, family)
+
+    def render(self, family):
+        form = self.get_form(family)
+        return [event_table(form, USER, "view"),
+                children_table(form, USER, "view"),
+                citation_table(form, USER, "view", family.citation_list)]
+
+    def render_counted(self, family, prefetch=True):
+        """
+        Render the tabs, and return them with the number of database
+        lookups: of one object, or of the objects of many handles.
+        """
+        with mock.patch.object(self.db, "_get_raw_data",
+                               wraps=self.db._get_raw_data) as one, \
+             mock.patch.object(self.db, "_get_raw_data_from_handles",
+                               wraps=self.db._get_raw_data_from_handles) as many:
+            if prefetch:
+                tabs = self.render(family)
+            else:
+                tabs = self.render_one_at_a_time(family)
+        return (tabs, one.call_count + many.call_count)
+
+    def render_one_at_a_time(self, family):
+        """
+        Render the tabs as they were before prefetching: with a lookup of
+        each object as its row is made, and the birth dates of
+        SimpleAccess.
+        """
+        form = self.get_form(family)
+        with mock.patch.object(Prefetcher, "prefetch"), \
+             mock.patch.object(Prefetcher, "load"), \
+             mock.patch.object(Prefetcher, "get",
+                               lambda objects, table, handle:
+                               self.db.get_from_name_and_handle(table,
+                                                                handle)), \
+             mock.patch.object(Prefetcher, "birth_date",
+                               lambda objects, person:
+                               form.sa.birth_date(person)):
+            return [event_table(form, USER, "view"),
+                    children_table(form, USER, "view"),
+                    citation_table(form, USER, "view", family.citation_list)]
+
+    def test_unchanged(self):
+        tabs = self.render(self.family)
+        self.assertEqual(tabs, self.render_one_at_a_time(self.family))
+        (events, children, citations) = tabs
+        for text in ["Wedding 2", "Marriage", "Town 2", "Primary"]:
+            self.assertIn(text, events)
+        for text in ["Child2", "Smith", "1902-01-02"]:
+            self.assertIn(text, children)
+        self.assertIn("Page 2", citations)
+
+    def test_lookups(self):
+        # the lookups do not grow with the rows:
+        lookups = self.render_counted(self.family)[1]
+        self.assertLessEqual(lookups, 8)
+        self.db.clear_cache()
+        self.assertEqual(self.render_counted(self.add_family(9))[1], lookups)
+        # as they did one at a time:
+        self.db.clear_cache()
+        self.assertGreater(
+            self.render_counted(self.add_family(9), prefetch=False)[1],
+            3 * 9)
+
+    def test_missing(self):
+        event_ref = EventRef()
+        event_ref.ref = "missing"
+        self.family.add_event_ref(event_ref)
+        objects = Prefetcher(self.db)
+        objects.prefetch(self.family)
+        # the others are loaded all the same:
+        self.assertEqual(objects.get("Citation",
+                                     self.family.citation_list[0]).page,
+                         "Page 0")
+        self.assertRaises(HandleError, objects.get, "Event", "missing")
+        self.assertRaises(HandleError, event_table,
+                          self.get_form(self.family), USER, "view")
+        self.assertIsNone(objects.get("Place", None))
+
+if __name__ == "__main__":
+    unittest.main()
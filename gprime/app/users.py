@@ -0,0 +1,118 @@
+#
+# gPrime - a web-based genealogy program
+#
+# Copyright (c) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+The settings of the users of the site, read from the database once per
+user, and kept until the database signals a change to the user.
+"""
+
+## Python imports
+import json
+import functools
+import threading
+
+DEFAULT_CSS = "Web_Mainz.css"
+
+@functools.lru_cache(maxsize=None)
+def get_locale(language):
+    """
+    Return the Locale of the language and its gettext, shared by all the
+    users of the language.
+    """
+    from gprime.utils.locale import Locale
+    glocale = Locale(lang=language)
+    return (glocale, glocale.translation.gettext)
+
+# Data of a user that does not change how pages render: what identifies
+# the user, and the objects made of the language:
+NOT_SETTINGS = {"gid", "password", "name", "email", "glocale", "_"}
+
+def get_settings_key(data):
+    """
+    Return a string of the data of a user, but that in NOT_SETTINGS.
+    """
+    def to_data(value):
+        if isinstance(value, (set, frozenset)):
+            return sorted(value, key=str)
+        return str(value)
+    return json.dumps({key: value for (key, value) in data.items()
+                       if key not in NOT_SETTINGS},
+                      sort_keys=True, default=to_data)
+
+class UserCache:
+    """
+    The data of each user (see get_user_data), with:
+
+    * "glocale" and "_" - the Locale and translation function of the
+      user's language
+    * "css" - the user's theme, or DEFAULT_CSS
+    * "permissions" - a frozenset of the user's permissions
+    * "settings" - a string of the user's settings, equal for users
+      whose pages render the same
+    """
+    def __init__(self, database):
+        self.database = database
+        self.lock = threading.Lock()
+        self.users = {}
+        # a user cleared while being loaded is not kept:
+        self.generation = 0
+        for signal in ["user-add", "user-update", "user-delete"]:
+            database.connect(signal, self.clear)
+
+    def get(self, user):
+        """
+        Return the data of the user, loaded from the database if needed.
+        """
+        data = self.users.get(user)
+        if data is None:
+            generation = self.generation
+            data = self.load(user)
+            with self.lock:
+                if generation == self.generation:
+                    self.users[user] = data
+        return data
+
+    def load(self, user):
+        from gprime.utils.locale import Locale, _
+        try:
+            data = dict(self.database.get_user_data(user) or {})
+        except Exception:
+            data = {}
+        if data.get("language"):
+            (data["glocale"], data["_"]) = get_locale(data["language"])
+        else:
+            data["language"] = "en"
+            data["glocale"] = Locale
+            data["_"] = _
+        data["css"] = data.get("css") or DEFAULT_CSS
+        data["permissions"] = frozenset(data.get("permissions") or ())
+        data["settings"] = get_settings_key(data)
+        return data
+
+    def clear(self, user=None):
+        """
+        Forget the data of the user, or of all users.
+        """
+        with self.lock:
+            self.generation += 1
+            if user is None:
+                self.users.clear()
+            else:
+                self.users.pop(user, None)
@@ -159,6 +159,8 @@ register('behavior.addons-url', "https://raw.githubusercontent.com/gramps-projec
 register('database.backend', 'dbapi')
 register('database.compress-backup', True)
 register('database.autobackup', True) ## make backup when exiting, if there are changes
+register('database.cache-size', 10000) ## objects kept in memory after reading by handle
+register('database.serializer', 'json') ## of new databases: json, or marshal (faster, not searched in SQL)
 
 register('export.proxy-order',
          [["privacy", 0],
@@ -32,6 +32,9 @@ from this class.
 #-------------------------------------------------------------------------
 import re
 import time
+import json
+import base64
+from collections import deque
 from operator import itemgetter
 import logging
 
@@ -60,6 +63,38 @@ def eval_order_by(order_by, obj, db):
         values.append(obj.get_field(field, db, ignore_errors=True))
     return values
 
+def make_cursor(order_by, keys, before=False):
+    """
+    Return an opaque token for the position of a row in a selection
+    ordered by order_by, keys being the row's values of the order_by
+    fields. The token selects the rows after the row, or before it.
+    """
+    keys = [key if key is None or isinstance(key, (str, int, float))
+            else str(key) for key in keys]
+    data = json.dumps({"order": order_by, "keys": keys, "before": before},
+                      separators=(",", ":"))
+    # without the padding, so that it can go in a URL as is:
+    return base64.urlsafe_b64encode(
+        data.encode("utf-8")).decode("ascii").rstrip("=")
+
+def read_cursor(cursor, order_by):
+    """
+    Return (keys, before) from a token made by make_cursor. Raises
+    ValueError if the token is invalid, or was made for another order.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(
+            (cursor + "=" * (-len(cursor) % 4)).encode("ascii")).decode(
+                "utf-8"))
+        order = [tuple(item) for item in data["order"]]
+        keys = data["keys"]
+        before = data["before"]
+    except Exception:
+        raise ValueError("invalid cursor: %r" % cursor)
+    if order != [tuple(item) for item in order_by] or len(keys) != len(order):
+        raise ValueError("cursor does not match the order of the selection")
+    return (keys, before)
+
 def sort_objects(objects, order_by, db):
     """
     Python-based sorting.
@@ -90,6 +125,10 @@ class DbReadBase:
     Gramps database object. This object is a base class for all
     database interfaces.  All methods raise NotImplementedError
     and must be implemented in the derived class as required.
+
+    The get_raw_*_data methods return data that belongs to the caller,
+    who may alter it; a database that caches raw data returns a copy
+    from them, and keeps the shared data for its own read-only use.
     """
 
     def __init__(self):
@@ -157,6 +196,40 @@ class DbReadBase:
         """
         raise NotImplementedError
 
+    def get_backlinks(self, handle, include_classes=None, after=None,
+                      limit=-1):
+        """
+        Return a list of (class_name, handle) tuples of the objects that
+        hold a reference to the object handle, ordered by class name and
+        handle, for paging through them.
+
+        :param after: (class_name, handle) of the last object of the
+            previous page; default None starts at the first object.
+        :param limit: the number of objects to return; -1 for all.
+
+        This default implementation sorts all the results of
+        find_backlink_handles. Backends can override this method to
+        read just the page.
+        """
+        backlinks = sorted(self.find_backlink_handles(handle,
+                                                      include_classes))
+        if after is not None:
+            backlinks = [backlink for backlink in backlinks
+                         if backlink > tuple(after)]
+        if limit != -1:
+            backlinks = backlinks[:limit]
+        return backlinks
+
+    def get_backlink_counts(self, handle):
+        """
+        Return a dictionary of the number of objects that hold a reference
+        to the object handle, by class name.
+        """
+        counts = {}
+        for (class_name, obj_handle) in self.find_backlink_handles(handle):
+            counts[class_name] = counts.get(class_name, 0) + 1
+        return counts
+
     def find_initial_person(self):
         """
         Returns first person in the database
@@ -688,6 +761,84 @@ class DbReadBase:
         """
         raise NotImplementedError
 
+    def get_from_handles(self, table, handles):
+        """
+        Return a list of the objects of the table with the given handles,
+        in the same order as the handles.
+
+        The default looks up one handle at a time; databases that can
+        fetch many objects in a single query override this.
+        """
+        handle_func = self.get_table_func(table, "handle_func")
+        return [handle_func(handle) for handle in handles]
+
+    def prefetch(self, table, handles):
+        """
+        Hint that the objects of the table with the given handles are
+        about to be looked up one at a time. Does nothing by default.
+        """
+        pass
+
+    def get_people_from_handles(self, handles):
+        """
+        Return a list of People from the list of handles, in the same order.
+        """
+        return self.get_from_handles("Person", handles)
+
+    def get_families_from_handles(self, handles):
+        """
+        Return a list of Families from the list of handles, in the same order.
+        """
+        return self.get_from_handles("Family", handles)
+
+    def get_events_from_handles(self, handles):
+        """
+        Return a list of Events from the list of handles, in the same order.
+        """
+        return self.get_from_handles("Event", handles)
+
+    def get_places_from_handles(self, handles):
+        """
+        Return a list of Places from the list of handles, in the same order.
+        """
+        return self.get_from_handles("Place", handles)
+
+    def get_sources_from_handles(self, handles):
+        """
+        Return a list of Sources from the list of handles, in the same order.
+        """
+        return self.get_from_handles("Source", handles)
+
+    def get_citations_from_handles(self, handles):
+        """
+        Return a list of Citations from the list of handles, in the same order.
+        """
+        return self.get_from_handles("Citation", handles)
+
+    def get_repositories_from_handles(self, handles):
+        """
+        Return a list of Repositories from the list of handles, in the same order.
+        """
+        return self.get_from_handles("Repository", handles)
+
+    def get_media_from_handles(self, handles):
+        """
+        Return a list of Media from the list of handles, in the same order.
+        """
+        return self.get_from_handles("Media", handles)
+
+    def get_notes_from_handles(self, handles):
+        """
+        Return a list of Notes from the list of handles, in the same order.
+        """
+        return self.get_from_handles("Note", handles)
+
+    def get_tags_from_handles(self, handles):
+        """
+        Return a list of Tags from the list of handles, in the same order.
+        """
+        return self.get_from_handles("Tag", handles)
+
     def get_repo_bookmarks(self):
         """
         Return the list of Repository handles in the bookmarks.
@@ -983,6 +1134,13 @@ class DbReadBase:
         """
         raise NotImplementedError
 
+    def iter_handles_by_gid(self, table):
+        """
+        Return an iterator over the handles of a primary table (such as
+        "Person"), ordered by GID
+        """
+        raise NotImplementedError
+
     def iter_media_handles(self):
         """
         Return an iterator over handles for Media in the database
@@ -1214,6 +1372,14 @@ class DbReadBase:
         """
         raise NotImplementedError
 
+    def get_last_changed(self):
+        """
+        Return the time of the last change committed to the database, to
+        tell if results computed from it are still current, or None if
+        unknown.
+        """
+        return None
+
     def _select(self, table, fields=None, start=0, limit=-1,
                 where=None, order_by=None):
         """
@@ -1381,6 +1547,84 @@ class DbReadBase:
             if get_count_only:
                 yield selected
 
+    def _select_page(self, table, fields=None, start=0, limit=-1,
+                     where=None, order_by=None, seek=None):
+        """
+        Return a list of the rows of a page of a select (see _select), and
+        the total number of rows matching where, whatever the page.
+
+        seek - (keys, before) to select the rows next to a row rather
+               than from start (see _seek_page)
+
+        The total is taken from the cache of totals if possible, or from
+        the page itself if it holds all the rows, else counted.
+        """
+        if seek:
+            rows = self._seek_page(table, fields, limit, where, order_by,
+                                   seek)
+        else:
+            rows = list(self._select(table, fields, start, limit, where,
+                                     order_by))
+        total = self._get_cached_total(table, where)
+        if total is None:
+            if (not seek and start == 0 and
+                    (limit == -1 or len(rows) < limit)):
+                total = len(rows)
+            else:
+                total = next(self._select(table, ["count(1)"], where=where))
+            self._set_cached_total(table, where, total)
+        return (rows, total)
+
+    def _seek_page(self, table, fields, limit, where, order_by, seek):
+        """
+        Return a list of the limit rows following a row in the selection,
+        or preceding it if before. The row is given by keys, its values
+        of the order_by fields, which must include "handle"; the rows
+        must have a handle too.
+
+        seek - (keys, before)
+
+        This default walks the selection up to the row. Databases that
+        can select from the keys directly override this.
+        """
+        (keys, before) = seek
+        handle = keys[[field for (field, direction)
+                       in order_by].index("handle")]
+        maxlen = None if limit == -1 else limit
+        rows = deque(maxlen=maxlen) if before else []
+        found = False
+        for row in self._select(table, fields, where=where,
+                                order_by=order_by):
+            if found:
+                if len(rows) == maxlen:
+                    break
+                rows.append(row)
+            elif (row["handle"] if isinstance(row, dict)
+                  else row.handle) == handle:
+                if before:
+                    break
+                found = True
+            elif before:
+                rows.append(row)
+        else:
+            if not found:
+                raise ValueError("the row of the cursor is no longer "
+                                 "in the selection")
+        return list(rows)
+
+    def _get_cached_total(self, table, where):
+        """
+        Return the number of rows of the table matching where, if known,
+        or None. Databases that keep totals override this.
+        """
+        return None
+
+    def _set_cached_total(self, table, where, total):
+        """
+        Keep the number of rows of the table matching where.
+        """
+        pass
+
     def _hash_name(self, table, name):
         """
         Used in SQL functions to eval expressions involving selected
@@ -2020,6 +2264,9 @@ class QuerySet:
         self.order_by = None
         self.limit_by = -1
         self.start = 0
+        self.cursor = None
+        self.next_cursor = None
+        self.previous_cursor = None
         self.needs_to_run = False
         self._class = self.database.get_table_func(self.table, "class_func")
 
@@ -2043,6 +2290,16 @@ class QuerySet:
         self.needs_to_run = True
         return self
 
+    def seek(self, cursor):
+        """
+        Select the rows next to the row a cursor was made from (see
+        page), rather than from a start position. Deep pages then cost
+        no more than the first one.
+        """
+        self.cursor = cursor
+        self.needs_to_run = True
+        return self
+
     def order(self, *args):
         """
         Put an ordering on the selection.
@@ -2092,6 +2349,66 @@ class QuerySet:
                                               limit=self.limit_by)
             return next(generator)
 
+    def page(self, *args):
+        """
+        Touch the database, returning a list of the selected rows, and
+        the total number of rows matching the where clause regardless of
+        start and limit.
+
+        The rows are ordered by handle after the order given, and hold
+        the order fields and handle too. Afterwards, next_cursor and
+        previous_cursor are tokens to give to seek for the next and
+        previous pages (None if there were no rows).
+        """
+        order_by = list(self.order_by or [])
+        if "handle" not in [field for (field, direction) in order_by]:
+            order_by.append(("handle", "ASC"))
+        if len(args) == 0:
+            args = None
+        else:
+            args = list(args) + [field for (field, direction) in order_by
+                                 if field not in args]
+        if self.generator:
+            raise Exception("Queries in invalid order")
+        seek = read_cursor(self.cursor, order_by) if self.cursor else None
+        (rows, total) = self.database._select_page(self.table,
+                                                   args,
+                                                   order_by=order_by,
+                                                   where=self.where_by,
+                                                   start=self.start,
+                                                   limit=self.limit_by,
+                                                   seek=seek)
+        if rows:
+            self.previous_cursor = make_cursor(
+                order_by, self._get_keys(rows[0], order_by), before=True)
+            self.next_cursor = make_cursor(
+                order_by, self._get_keys(rows[-1], order_by))
+        else:
+            self.previous_cursor = self.next_cursor = None
+        # Reset all criteria
+        self.where_by = None
+        self.order_by = None
+        self.limit_by = -1
+        self.start = 0
+        self.cursor = None
+        self.needs_to_run = False
+        return (rows, total)
+
+    def _get_keys(self, row, order_by):
+        """
+        Return the values of the order_by fields of a selected row.
+        """
+        if not isinstance(row, dict):
+            return eval_order_by(order_by, row, self.database)
+        keys = []
+        for (field, direction) in order_by:
+            if field in row:
+                keys.append(row[field])
+            else: # selected under its full name
+                keys.append(row.get(self.database._hash_name(
+                    self.table, field).replace("__", ".")))
+        return keys
+
     def _generate(self, args=None):
         """
         Create a generator from current options.
@@ -36,6 +36,8 @@ import ast
 import sys
 import datetime
 import glob
+import threading
+import copy
 
 #------------------------------------------------------------------------
 #
@@ -60,6 +62,7 @@ from gprime.db.dbconst import *
 from gprime.db import exceptions
 
 from gprime.utils.id import create_id
+from gprime.utils.lru import LRU
 from gprime.lib.researcher import Researcher
 from gprime.lib import (Tag, Media, Person, Family, Source, Citation, Event,
                             Place, Repository, Note, NameOriginType)
@@ -71,6 +74,11 @@ LOG = logging.getLogger(DBLOGNAME)
 SIGBASE = ('person', 'family', 'source', 'event', 'media',
            'place', 'repository', 'reference', 'note', 'tag', 'citation')
 
+# Seconds for which the number of rows matching a select is reused:
+TOTALS_CACHE_SECONDS = 60
+# Number of totals kept before they are all dropped:
+TOTALS_CACHE_SIZE = 1000
+
 def touch(fname, mode=0o666, dir_fd=None, **kwargs):
     ## After http://stackoverflow.com/questions/1158076/implement-touch-using-python
     if sys.version_info < (3, 3, 0):
@@ -170,6 +178,7 @@ class DbGenericUndo(DbUndo):
                 if key == REFERENCE_KEY:
                     self.undo_reference(new_data, handle, self.mapbase[key])
                 else:
+                    db.clear_cache(KEY_TO_CLASS_MAP[key], handle)
                     self.undo_data(new_data, handle, self.mapbase[key],
                                         db.emit, SIGBASE[key])
             self.db.transaction_backend_commit()
@@ -213,6 +222,7 @@ class DbGenericUndo(DbUndo):
             if key == REFERENCE_KEY:
                 self.undo_reference(old_data, handle, self.mapbase[key])
             else:
+                db.clear_cache(KEY_TO_CLASS_MAP[key], handle)
                 self.undo_data(old_data, handle, self.mapbase[key],
                                 db.emit, SIGBASE[key])
         # Notify listeners
@@ -453,6 +463,10 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
     # 4. Signal for change in person group name, parameters are
     __signals__['person-groupname-rebuild'] = (str, str)
 
+    # 5. Signals for changes in the user table, parameter is the username
+    __signals__.update(('user-'+op, (str,))
+                       for op in ['add', 'update', 'delete'])
+
     __callback_map = {}
 
     VERSION = (18, 0, 0)
@@ -738,11 +752,13 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
         self.modified   = 0
         self.txn = DbGenericTxn("DbGeneric Transaction", self)
         self.transaction = None
+        self._write_lock = threading.RLock()
         self.abort_possible = False
         self._bm_changes = 0
         self.has_changed = False
         self.surname_list = []
         self.owner = Researcher()
+        self.set_cache_size(config.get('database.cache-size'))
         if directory:
             self.load(directory)
 
@@ -759,6 +775,188 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
         else:
             return super().get_table_func(table, func)
 
+    def set_cache_size(self, size):
+        """
+        Set the number of objects whose raw data is kept in memory
+        after being read by handle, and empty the cache. Use 0 to
+        disable the cache.
+
+        The cache may be used from several threads at once; it is
+        guarded by a lock, and data read from the backend is only kept
+        if the cache was not cleared while it was being read.
+        """
+        self._cache_lock = threading.RLock()
+        self._cache_generation = 0
+        self._raw_cache = LRU(size)
+        self._totals = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def clear_cache(self, table=None, handle=None):
+        """
+        Clears the whole raw data cache if table is None, or the entry
+        for the handle in the table.
+        """
+        with self._cache_lock:
+            self._cache_generation += 1
+            if table is None:
+                self._raw_cache.clear()
+                self._totals.clear()
+            else:
+                if (table, handle) in self._raw_cache:
+                    del self._raw_cache[(table, handle)]
+                if self._totals:
+                    self._totals = {key: value for (key, value)
+                                    in self._totals.items()
+                                    if key[0] != table}
+
+    def _get_cached_total(self, table, where):
+        """
+        Return the number of rows of the table matching where, if counted
+        less than TOTALS_CACHE_SECONDS ago and the table has not changed
+        since, or None.
+        """
+        key = (table, repr(where))
+        with self._cache_lock:
+            if key in self._totals:
+                (counted, total) = self._totals[key]
+                if time.time() - counted < TOTALS_CACHE_SECONDS:
+                    return total
+                del self._totals[key]
+        return None
+
+    def _set_cached_total(self, table, where, total):
+        """
+        Keep the number of rows of the table matching where, for paging
+        through the same selection.
+        """
+        with self._cache_lock:
+            if len(self._totals) >= TOTALS_CACHE_SIZE:
+                self._totals.clear()
+            self._totals[(table, repr(where))] = (time.time(), total)
+
+    def get_cache_stats(self):
+        """
+        Return a dictionary of the raw data cache hits, misses, size and
+        capacity.
+        """
+        with self._cache_lock:
+            return {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "size": len(self._raw_cache.data),
+                "capacity": self._raw_cache.count,
+            }
+
+    def _get_raw_data(self, table, handle):
+        """
+        Return the raw data of the object with the handle in the table,
+        from the cache if possible, else from the backend's raw_func.
+
+        The returned data is shared with the cache and must not be
+        altered.
+        """
+        key = (table, handle)
+        with self._cache_lock:
+            if key in self._raw_cache:
+                self.cache_hits += 1
+                data = self._raw_cache[key]
+                # move to the most recently used position:
+                self._raw_cache[key] = data
+                return data
+            self.cache_misses += 1
+            generation = self._cache_generation
+        data = self.get_table_func(table, "raw_func")(handle)
+        if data:
+            with self._cache_lock:
+                if generation == self._cache_generation:
+                    self._raw_cache[key] = data
+        return data
+
+    def _copy_raw_data(self, table, handle):
+        """
+        Return a copy of the raw data of the object with the handle in
+        the table, which the caller may alter without changing the cache.
+        """
+        return copy.deepcopy(self._get_raw_data(table, handle))
+
+    def _get_raw_data_from_handles(self, table, handles):
+        """
+        Return a dictionary mapping the handles to the raw data of the
+        objects in the table, using the cache where possible and a single
+        backend request for the rest. Unknown handles are left out.
+
+        Handles still to be fetched are marked with None in the result,
+        which also skips duplicates.
+        """
+        result = {}
+        missing = []
+        with self._cache_lock:
+            for handle in handles:
+                key = (table, handle)
+                if handle in result:
+                    continue
+                elif key in self._raw_cache:
+                    self.cache_hits += 1
+                    result[handle] = data = self._raw_cache[key]
+                    self._raw_cache[key] = data
+                else:
+                    result[handle] = None
+                    missing.append(handle)
+            self.cache_misses += len(missing)
+            generation = self._cache_generation
+        if missing:
+            found = self._get_raw_data_from_backend(table, missing)
+            with self._cache_lock:
+                keep = generation == self._cache_generation
+                for handle in missing:
+                    data = found.get(handle)
+                    if data:
+                        if keep:
+                            self._raw_cache[(table, handle)] = data
+                        result[handle] = data
+                    else:
+                        del result[handle]
+        return result
+
+    def _get_raw_data_from_backend(self, table, handles):
+        """
+        Return a dictionary mapping the handles to the raw data of the
+        objects in the table, bypassing the cache. Backends override this
+        to read many objects in one query.
+        """
+        raw_func = self.get_table_func(table, "raw_func")
+        return {handle: raw_func(handle) for handle in handles}
+
+    def get_from_handles(self, table, handles):
+        """
+        Return a list of the objects of the table with the given handles,
+        in the same order as the handles. Raises a HandleError if any of
+        the handles is not found.
+        """
+        handles = [str(handle, "utf-8") if isinstance(handle, bytes)
+                   else handle for handle in handles]
+        class_func = self.get_table_func(table, "class_func")
+        raw_data = self._get_raw_data_from_handles(table, handles)
+        objects = []
+        for handle in handles:
+            if handle not in raw_data:
+                raise HandleError('Handle %s not found' % handle)
+            objects.append(class_func.create(raw_data[handle], self,
+                                             lazy=True))
+        return objects
+
+    def prefetch(self, table, handles):
+        """
+        Load the raw data of the objects of the table with the given
+        handles into the cache, so that looking them up one at a time
+        does not go back to the backend for each.
+        """
+        if self._raw_cache.count > 1:
+            self._get_raw_data_from_handles(table, [
+                str(handle, "utf-8") if isinstance(handle, bytes) else handle
+                for handle in handles])
+
     def reload(self):
         """
         Reload, and recreate tables (if necessary).
@@ -1170,7 +1368,7 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
             raise HandleError('Handle is None')
         if not handle:
             raise HandleError('Handle is empty')
-        data = self._get_raw_event_data(handle)
+        data = self._get_raw_data("Event", handle)
         if data:
             return Event.create(data, self)
         else:
@@ -1183,7 +1381,7 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
             raise HandleError('Handle is None')
         if not handle:
             raise HandleError('Handle is empty')
-        data = self._get_raw_family_data(handle)
+        data = self._get_raw_data("Family", handle)
         if data:
             return Family.create(data, self)
         else:
@@ -1196,7 +1394,7 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
             raise HandleError('Handle is None')
         if not handle:
             raise HandleError('Handle is empty')
-        data = self._get_raw_repository_data(handle)
+        data = self._get_raw_data("Repository", handle)
         if data:
             return Repository.create(data, self)
         else:
@@ -1209,7 +1407,7 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
             raise HandleError('Handle is None')
         if not handle:
             raise HandleError('Handle is empty')
-        data = self._get_raw_person_data(handle)
+        data = self._get_raw_data("Person", handle)
         if data:
             return Person.create(data, self)
         else:
@@ -1222,7 +1420,7 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
             raise HandleError('Handle is None')
         if not handle:
             raise HandleError('Handle is empty')
-        data = self._get_raw_place_data(handle)
+        data = self._get_raw_data("Place", handle)
         if data:
             return Place.create(data, self)
         else:
@@ -1235,7 +1433,7 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
             raise HandleError('Handle is None')
         if not handle:
             raise HandleError('Handle is empty')
-        data = self._get_raw_citation_data(handle)
+        data = self._get_raw_data("Citation", handle)
         if data:
             return Citation.create(data, self)
         else:
@@ -1248,7 +1446,7 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
             raise HandleError('Handle is None')
         if not handle:
             raise HandleError('Handle is empty')
-        data = self._get_raw_source_data(handle)
+        data = self._get_raw_data("Source", handle)
         if data:
             return Source.create(data, self)
         else:
@@ -1261,7 +1459,7 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
             raise HandleError('Handle is None')
         if not handle:
             raise HandleError('Handle is empty')
-        data = self._get_raw_note_data(handle)
+        data = self._get_raw_data("Note", handle)
         if data:
             return Note.create(data, self)
         else:
@@ -1274,7 +1472,7 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
             raise HandleError('Handle is None')
         if not handle:
             raise HandleError('Handle is empty')
-        data = self._get_raw_media_data(handle)
+        data = self._get_raw_data("Media", handle)
         if data:
             return Media.create(data, self)
         else:
@@ -1287,7 +1485,7 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
             raise HandleError('Handle is None')
         if not handle:
             raise HandleError('Handle is empty')
-        data = self._get_raw_tag_data(handle)
+        data = self._get_raw_data("Tag", handle)
         if data:
             return Tag.create(data, self)
         else:
@@ -1308,12 +1506,12 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
         cursor = self.get_table_func(class_.__name__,"cursor_func")
         if order_by is None:
             for data in cursor():
-                yield class_.create(data[1], self)
+                yield class_.create(data[1], self, lazy=True)
         else:
             # first build sort order:
             sorted_items = []
             for data in cursor():
-                obj = class_.create(data[1], self)
+                obj = class_.create(data[1], self, lazy=True)
                 # just use values and handle to keep small:
                 sorted_items.append((eval_order_by(order_by, obj, self), obj.handle))
             # next we sort by fields and direction
@@ -1342,6 +1540,16 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
     def iter_families(self, order_by=None):
         return self.iter_items(order_by, Family)
 
+    def iter_handles_by_gid(self, table):
+        """
+        Iterate over the handles of a primary table, ordered by GID
+        (and by handle for equal GIDs).
+        """
+        iter_func = self.get_table_func(table, "iter_func")
+        for (gid, handle) in sorted((obj.gid, obj.handle)
+                                    for obj in iter_func()):
+            yield handle
+
     def get_person_from_gid(self, gid):
         return Person.create(self.person_id_map[gid], self)
 
@@ -1469,52 +1677,52 @@ class DbGeneric(DbWriteBase, DbReadBase, UpdateCallback, Callback):
     def get_raw_person_data(self, handle):
         if isinstance(handle, bytes):
             handle = str(handle, "utf-8")
-        return self.person_map[handle]
+        return self._copy_raw_data("Person", handle)
 
     def get_raw_family_data(self, handle):
         if isinstance(handle, bytes):
             handle = str(handle, "utf-8")
-        return self.family_map[handle]
+        return self._copy_raw_data("Family", handle)
 
     def get_raw_citation_data(self, handle):
         if isinstance(handle, bytes):
             handle = str(handle, "utf-8")
-        return self.citation_map[handle]
+        return self._copy_raw_data("Citation", handle)
 
     def get_raw_source_data(self, handle):
         if isinstance(handle, bytes):
             handle = str(handle, "utf-8")
-        return self.source_map[handle]
+        return self._copy_raw_data("Source", handle)
 
     def get_raw_repository_data(self, handle):
         if isinstance(handle, bytes):
             handle = str(handle, "utf-8")
-        return self.repository_map[handle]
+        return self._copy_raw_data("Repository", handle)
 
     def get_raw_note_data(self, handle):
         if isinstance(handle, bytes):
             handle = str(handle, "utf-8")
-        return self.note_map[handle]
+        return self._copy_raw_data("Note", handle)
 
     def get_raw_place_data(self, handle):
         if isinstance(handle, bytes):
             handle = str(handle, "utf-8")
-        return self.place_map[handle]
+        return self._copy_raw_data("Place", handle)
 
     def get_raw_media_data(self, handle):
         if isinstance(handle, bytes):
             handle = str(handle, "utf-8")
-        return self.media_map[handle]
+        return self._copy_raw_data("Media", handle)
 
     def get_raw_tag_data(self, handle):
         if isinstance(handle, bytes):
             handle = str(handle, "utf-8")
-        return self.tag_map[handle]
+        return self._copy_raw_data("Tag", handle)
 
     def get_raw_event_data(self, handle):
         if isinstance(handle, bytes):
             handle = str(handle, "utf-8")
-        return self.event_map[handle]
+        return self._copy_raw_data("Event", handle)
 
     def add_person(self, person, trans, set_gid=True):
         if not person.handle:
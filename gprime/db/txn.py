@@ -178,7 +178,7 @@ class DbTxn(defaultdict):
         data is the tuple returned by the object's serialize method.
         """
         self.last = self.commitdb.append(
-            json.dumps((obj_type, trans_type, handle, old_data, new_data), 1))
+            json.dumps((obj_type, trans_type, handle, old_data, new_data)))
         if self.last is None:
             self.last = len(self.commitdb) -1
         if self.first is None:
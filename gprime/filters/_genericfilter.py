@@ -24,6 +24,13 @@
 Package providing filtering framework for GRAMPS.
 """
 
+#------------------------------------------------------------------------
+#
+# Python modules
+#
+#------------------------------------------------------------------------
+from itertools import islice
+
 #------------------------------------------------------------------------
 #
 # Gramps imports
@@ -41,6 +48,9 @@ from ..lib.media import Media
 from ..lib.note import Note
 from ..lib.tag import Tag
 
+# Number of objects of an id_list read from the database at a time:
+FETCH_BATCH_SIZE = 1000
+
 #-------------------------------------------------------------------------
 #
 # GenericFilter
@@ -129,6 +139,25 @@ class GenericFilter:
     def find_from_handle(self, db, handle):
         return db.get_person_from_handle(handle)
 
+    def find_from_handles(self, db, handles):
+        return db.get_people_from_handles(handles)
+
+    def iter_objects(self, db, id_list, tupleind=None):
+        """
+        Yield (data, obj) pairs for the items of id_list, reading the
+        objects from the database in batches of FETCH_BATCH_SIZE.
+        """
+        id_list = iter(id_list)
+        while True:
+            batch = list(islice(id_list, FETCH_BATCH_SIZE))
+            if not batch:
+                break
+            if tupleind is None:
+                handles = batch
+            else:
+                handles = [data[tupleind] for data in batch]
+            yield from zip(batch, self.find_from_handles(db, handles))
+
     def check_func(self, db, id_list, task, cb_progress=None, tupleind=None):
         final_list = []
 
@@ -141,12 +170,7 @@ class GenericFilter:
                     if task(db, obj) != self.invert:
                         final_list.append(handle)
         else:
-            for data in id_list:
-                if tupleind is None:
-                    handle = data
-                else:
-                    handle = data[tupleind]
-                obj = self.find_from_handle(db, handle)
+            for data, obj in self.iter_objects(db, id_list, tupleind):
                 if cb_progress:
                     cb_progress()
                 if task(db, obj) != self.invert:
@@ -167,12 +191,7 @@ class GenericFilter:
                     if val != self.invert:
                         final_list.append(handle)
         else:
-            for data in id_list:
-                if tupleind is None:
-                    handle = data
-                else:
-                    handle = data[tupleind]
-                obj = self.find_from_handle(db, handle)
+            for data, obj in self.iter_objects(db, id_list, tupleind):
                 if cb_progress:
                     cb_progress()
                 val = all(rule.apply(db, obj) for rule in flist if obj)
@@ -261,6 +280,9 @@ class GenericFamilyFilter(GenericFilter):
     def find_from_handle(self, db, handle):
         return db.get_family_from_handle(handle)
 
+    def find_from_handles(self, db, handles):
+        return db.get_families_from_handles(handles)
+
 class GenericEventFilter(GenericFilter):
 
     def __init__(self, source=None):
@@ -275,6 +297,9 @@ class GenericEventFilter(GenericFilter):
     def find_from_handle(self, db, handle):
         return db.get_event_from_handle(handle)
 
+    def find_from_handles(self, db, handles):
+        return db.get_events_from_handles(handles)
+
 class GenericSourceFilter(GenericFilter):
 
     def __init__(self, source=None):
@@ -289,6 +314,9 @@ class GenericSourceFilter(GenericFilter):
     def find_from_handle(self, db, handle):
         return db.get_source_from_handle(handle)
 
+    def find_from_handles(self, db, handles):
+        return db.get_sources_from_handles(handles)
+
 class GenericCitationFilter(GenericFilter):
 
     def __init__(self, source=None):
@@ -303,6 +331,9 @@ class GenericCitationFilter(GenericFilter):
     def find_from_handle(self, db, handle):
         return db.get_citation_from_handle(handle)
 
+    def find_from_handles(self, db, handles):
+        return db.get_citations_from_handles(handles)
+
 class GenericPlaceFilter(GenericFilter):
 
     def __init__(self, source=None):
@@ -317,6 +348,9 @@ class GenericPlaceFilter(GenericFilter):
     def find_from_handle(self, db, handle):
         return db.get_place_from_handle(handle)
 
+    def find_from_handles(self, db, handles):
+        return db.get_places_from_handles(handles)
+
 class GenericMediaFilter(GenericFilter):
 
     def __init__(self, source=None):
@@ -331,6 +365,9 @@ class GenericMediaFilter(GenericFilter):
     def find_from_handle(self, db, handle):
         return db.get_media_from_handle(handle)
 
+    def find_from_handles(self, db, handles):
+        return db.get_media_from_handles(handles)
+
 class GenericRepoFilter(GenericFilter):
 
     def __init__(self, source=None):
@@ -345,6 +382,9 @@ class GenericRepoFilter(GenericFilter):
     def find_from_handle(self, db, handle):
         return db.get_repository_from_handle(handle)
 
+    def find_from_handles(self, db, handles):
+        return db.get_repositories_from_handles(handles)
+
 class GenericNoteFilter(GenericFilter):
 
     def __init__(self, source=None):
@@ -359,6 +399,9 @@ class GenericNoteFilter(GenericFilter):
     def find_from_handle(self, db, handle):
         return db.get_note_from_handle(handle)
 
+    def find_from_handles(self, db, handles):
+        return db.get_notes_from_handles(handles)
+
 
 def GenericFilterFactory(namespace):
     if namespace == 'Person':
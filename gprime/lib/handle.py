@@ -19,12 +19,21 @@
 #
 
 class HandleClass(str):
-    def __init__(self, handle):
-        super(HandleClass, self).__init__()
+    """
+    A handle of a primary object. Subclasses, one per classname, are
+    made by Handle().
+    """
+    __slots__ = ()
 
     def join(self, database, handle):
         return database.get_table_func(self.classname,"handle_func")(handle)
 
+    def get_labels(self, _):
+        return self.classname
+
+    def __reduce__(self):
+        return (Handle, (self.classname, str(self)))
+
     @classmethod
     def get_schema(cls):
         from gprime.lib import (Person, Family, Event, Place, Source,
@@ -43,18 +52,26 @@ class HandleClass(str):
         }
         return tables[cls.classname].get_schema()
 
+# HandleClass subclasses, by classname:
+HANDLE_CLASSES = {}
+
+def get_handle_class(classname):
+    """
+    Return the HandleClass subclass for handles of classname, creating
+    it on first use.
+    """
+    try:
+        return HANDLE_CLASSES[classname]
+    except KeyError:
+        pass
+    cls = type("%sHandle" % classname, (HandleClass,),
+               {"__slots__": (), "classname": classname})
+    return HANDLE_CLASSES.setdefault(classname, cls)
+
 def Handle(_classname, handle):
     if handle is None:
         return None
-    class MyHandleClass(HandleClass):
-        """
-        Class created to have classname attribute.
-        """
-        classname = _classname
-        def get_labels(self, _):
-            return self.classname
-    h = MyHandleClass(handle)
-    return h
+    return get_handle_class(_classname)(handle)
 
 def __from_struct(struct):
     return struct
@@ -46,6 +46,81 @@ from gprime.errors import HandleError
 #-------------------------------------------------------------------------
 from ..const import LOCALE as glocale
 CODESET = glocale.encoding
+#-------------------------------------------------------------------------
+#
+# Lazy fields
+#
+#-------------------------------------------------------------------------
+class RawStruct:
+    """
+    Stand-in for a child object that was not built from its struct; it
+    only knows how to give the struct back.
+    """
+    __slots__ = ["struct"]
+
+    def __init__(self, struct):
+        self.struct = struct
+
+    def to_struct(self):
+        """
+        Return the struct this stand-in was made from.
+        """
+        return self.struct
+
+class LazyField:
+    """
+    Class attribute of a TableObject that builds the value of a field of
+    a lazily created object from its struct on first access.
+
+    As a non-data descriptor, it is only consulted while the instance
+    does not have the field yet; the value built is stored on the
+    instance, so later accesses (and assignments) are plain attributes.
+    """
+    def __init__(self, name, cls, is_list):
+        self.name = name
+        self.cls = cls
+        self.is_list = is_list
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        lazy_struct = obj.__dict__.get("_lazy_struct")
+        if lazy_struct is None or self.name not in lazy_struct:
+            raise AttributeError(self.name)
+        struct = lazy_struct[self.name]
+        if self.is_list:
+            value = [self.cls.from_struct(item) for item in struct]
+        else:
+            value = self.cls.from_struct(struct)
+        obj.__dict__[self.name] = value
+        return value
+
+def lazy_to_struct(to_struct):
+    """
+    Wrap the to_struct method of a TableObject class, so that fields of
+    a lazily created object which were never accessed are given back as
+    the structs they were read from, rather than being built first.
+    """
+    def wrapper(self):
+        lazy_struct = self.__dict__.get("_lazy_struct")
+        if not lazy_struct:
+            return to_struct(self)
+        names = [name for name in lazy_struct if name not in self.__dict__]
+        for name in names:
+            struct = lazy_struct[name]
+            if isinstance(struct, list):
+                self.__dict__[name] = [RawStruct(item) for item in struct]
+            else:
+                self.__dict__[name] = RawStruct(struct)
+        try:
+            return to_struct(self)
+        finally:
+            for name in names:
+                del self.__dict__[name]
+    wrapper.__name__ = to_struct.__name__
+    wrapper.__doc__ = to_struct.__doc__
+    return wrapper
+
 #-------------------------------------------------------------------------
 #
 # Table Object class
@@ -80,6 +155,66 @@ class TableObject(BaseObject):
             self.handle = None
             self.change = 0
 
+    @classmethod
+    def create(cls, struct, db=None, lazy=False):
+        """
+        Create a new instance from serialized data.
+
+        With lazy, the fields holding child objects (names, references,
+        dates, ...) are only built from the struct when they are first
+        accessed, and to_struct gives back the untouched ones as they
+        were read. This saves most of the work for objects of which only
+        a few fields are used, such as in lists and filters.
+        """
+        if not struct:
+            return None
+        if not lazy:
+            return super().create(struct, db)
+        fields = cls.get_lazy_fields()
+        lazy_struct = {key: value for (key, value) in struct.items()
+                       if key in fields and value}
+        obj = cls.from_struct({key: value for (key, value) in struct.items()
+                               if key not in lazy_struct})
+        for key in lazy_struct:
+            del obj.__dict__[key]
+        obj._lazy_struct = lazy_struct
+        obj.db = db
+        return obj
+
+    @classmethod
+    def get_lazy_fields(cls):
+        """
+        Return the names of the fields of this class that can be built
+        lazily: those holding child objects, or lists of them, stored in
+        an attribute of the same name.
+
+        The first call installs a LazyField for each of them on the class.
+        """
+        if "_lazy_fields" in cls.__dict__:
+            return cls._lazy_fields
+        default = cls()
+        fields = set()
+        for (key, ftype) in cls.get_schema().items():
+            is_list = isinstance(ftype, list)
+            if is_list:
+                ftype = ftype[0]
+            if not (isinstance(ftype, type) and
+                    hasattr(ftype, "from_struct") and
+                    key in default.__dict__ and
+                    not hasattr(cls, key)):
+                continue
+            value = default.__dict__[key]
+            if is_list and not isinstance(value, list):
+                continue
+            if not is_list and not isinstance(value, (ftype, type(None))):
+                continue
+            setattr(cls, key, LazyField(key, ftype, is_list))
+            fields.add(key)
+        if fields:
+            cls.to_struct = lazy_to_struct(cls.__dict__["to_struct"])
+        cls._lazy_fields = frozenset(fields)
+        return cls._lazy_fields
+
     def make_url(self, *args):
         retval = ""
         after_anchor = False
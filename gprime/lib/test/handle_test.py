@@ -0,0 +1,52 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2016 Gramps Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+""" Tests for handles """
+
+import pickle
+import unittest
+
+from ..handle import Handle, HandleClass
+
+class HandleTest(unittest.TestCase):
+
+    def test_handle_class(self):
+        handle = Handle("Person", "I0001")
+        self.assertIsInstance(handle, HandleClass)
+        self.assertEqual(handle, "I0001")
+        self.assertEqual(handle.classname, "Person")
+        self.assertEqual(handle.get_labels(None), "Person")
+        self.assertIsNone(Handle("Person", None))
+
+    def test_shared_classes(self):
+        self.assertIs(type(Handle("Person", "I0001")),
+                      type(Handle("Person", "I0002")))
+        self.assertIsNot(type(Handle("Person", "I0001")),
+                         type(Handle("Family", "F0001")))
+        self.assertFalse(hasattr(Handle("Person", "I0001"), "__dict__"))
+
+    def test_pickle(self):
+        handle = pickle.loads(pickle.dumps(Handle("Family", "F0001")))
+        self.assertEqual(handle, "F0001")
+        self.assertEqual(handle.classname, "Family")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2016 Gramps Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+""" Tests for lazily created objects """
+
+import unittest
+
+from  ..import (Person, Surname, Name, Family, ChildRef, Event, Date,
+                Place, PlaceName, Source, RepoRef, Note, StyledText,
+                Attribute, EventRef)
+
+class LazyTest(unittest.TestCase):
+
+    def make_objects(self):
+        person = Person()
+        person.handle = "P1"
+        person.gid = "I0001"
+        name = Name()
+        name.first_name = "John"
+        surname = Surname()
+        surname.surname = "Smith"
+        name.add_surname(surname)
+        person.set_primary_name(name)
+        person.add_alternate_name(Name(name))
+        event_ref = EventRef()
+        event_ref.ref = "E1"
+        person.add_event_ref(event_ref)
+        attribute = Attribute()
+        attribute.set_value("value")
+        person.add_attribute(attribute)
+        family = Family()
+        family.handle = "F1"
+        child_ref = ChildRef()
+        child_ref.ref = "P1"
+        family.add_child_ref(child_ref)
+        event = Event()
+        event.handle = "E1"
+        event.set_date_object(Date(1900, 1, 1))
+        place = Place()
+        place.handle = "PL1"
+        place_name = PlaceName()
+        place_name.set_value("Paris")
+        place.set_name(place_name)
+        source = Source()
+        source.handle = "S1"
+        repo_ref = RepoRef()
+        repo_ref.ref = "R1"
+        source.add_repo_reference(repo_ref)
+        note = Note()
+        note.handle = "N1"
+        note.set_styledtext(StyledText("text"))
+        return [person, family, event, place, source, note]
+
+    def test_round_trip(self):
+        for obj in self.make_objects():
+            struct = obj.to_struct()
+            lazy = obj.__class__.create(struct, lazy=True)
+            self.assertEqual(lazy.to_struct(), struct)
+            eager = obj.__class__.create(struct)
+            for field in obj.__class__.get_lazy_fields():
+                value = getattr(lazy, field)
+                if isinstance(value, list):
+                    self.assertEqual([item.to_struct() for item in value],
+                                     [item.to_struct()
+                                      for item in getattr(eager, field)])
+                else:
+                    self.assertEqual(value.to_struct(),
+                                     getattr(eager, field).to_struct())
+            self.assertEqual(lazy.to_struct(), struct)
+
+    def test_built_on_access(self):
+        person = self.make_objects()[0]
+        lazy = Person.create(person.to_struct(), lazy=True)
+        self.assertNotIn("primary_name", lazy.__dict__)
+        self.assertEqual(lazy.get_primary_name().get_surname(), "Smith")
+        self.assertIn("primary_name", lazy.__dict__)
+        self.assertNotIn("event_ref_list", lazy.__dict__)
+
+    def test_changes(self):
+        person = self.make_objects()[0]
+        lazy = Person.create(person.to_struct(), lazy=True)
+        lazy.primary_name.first_name = "Jane"
+        lazy.event_ref_list = []
+        struct = lazy.to_struct()
+        self.assertEqual(struct["primary_name"]["first_name"], "Jane")
+        self.assertEqual(struct["event_ref_list"], [])
+        self.assertEqual(struct["attribute_list"],
+                         person.to_struct()["attribute_list"])
+
+if __name__ == "__main__":
+    unittest.main()
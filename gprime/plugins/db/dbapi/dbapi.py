@@ -38,19 +38,45 @@ import logging
 #------------------------------------------------------------------------
 from gprime.db.base import eval_order_by
 from gprime.db.dbconst import (DBLOGNAME, DBBACKEND, KEY_TO_NAME_MAP,
+                                   KEY_TO_CLASS_MAP,
                                    TXNADD, TXNUPD, TXNDEL,
                                    PERSON_KEY, FAMILY_KEY, SOURCE_KEY,
                                    EVENT_KEY, MEDIA_KEY, PLACE_KEY, NOTE_KEY,
                                    TAG_KEY, CITATION_KEY, REPOSITORY_KEY)
 from gprime.db.generic import DbGeneric
+from gprime.config import config
+from gprime.plugins.db.dbapi.serializer import JSONSerializer, get_serializer
 from gprime.lib import (Tag, Media, Person, Family, Source,
                             Citation, Event, Place, Repository, Note)
+from gprime.lib.handle import HandleClass
+from gprime.errors import HandleError
 from gprime.const import LOCALE as glocale
 _ = glocale.translation.gettext
 
 LOG = logging.getLogger(".dbapi")
 _LOG = logging.getLogger(DBLOGNAME)
 
+# Number of primary objects read per batch when rebuilding the
+# reference map:
+REFERENCE_BATCH_SIZE = 1000
+# Indexed columns of the reference table:
+REFERENCE_INDEX_COLUMNS = ["obj_handle", "ref_handle"]
+# Index of the reference table for paging through the backlinks of an
+# object, in the order of get_backlinks:
+REFERENCE_BACKLINKS_INDEX = ("reference_backlinks",
+                             "ref_handle, obj_class, obj_handle")
+# Number of objects rewritten per batch by set_serializer:
+MIGRATE_BATCH_SIZE = 1000
+# Primary object tables, by class name:
+PRIMARY_TABLES = ["Person", "Family", "Event", "Place", "Source",
+                  "Citation", "Media", "Repository", "Note", "Tag"]
+# Largest limit of a select whose rows are read at once from a prepared
+# statement, rather than streamed:
+PREPARED_ROWS_LIMIT = 1000
+# Number of handles per "WHERE handle IN (...)" query; SQLite allows at
+# most 999 parameters by default:
+HANDLE_BATCH_SIZE = 500
+
 class DBAPI(DbGeneric):
     """
     Database backends class for DB-API 2.0 databases
@@ -172,6 +198,8 @@ class DBAPI(DbGeneric):
         Create and update schema.
         """
         from gprime.lib.struct import Table, Column
+        # table name -> (UPDATE statement, fields) of secondary columns:
+        self._secondary_updates = {}
         # make sure schema is up to date:
         for primary_obj in [Person, Family, Event, Citation, Repository,
                             Tag, Note, Place, Media, Source]:
@@ -225,9 +253,80 @@ class DBAPI(DbGeneric):
                     if not self.dbapi.index_exists(index_name):
                         self.dbapi.execute("""CREATE INDEX %s ON %s(%s);"""
                                            % (index_name, table.name, column.name))
+        if not self.dbapi.index_exists(REFERENCE_BACKLINKS_INDEX[0]):
+            self.dbapi.execute("CREATE INDEX %s ON reference(%s);"
+                               % REFERENCE_BACKLINKS_INDEX)
 
+        self.load_serializer()
         self.rebuild_secondary_fields()
 
+    def load_serializer(self):
+        """
+        Set the serializer of json_data from the metadata. A database
+        without a serializer recorded gets the one from the
+        database.serializer option if it is empty, or json otherwise.
+        """
+        marker = self.get_metadata("serializer", None)
+        if marker is None:
+            if any(self.get_table_func(table, "count_func")()
+                   for table in PRIMARY_TABLES):
+                name = JSONSerializer.name
+            else:
+                name = config.get('database.serializer')
+            self.serializer = get_serializer(
+                name, binary=getattr(self.dbapi, "supports_binary", False))
+            self.set_metadata("serializer",
+                              {"name": name,
+                               "state": self.serializer.get_state()})
+            self.dbapi.commit()
+        else:
+            self.serializer = get_serializer(marker["name"], marker["state"])
+
+    def set_serializer(self, name, callback=None):
+        """
+        Rewrite the json_data of all objects in place with the named
+        serializer, in a single transaction, and record it in the
+        metadata.
+
+        callback, if given, is called with the percentage of objects
+        rewritten.
+        """
+        serializer = get_serializer(
+            name, binary=getattr(self.dbapi, "supports_binary", False))
+        total = sum([self.get_table_func(table, "count_func")()
+                     for table in PRIMARY_TABLES])
+        count = 0
+        self.dbapi.begin()
+        try:
+            for table in PRIMARY_TABLES:
+                for rows in self._iter_json_data_batches(table.lower(),
+                                                         MIGRATE_BATCH_SIZE):
+                    self.dbapi.executemany(
+                        "UPDATE %s SET json_data = ? WHERE handle = ?;"
+                        % table.lower(),
+                        [(serializer.data_to_string(
+                            self.serializer.string_to_data(json_data)),
+                          handle)
+                         for (handle, json_data) in rows])
+                    count += len(rows)
+                    if callback:
+                        callback(int(100 * count / total))
+            self.set_metadata("serializer",
+                              {"name": name,
+                               "state": serializer.get_state()})
+        except:
+            self.dbapi.rollback()
+            raise
+        self.dbapi.commit()
+        self.serializer = serializer
+
+    def _supports_json_paths(self):
+        """
+        Return True if fields inside json_data can be used in SQL.
+        """
+        return (getattr(self.dbapi, "supports_json_paths", False) and
+                self.serializer.supports_json_paths)
+
     def close_backend(self):
         self.dbapi.close()
 
@@ -245,6 +344,7 @@ class DBAPI(DbGeneric):
         Executes a db END;
         """
         _LOG.debug("    DBAPI %s transaction commit", hex(id(self)))
+        self.set_metadata("last_changed", time.time())
         self.dbapi.commit()
 
     def transaction_backend_abort(self):
@@ -261,8 +361,14 @@ class DBAPI(DbGeneric):
         _LOG.debug("    %sDBAPI %s transaction begin for '%s'",
                    "Batch " if transaction.batch else "",
                    hex(id(self)), transaction.get_description())
+        # one writer at a time, when used from several threads:
+        self._write_lock.acquire()
+        try:
+            self.dbapi.begin()
+        except:
+            self._write_lock.release()
+            raise
         self.transaction = transaction
-        self.dbapi.begin()
         return transaction
 
     def transaction_commit(self, txn):
@@ -273,47 +379,62 @@ class DBAPI(DbGeneric):
                    "Batch " if txn.batch else "",
                    hex(id(self)), txn.get_description())
 
-        action = {TXNADD: "-add",
-                  TXNUPD: "-update",
-                  TXNDEL: "-delete",
-                  None: "-delete"}
-        if txn.batch:
-            self.build_surname_list()
-            # FIXME: need a User GUI update callback here:
-            self.reindex_reference_map(lambda percent: percent)
-        self.dbapi.commit()
-        if not txn.batch:
-            # Now, emit signals:
-            for (obj_type_val, txn_type_val) in list(txn):
-                if txn_type_val == TXNDEL:
-                    handles = [handle for (handle, data) in
-                               txn[(obj_type_val, txn_type_val)]]
-                else:
-                    handles = [handle for (handle, data) in
-                               txn[(obj_type_val, txn_type_val)]
-                               if (handle, None)
-                               not in txn[(obj_type_val, TXNDEL)]]
-                if handles:
-                    signal = KEY_TO_NAME_MAP[
-                        obj_type_val] + action[txn_type_val]
-                    self.emit(signal, (handles, ))
-        self.transaction = None
-        msg = txn.get_description()
-        self.undodb.commit(txn, msg)
-        self._after_commit(txn)
-        txn.clear()
-        self.has_changed = True
+        try:
+            action = {TXNADD: "-add",
+                      TXNUPD: "-update",
+                      TXNDEL: "-delete",
+                      None: "-delete"}
+            if txn.batch:
+                self.build_surname_list()
+                # FIXME: need a User GUI update callback here:
+                self.reindex_reference_map(lambda percent: percent)
+            self.set_metadata("last_changed", time.time())
+            self.dbapi.commit()
+            if txn.batch:
+                # Batch transactions are not recorded, so drop everything:
+                self.clear_cache()
+            else:
+                for (obj_type_val, txn_type_val) in list(txn):
+                    for (handle, data) in txn[(obj_type_val, txn_type_val)]:
+                        self.clear_cache(KEY_TO_CLASS_MAP[obj_type_val], handle)
+            if not txn.batch:
+                # Now, emit signals:
+                for (obj_type_val, txn_type_val) in list(txn):
+                    if txn_type_val == TXNDEL:
+                        handles = [handle for (handle, data) in
+                                   txn[(obj_type_val, txn_type_val)]]
+                    else:
+                        handles = [handle for (handle, data) in
+                                   txn[(obj_type_val, txn_type_val)]
+                                   if (handle, None)
+                                   not in txn[(obj_type_val, TXNDEL)]]
+                    if handles:
+                        signal = KEY_TO_NAME_MAP[
+                            obj_type_val] + action[txn_type_val]
+                        self.emit(signal, (handles, ))
+            self.transaction = None
+            msg = txn.get_description()
+            self.undodb.commit(txn, msg)
+            self._after_commit(txn)
+            txn.clear()
+            self.has_changed = True
+        finally:
+            self._write_lock.release()
 
     def transaction_abort(self, txn):
         """
         Executed after a batch operation abort.
         """
-        self.dbapi.rollback()
-        self.transaction = None
-        txn.clear()
-        txn.first = None
-        txn.last = None
-        self._after_commit(txn)
+        try:
+            self.dbapi.rollback()
+            self.clear_cache()
+            self.transaction = None
+            txn.clear()
+            txn.first = None
+            txn.last = None
+            self._after_commit(txn)
+        finally:
+            self._write_lock.release()
 
     def get_metadata(self, key, default=[]):
         """
@@ -338,6 +459,13 @@ class DBAPI(DbGeneric):
         else:
             return default
 
+    def get_last_changed(self):
+        """
+        Return the time of the last transaction committed, or 0 if none
+        was.
+        """
+        return self.get_metadata("last_changed", 0)
+
     def set_metadata(self, key, value):
         """
         key: string
@@ -382,11 +510,11 @@ class DBAPI(DbGeneric):
         If sort_handles is True, the list is sorted by surnames.
         """
         if sort_handles:
-            self.dbapi.execute("SELECT handle FROM person ORDER BY order_by;")
+            query = "SELECT handle FROM person ORDER BY order_by;"
         else:
-            self.dbapi.execute("SELECT handle FROM person;")
-        rows = self.dbapi.fetchall()
-        return [bytes(row[0], "utf-8") for row in rows]
+            query = "SELECT handle FROM person;"
+        return [bytes(row[0], "utf-8")
+                for row in self.dbapi.iter_rows(query)]
 
     def get_family_handles(self, sort_handles=False):
         """
@@ -396,7 +524,7 @@ class DBAPI(DbGeneric):
         If sort_handles is True, the list is sorted by surnames.
         """
         if sort_handles:
-            self.dbapi.execute("""SELECT f.handle FROM
+            query = """SELECT f.handle FROM
                                    (SELECT family.*
                                      FROM family LEFT JOIN
                                      person AS father
@@ -410,20 +538,19 @@ class DBAPI(DbGeneric):
                                               (case when family.handle is null
                                                     then mother.primary_name__first_name
                                                     else father.primary_name__first_name
-                                               end)) AS f;""")
+                                               end)) AS f;"""
         else:
-            self.dbapi.execute("SELECT handle FROM family;")
-        rows = self.dbapi.fetchall()
-        return [bytes(row[0], "utf-8") for row in rows]
+            query = "SELECT handle FROM family;"
+        return [bytes(row[0], "utf-8")
+                for row in self.dbapi.iter_rows(query)]
 
     def get_event_handles(self):
         """
         Return a list of database handles, one handle for each Event in the
         database.
         """
-        self.dbapi.execute("SELECT handle FROM event;")
-        rows = self.dbapi.fetchall()
-        return [bytes(row[0], "utf-8") for row in rows]
+        return [bytes(row[0], "utf-8")
+                for row in self.dbapi.iter_rows("SELECT handle FROM event;")]
 
     def get_citation_handles(self, sort_handles=False):
         """
@@ -433,11 +560,11 @@ class DBAPI(DbGeneric):
         If sort_handles is True, the list is sorted by Citation title.
         """
         if sort_handles:
-            self.dbapi.execute("SELECT handle FROM citation ORDER BY order_by;")
+            query = "SELECT handle FROM citation ORDER BY order_by;"
         else:
-            self.dbapi.execute("SELECT handle FROM citation;")
-        rows = self.dbapi.fetchall()
-        return [bytes(row[0], "utf-8") for row in rows]
+            query = "SELECT handle FROM citation;"
+        return [bytes(row[0], "utf-8")
+                for row in self.dbapi.iter_rows(query)]
 
     def get_source_handles(self, sort_handles=False):
         """
@@ -447,11 +574,11 @@ class DBAPI(DbGeneric):
         If sort_handles is True, the list is sorted by Source title.
         """
         if sort_handles:
-            self.dbapi.execute("SELECT handle FROM source ORDER BY order_by;")
+            query = "SELECT handle FROM source ORDER BY order_by;"
         else:
-            self.dbapi.execute("SELECT handle from source;")
-        rows = self.dbapi.fetchall()
-        return [bytes(row[0], "utf-8") for row in rows]
+            query = "SELECT handle from source;"
+        return [bytes(row[0], "utf-8")
+                for row in self.dbapi.iter_rows(query)]
 
     def get_place_handles(self, sort_handles=False):
         """
@@ -461,20 +588,20 @@ class DBAPI(DbGeneric):
         If sort_handles is True, the list is sorted by Place title.
         """
         if sort_handles:
-            self.dbapi.execute("SELECT handle FROM place ORDER BY order_by;")
+            query = "SELECT handle FROM place ORDER BY order_by;"
         else:
-            self.dbapi.execute("SELECT handle FROM place;")
-        rows = self.dbapi.fetchall()
-        return [bytes(row[0], "utf-8") for row in rows]
+            query = "SELECT handle FROM place;"
+        return [bytes(row[0], "utf-8")
+                for row in self.dbapi.iter_rows(query)]
 
     def get_repository_handles(self):
         """
         Return a list of database handles, one handle for each Repository in
         the database.
         """
-        self.dbapi.execute("SELECT handle FROM repository;")
-        rows = self.dbapi.fetchall()
-        return [bytes(row[0], "utf-8") for row in rows]
+        query = "SELECT handle FROM repository;"
+        return [bytes(row[0], "utf-8")
+                for row in self.dbapi.iter_rows(query)]
 
     def get_media_handles(self, sort_handles=False):
         """
@@ -484,20 +611,19 @@ class DBAPI(DbGeneric):
         If sort_handles is True, the list is sorted by title.
         """
         if sort_handles:
-            self.dbapi.execute("SELECT handle FROM media ORDER BY order_by;")
+            query = "SELECT handle FROM media ORDER BY order_by;"
         else:
-            self.dbapi.execute("SELECT handle FROM media;")
-        rows = self.dbapi.fetchall()
-        return [bytes(row[0], "utf-8") for row in rows]
+            query = "SELECT handle FROM media;"
+        return [bytes(row[0], "utf-8")
+                for row in self.dbapi.iter_rows(query)]
 
     def get_note_handles(self):
         """
         Return a list of database handles, one handle for each Note in the
         database.
         """
-        self.dbapi.execute("SELECT handle FROM note;")
-        rows = self.dbapi.fetchall()
-        return [bytes(row[0], "utf-8") for row in rows]
+        return [bytes(row[0], "utf-8")
+                for row in self.dbapi.iter_rows("SELECT handle FROM note;")]
 
     def get_tag_handles(self, sort_handles=False):
         """
@@ -507,11 +633,11 @@ class DBAPI(DbGeneric):
         If sort_handles is True, the list is sorted by Tag name.
         """
         if sort_handles:
-            self.dbapi.execute("SELECT handle FROM tag ORDER BY order_by;")
+            query = "SELECT handle FROM tag ORDER BY order_by;"
         else:
-            self.dbapi.execute("SELECT handle FROM tag;")
-        rows = self.dbapi.fetchall()
-        return [bytes(row[0], "utf-8") for row in rows]
+            query = "SELECT handle FROM tag;"
+        return [bytes(row[0], "utf-8")
+                for row in self.dbapi.iter_rows(query)]
 
     def get_tag_from_name(self, name):
         """
@@ -654,7 +780,7 @@ class DBAPI(DbGeneric):
                                                 WHERE handle = ?;""",
                                [person.gid,
                                 self._order_by_person_key(person),
-                                json.dumps(person.to_struct(), sort_keys=True),
+                                self.serializer.data_to_string(person.to_struct()),
                                 given_name,
                                 surname,
                                 gender_type,
@@ -670,8 +796,9 @@ class DBAPI(DbGeneric):
                 [person.handle,
                  self._order_by_person_key(person),
                  person.gid,
-                 json.dumps(person.to_struct(), sort_keys=True),
+                 self.serializer.data_to_string(person.to_struct()),
                  given_name, surname, gender_type])
+        self.clear_cache("Person", person.handle)
         self.update_secondary_values(person)
         if not trans.batch:
             self.update_backlinks(person)
@@ -728,7 +855,7 @@ class DBAPI(DbGeneric):
                                [family.gid,
                                 family.father_handle,
                                 family.mother_handle,
-                                json.dumps(family.to_struct(), sort_keys=True),
+                                self.serializer.data_to_string(family.to_struct()),
                                 family.handle])
         else:
             self.dbapi.execute(
@@ -739,7 +866,8 @@ class DBAPI(DbGeneric):
                  family.gid,
                  family.father_handle,
                  family.mother_handle,
-                 json.dumps(family.to_struct(), sort_keys=True)])
+                 self.serializer.data_to_string(family.to_struct())])
+        self.clear_cache("Family", family.handle)
         self.update_secondary_values(family)
         if not trans.batch:
             self.update_backlinks(family)
@@ -790,7 +918,7 @@ class DBAPI(DbGeneric):
                                                 WHERE handle = ?;""",
                                [citation.gid,
                                 self._order_by_citation_key(citation),
-                                json.dumps(citation.to_struct(), sort_keys=True),
+                                self.serializer.data_to_string(citation.to_struct()),
                                 citation.handle])
         else:
             self.dbapi.execute(
@@ -799,7 +927,8 @@ class DBAPI(DbGeneric):
                 [citation.handle,
                  self._order_by_citation_key(citation),
                  citation.gid,
-                 json.dumps(citation.to_struct(), sort_keys=True)])
+                 self.serializer.data_to_string(citation.to_struct())])
+        self.clear_cache("Citation", citation.handle)
         self.update_secondary_values(citation)
         if not trans.batch:
             self.update_backlinks(citation)
@@ -833,7 +962,7 @@ class DBAPI(DbGeneric):
                                                 WHERE handle = ?;""",
                                [source.gid,
                                 self._order_by_source_key(source),
-                                json.dumps(source.to_struct(), sort_keys=True),
+                                self.serializer.data_to_string(source.to_struct()),
                                 source.handle])
         else:
             self.dbapi.execute(
@@ -842,7 +971,8 @@ class DBAPI(DbGeneric):
                 [source.handle,
                  self._order_by_source_key(source),
                  source.gid,
-                 json.dumps(source.to_struct(), sort_keys=True)])
+                 self.serializer.data_to_string(source.to_struct())])
+        self.clear_cache("Source", source.handle)
         self.update_secondary_values(source)
         if not trans.batch:
             self.update_backlinks(source)
@@ -878,14 +1008,15 @@ class DBAPI(DbGeneric):
                                                     json_data = ?
                                                 WHERE handle = ?;""",
                                [repository.gid,
-                                json.dumps(repository.to_struct(), sort_keys=True),
+                                self.serializer.data_to_string(repository.to_struct()),
                                 repository.handle])
         else:
             self.dbapi.execute(
                 """INSERT INTO repository (handle, gid, json_data)
                                           VALUES(?, ?, ?);""",
                 [repository.handle, repository.gid,
-                 json.dumps(repository.to_struct(), sort_keys=True)])
+                 self.serializer.data_to_string(repository.to_struct())])
+        self.clear_cache("Repository", repository.handle)
         self.update_secondary_values(repository)
         if not trans.batch:
             self.update_backlinks(repository)
@@ -913,13 +1044,14 @@ class DBAPI(DbGeneric):
                                                     json_data = ?
                                                 WHERE handle = ?;""",
                                [note.gid,
-                                json.dumps(note.to_struct(), sort_keys=True),
+                                self.serializer.data_to_string(note.to_struct()),
                                 note.handle])
         else:
             self.dbapi.execute(
                 """INSERT INTO note (handle, gid, json_data)
                                     VALUES(?, ?, ?);""",
-                [note.handle, note.gid, json.dumps(note.to_struct(), sort_keys=True)])
+                [note.handle, note.gid, self.serializer.data_to_string(note.to_struct())])
+        self.clear_cache("Note", note.handle)
         self.update_secondary_values(note)
         if not trans.batch:
             self.update_backlinks(note)
@@ -946,7 +1078,7 @@ class DBAPI(DbGeneric):
                                                 WHERE handle = ?;""",
                                [place.gid,
                                 self._order_by_place_key(place),
-                                json.dumps(place.to_struct(), sort_keys=True),
+                                self.serializer.data_to_string(place.to_struct()),
                                 place.handle])
         else:
             self.dbapi.execute(
@@ -955,7 +1087,8 @@ class DBAPI(DbGeneric):
                 [place.handle,
                  self._order_by_place_key(place),
                  place.gid,
-                 json.dumps(place.to_struct(), sort_keys=True)])
+                 self.serializer.data_to_string(place.to_struct())])
+        self.clear_cache("Place", place.handle)
         self.update_secondary_values(place)
         if not trans.batch:
             self.update_backlinks(place)
@@ -989,7 +1122,7 @@ class DBAPI(DbGeneric):
                                                     json_data = ?
                                                 WHERE handle = ?;""",
                                [event.gid,
-                                json.dumps(event.to_struct(), sort_keys=True),
+                                self.serializer.data_to_string(event.to_struct()),
                                 event.handle])
         else:
             self.dbapi.execute(
@@ -997,7 +1130,8 @@ class DBAPI(DbGeneric):
                                      VALUES(?, ?, ?);""",
                 [event.handle,
                  event.gid,
-                 json.dumps(event.to_struct(), sort_keys=True)])
+                 self.serializer.data_to_string(event.to_struct())])
+        self.clear_cache("Event", event.handle)
         self.update_secondary_values(event)
         if not trans.batch:
             self.update_backlinks(event)
@@ -1029,7 +1163,7 @@ class DBAPI(DbGeneric):
             self.dbapi.execute("""UPDATE tag SET json_data = ?,
                                                  order_by = ?
                                          WHERE handle = ?;""",
-                               [json.dumps(tag.to_struct(), sort_keys=True),
+                               [self.serializer.data_to_string(tag.to_struct()),
                                 self._order_by_tag_key(tag.name),
                                 tag.handle])
         else:
@@ -1037,7 +1171,8 @@ class DBAPI(DbGeneric):
                                                   VALUES(?, ?, ?);""",
                                [tag.handle,
                                 self._order_by_tag_key(tag.name),
-                                json.dumps(tag.to_struct(), sort_keys=True)])
+                                self.serializer.data_to_string(tag.to_struct())])
+        self.clear_cache("Tag", tag.handle)
         self.update_secondary_values(tag)
         if not trans.batch:
             self.update_backlinks(tag)
@@ -1061,7 +1196,7 @@ class DBAPI(DbGeneric):
                                                 WHERE handle = ?;""",
                                [media.gid,
                                 self._order_by_media_key(media),
-                                json.dumps(media.to_struct(), sort_keys=True),
+                                self.serializer.data_to_string(media.to_struct()),
                                 media.handle])
         else:
             self.dbapi.execute(
@@ -1070,7 +1205,8 @@ class DBAPI(DbGeneric):
                 [media.handle,
                  self._order_by_media_key(media),
                  media.gid,
-                 json.dumps(media.to_struct(), sort_keys=True)])
+                 self.serializer.data_to_string(media.to_struct())])
+        self.clear_cache("Media", media.handle)
         self.update_secondary_values(media)
         if not trans.batch:
             self.update_backlinks(media)
@@ -1104,19 +1240,37 @@ class DBAPI(DbGeneric):
                            [obj_handle])
 
     def update_backlinks(self, obj):
-        # First, delete the current references:
-        self.dbapi.execute("DELETE FROM reference WHERE obj_handle = ?;",
-                           [obj.handle])
-        # Now, add the current ones:
+        """
+        Bring the reference rows of obj up to date.
+
+        The references currently stored for obj are compared with the
+        references it now holds, and only the difference is deleted and
+        inserted, so the work depends on the size of the change rather
+        than on the size of the object.
+        """
+        self.dbapi.execute(
+            "SELECT ref_class, ref_handle FROM reference WHERE obj_handle = ?;",
+            [obj.handle])
+        old_references = set([tuple(row) for row in self.dbapi.fetchall()])
         references = set(obj.get_referenced_handles_recursively())
-        for (ref_class_name, ref_handle) in references:
-            self.dbapi.execute("""INSERT INTO reference
+        removed = old_references - references
+        added = references - old_references
+        if removed:
+            self.dbapi.executemany("""DELETE FROM reference
+                                      WHERE obj_handle = ? AND
+                                            ref_class = ? AND
+                                            ref_handle = ?;""",
+                                   [(obj.handle, ref_class_name, ref_handle)
+                                    for (ref_class_name, ref_handle)
+                                    in removed])
+        if added:
+            self.dbapi.executemany("""INSERT INTO reference
                        (obj_handle, obj_class, ref_handle, ref_class)
                        VALUES(?, ?, ?, ?);""",
-                               [obj.handle,
-                                obj.__class__.__name__,
-                                ref_handle,
-                                ref_class_name])
+                                   [(obj.handle, obj.__class__.__name__,
+                                     ref_handle, ref_class_name)
+                                    for (ref_class_name, ref_handle)
+                                    in added])
         # This function is followed by a commit.
 
     def _do_remove(self, handle, transaction, data_map, data_id_map, key):
@@ -1142,6 +1296,7 @@ class DBAPI(DbGeneric):
             self.dbapi.execute(
                 "DELETE FROM %s WHERE handle = ?;" % key2table[key],
                 [handle])
+            self.clear_cache(KEY_TO_CLASS_MAP[key], handle)
             if not transaction.batch:
                 transaction.add(key, TXNDEL, handle, data, None)
 
@@ -1164,14 +1319,55 @@ class DBAPI(DbGeneric):
         """
         if isinstance(handle, bytes):
             handle = str(handle, "utf-8")
-        self.dbapi.execute(
+        rows = self.dbapi.iter_rows(
             "SELECT obj_class, obj_handle FROM reference WHERE ref_handle = ?;",
             [handle])
-        rows = self.dbapi.fetchall()
         for row in rows:
             if (include_classes is None) or (row[0] in include_classes):
                 yield (row[0], row[1])
 
+    def get_backlinks(self, handle, include_classes=None, after=None,
+                      limit=-1):
+        """
+        Return a list of (class_name, handle) tuples of the objects that
+        hold a reference to the object handle, ordered by class name and
+        handle, after the pair after if given (see
+        DbReadBase.get_backlinks).
+
+        The page is read from the reference_backlinks index, so later
+        pages cost no more than the first.
+        """
+        if isinstance(handle, bytes):
+            handle = str(handle, "utf-8")
+        params = [handle]
+        query = "SELECT obj_class, obj_handle FROM reference WHERE ref_handle = ?"
+        if include_classes is not None:
+            query += " AND obj_class IN (%s)" % ", ".join(
+                ["?"] * len(include_classes))
+            params.extend(include_classes)
+        if after is not None:
+            query += (" AND (obj_class > ? OR"
+                      " (obj_class = ? AND obj_handle > ?))")
+            params.extend([after[0], after[0], after[1]])
+        query += " ORDER BY obj_class, obj_handle"
+        if limit != -1:
+            query += " LIMIT ?"
+            params.append(limit)
+        self.dbapi.execute(query + ";", params)
+        return [(row[0], row[1]) for row in self.dbapi.fetchall()]
+
+    def get_backlink_counts(self, handle):
+        """
+        Return a dictionary of the number of objects that hold a reference
+        to the object handle, by class name.
+        """
+        if isinstance(handle, bytes):
+            handle = str(handle, "utf-8")
+        self.dbapi.execute("""SELECT obj_class, count(1) FROM reference
+                              WHERE ref_handle = ? GROUP BY obj_class;""",
+                           [handle])
+        return {row[0]: row[1] for row in self.dbapi.fetchall()}
+
     def find_initial_person(self):
         """
         Returns first person in the database
@@ -1195,11 +1391,9 @@ class DBAPI(DbGeneric):
         # first build sort order:
         sorted_items = []
         query = "SELECT json_data FROM %s;" % class_.__name__.lower()
-        self.dbapi.execute(query)
-        rows = self.dbapi.fetchall()
-        for row in rows:
-            obj = self.get_table_func(class_.__name__,
-                                      "class_func").create(json.loads(row[0])) # no need for db
+        for row in self.dbapi.iter_rows(query):
+            obj = self.get_table_func(class_.__name__, "class_func").create(
+                self.serializer.string_to_data(row[0]), lazy=True) # no need for db
             # just use values and handle to keep small:
             sorted_items.append((eval_order_by(order_by, obj, self),
                                  obj.handle))
@@ -1220,48 +1414,49 @@ class DBAPI(DbGeneric):
         Iterate over items in a class, possibly ordered by
         a list of field names and direction ("ASC" or "DESC").
         """
-        # check if order_by fields are secondary
-        # if so, fine
+        # check if order_by fields are secondary, or can be
+        # taken from json_data; if so, fine
         # else, use Python sorts
+        secondary_fields = [self._hash_name(class_.__name__, field)
+                            for (field, ptype)
+                            in class_.get_secondary_fields()]
         if order_by:
-            secondary_fields = class_.get_secondary_fields()
             if not self._check_order_by_fields(class_.__name__,
                                                order_by, secondary_fields):
                 for item in self.iter_items_order_by_python(order_by, class_):
                     yield item
                 return
         ## Continue with dbapi select
-        if order_by is None:
-            query = "SELECT json_data FROM %s;" % class_.__name__.lower()
-        else:
-            order_phrases = [
-                "%s %s" % (self._hash_name(class_.__name__,
-                                           class_.get_field_alias(field)),
-                           direction)
-                for (field, direction) in order_by]
-            query = "SELECT json_data FROM %s ORDER BY %s;" % (
-                class_.__name__.lower(), ", ".join(order_phrases))
-        self.dbapi.execute(query)
-        rows = self.dbapi.fetchall()
-        for row in rows:
-            yield class_.create(json.loads(row[0]), self)
+        query = "SELECT json_data FROM %s %s;" % (
+            class_.__name__.lower(),
+            self._build_order_clause(class_.__name__, order_by,
+                                     secondary_fields))
+        for row in self.dbapi.iter_rows(query):
+            yield class_.create(self.serializer.string_to_data(row[0]), self,
+                                lazy=True)
+
+    def iter_handles_by_gid(self, table):
+        """
+        Iterate over the handles of a primary table, ordered by GID (and
+        by handle for equal GIDs), as read from the index of the gid
+        column, without holding the handles of the table in memory.
+        """
+        query = "SELECT handle FROM %s ORDER BY gid, handle;" % table.lower()
+        for row in self.dbapi.iter_rows(query):
+            yield row[0]
 
     def iter_person_handles(self):
         """
         Return an iterator over handles for Persons in the database
         """
-        self.dbapi.execute("SELECT handle FROM person;")
-        rows = self.dbapi.fetchall()
-        for row in rows:
+        for row in self.dbapi.iter_rows("SELECT handle FROM person;"):
             yield row[0]
 
     def iter_family_handles(self):
         """
         Return an iterator over handles for Families in the database
         """
-        self.dbapi.execute("SELECT handle FROM family;")
-        rows = self.dbapi.fetchall()
-        for row in rows:
+        for row in self.dbapi.iter_rows("SELECT handle FROM family;"):
             yield row[0]
 
     def iter_citation_handles(self):
@@ -1269,111 +1464,150 @@ class DBAPI(DbGeneric):
         Return an iterator over database handles, one handle for each Citation
         in the database.
         """
-        self.dbapi.execute("SELECT handle FROM citation;")
-        rows = self.dbapi.fetchall()
-        for row in rows:
+        for row in self.dbapi.iter_rows("SELECT handle FROM citation;"):
             yield row[0]
 
     def iter_event_handles(self):
         """
         Return an iterator over handles for Events in the database
         """
-        self.dbapi.execute("SELECT handle FROM event;")
-        rows = self.dbapi.fetchall()
-        for row in rows:
+        for row in self.dbapi.iter_rows("SELECT handle FROM event;"):
             yield row[0]
 
     def iter_media_handles(self):
         """
         Return an iterator over handles for Media in the database
         """
-        self.dbapi.execute("SELECT handle FROM media;")
-        rows = self.dbapi.fetchall()
-        for row in rows:
+        for row in self.dbapi.iter_rows("SELECT handle FROM media;"):
             yield row[0]
 
     def iter_note_handles(self):
         """
         Return an iterator over handles for Notes in the database
         """
-        self.dbapi.execute("SELECT handle FROM note;")
-        rows = self.dbapi.fetchall()
-        for row in rows:
+        for row in self.dbapi.iter_rows("SELECT handle FROM note;"):
             yield row[0]
 
     def iter_place_handles(self):
         """
         Return an iterator over handles for Places in the database
         """
-        self.dbapi.execute("SELECT handle FROM place;")
-        rows = self.dbapi.fetchall()
-        for row in rows:
+        for row in self.dbapi.iter_rows("SELECT handle FROM place;"):
             yield row[0]
 
     def iter_repository_handles(self):
         """
         Return an iterator over handles for Repositories in the database
         """
-        self.dbapi.execute("SELECT handle FROM repository;")
-        rows = self.dbapi.fetchall()
-        for row in rows:
+        for row in self.dbapi.iter_rows("SELECT handle FROM repository;"):
             yield row[0]
 
     def iter_source_handles(self):
         """
         Return an iterator over handles for Sources in the database
         """
-        self.dbapi.execute("SELECT handle FROM source;")
-        rows = self.dbapi.fetchall()
-        for row in rows:
+        for row in self.dbapi.iter_rows("SELECT handle FROM source;"):
             yield row[0]
 
     def iter_tag_handles(self):
         """
         Return an iterator over handles for Tags in the database
         """
-        self.dbapi.execute("SELECT handle FROM tag;")
-        rows = self.dbapi.fetchall()
-        for row in rows:
+        for row in self.dbapi.iter_rows("SELECT handle FROM tag;"):
             yield row[0]
 
     def reindex_reference_map(self, callback):
         """
         Reindex all primary records in the database.
-        """
-        callback(4)
-        self.dbapi.execute("DELETE FROM reference;")
-        primary_table = (
-            (self.get_person_cursor, Person),
-            (self.get_family_cursor, Family),
-            (self.get_event_cursor, Event),
-            (self.get_place_cursor, Place),
-            (self.get_source_cursor, Source),
-            (self.get_citation_cursor, Citation),
-            (self.get_media_cursor, Media),
-            (self.get_repository_cursor, Repository),
-            (self.get_note_cursor, Note),
-            (self.get_tag_cursor, Tag),
-        )
-        # Now we use the functions and classes defined above
-        # to loop through each of the primary object tables.
-        for cursor_func, class_func in primary_table:
-            logging.info("Rebuilding %s reference map", class_func.__name__)
-            with cursor_func() as cursor:
-                for found_handle, val in cursor:
-                    obj = class_func.create(val) # no need for db
-                    references = set(obj.get_referenced_handles_recursively())
-                    # handle addition of new references
-                    for (ref_class_name, ref_handle) in references:
-                        self.dbapi.execute(
+
+        The reference table is rebuilt in bulk: its indexes are dropped,
+        the primary tables are read in batches of REFERENCE_BATCH_SIZE
+        rows, the references of each batch are written with a single
+        executemany, and the indexes are recreated at the end.
+
+        If the rebuild fails, the current transaction is rolled back, as
+        a failed transaction takes no more statements on some backends;
+        the indexes are then recreated, and the error of the rebuild is
+        raised.
+
+        callback is called with the percentage of objects processed.
+        """
+        callback(0)
+        try:
+            for (index, columns) in self._get_reference_indexes():
+                self.dbapi.drop_index(index, "reference")
+            self.dbapi.execute("DELETE FROM reference;")
+            total = sum([self.get_table_func(table, "count_func")()
+                         for table in PRIMARY_TABLES])
+            count = 0
+            for table in PRIMARY_TABLES:
+                logging.info("Rebuilding %s reference map", table)
+                class_func = self.get_table_func(table, "class_func")
+                for rows in self._iter_json_data_batches(table.lower(),
+                                                         REFERENCE_BATCH_SIZE):
+                    references = []
+                    for (handle, json_data) in rows:
+                        obj = class_func.create( # no need for db
+                            self.serializer.string_to_data(json_data))
+                        for (ref_class_name, ref_handle) in set(
+                                obj.get_referenced_handles_recursively()):
+                            references.append((obj.handle, table,
+                                               ref_handle, ref_class_name))
+                    if references:
+                        self.dbapi.executemany(
                             """INSERT INTO reference (obj_handle, obj_class,
                                                       ref_handle, ref_class)
                                                      VALUES(?, ?, ?, ?);""",
-                            [obj.handle,
-                             obj.__class__.__name__,
-                             ref_handle,
-                             ref_class_name])
-        callback(5)
+                            references)
+                    count += len(rows)
+                    callback(int(100 * count / total))
+        except:
+            try:
+                self.dbapi.rollback()
+                self._create_reference_indexes()
+            except Exception:
+                LOG.exception("Could not recreate the reference indexes")
+            raise
+        self._create_reference_indexes()
+        callback(100)
+
+    def _create_reference_indexes(self):
+        """
+        Create the indexes of the reference table, replacing those that
+        exist, as a failed rebuild may have dropped only some of them.
+        """
+        for (index, columns) in self._get_reference_indexes():
+            self.dbapi.drop_index(index, "reference")
+            self.dbapi.execute("CREATE INDEX %s ON reference(%s);"
+                               % (index, columns))
+
+    def _get_reference_indexes(self):
+        """
+        Return the (name, columns) of the indexes of the reference table.
+        """
+        return ([("reference_%s" % column, column)
+                 for column in REFERENCE_INDEX_COLUMNS] +
+                [REFERENCE_BACKLINKS_INDEX])
+
+    def _iter_json_data_batches(self, table_name, size):
+        """
+        Iterate over all (handle, json_data) rows of a primary table,
+        yielding lists of at most size rows.
+
+        Batches are selected by handle ranges, so that the connection's
+        cursor is free to be used by the caller between batches.
+        """
+        last_handle = ""
+        while True:
+            self.dbapi.execute(
+                "SELECT handle, json_data FROM %s WHERE handle > ? "
+                "ORDER BY handle LIMIT %s;" % (table_name, size),
+                [last_handle])
+            rows = self.dbapi.fetchall()
+            if not rows:
+                break
+            yield rows
+            last_handle = rows[-1][0]
 
     def rebuild_secondary(self, update):
         """
@@ -1386,7 +1620,7 @@ class DBAPI(DbGeneric):
         self.dbapi.execute("""select json_data from place;""")
         row = self.dbapi.fetchone()
         while row:
-            place = Place.create(json.loads(row[0])) # no need for db
+            place = Place.create(self.serializer.string_to_data(row[0])) # no need for db
             order_by = self._order_by_place_key(place)
             cur2 = self.dbapi.execute(
                 """UPDATE place SET order_by = ? WHERE handle = ?;""",
@@ -1396,7 +1630,7 @@ class DBAPI(DbGeneric):
         self.dbapi.execute("""select json_data from person;""")
         row = self.dbapi.fetchone()
         while row:
-            person = Person.create(json.loads(row[0])) # no need for db
+            person = Person.create(self.serializer.string_to_data(row[0])) # no need for db
             order_by = self._order_by_person_key(person)
             cur2 = self.dbapi.execute(
                 """UPDATE person SET order_by = ? WHERE handle = ?;""",
@@ -1406,7 +1640,7 @@ class DBAPI(DbGeneric):
         self.dbapi.execute("""select json_data from citation;""")
         row = self.dbapi.fetchone()
         while row:
-            citation = Citation.create(json.loads(row[0])) # no need for db
+            citation = Citation.create(self.serializer.string_to_data(row[0])) # no need for db
             order_by = self._order_by_citation_key(citation)
             cur2 = self.dbapi.execute(
                 """UPDATE citation SET order_by = ? WHERE handle = ?;""",
@@ -1416,7 +1650,7 @@ class DBAPI(DbGeneric):
         self.dbapi.execute("""select json_data from source;""")
         row = self.dbapi.fetchone()
         while row:
-            source = Source.create(json.loads(row[0])) # no need for db
+            source = Source.create(self.serializer.string_to_data(row[0])) # no need for db
             order_by = self._order_by_source_key(source)
             cur2 = self.dbapi.execute(
                 """UPDATE source SET order_by = ? WHERE handle = ?;""",
@@ -1426,7 +1660,7 @@ class DBAPI(DbGeneric):
         self.dbapi.execute("""select json_data from tag;""")
         row = self.dbapi.fetchone()
         while row:
-            tag = Tag.create(json.loads(row[0])) # no need for db
+            tag = Tag.create(self.serializer.string_to_data(row[0])) # no need for db
             order_by = self._order_by_tag_key(tag.name)
             cur2 = self.dbapi.execute(
                 """UPDATE tag SET order_by = ? WHERE handle = ?;""",
@@ -1436,7 +1670,7 @@ class DBAPI(DbGeneric):
         self.dbapi.execute("""select json_data from media;""")
         row = self.dbapi.fetchone()
         while row:
-            media = Media.create(json.loads(row[0])) # no need for db
+            media = Media.create(self.serializer.string_to_data(row[0])) # no need for db
             order_by = self._order_by_media_key(media)
             cur2 = self.dbapi.execute(
                 """UPDATE media SET order_by = ? WHERE handle = ?;""",
@@ -1585,6 +1819,21 @@ class DBAPI(DbGeneric):
         rows = self.dbapi.fetchall()
         return [row[0] for row in rows]
 
+    def _get_raw_data_from_backend(self, table, handles):
+        """
+        Fetch the raw data of many objects of the table, a batch of
+        handles per query.
+        """
+        result = {}
+        for i in range(0, len(handles), HANDLE_BATCH_SIZE):
+            batch = handles[i:i + HANDLE_BATCH_SIZE]
+            self.dbapi.execute(
+                "SELECT handle, json_data FROM %s WHERE handle IN (%s);" %
+                (table.lower(), ", ".join(["?"] * len(batch))), batch)
+            for (handle, json_data) in self.dbapi.fetchall():
+                result[handle] = self.serializer.string_to_data(json_data)
+        return result
+
     def _get_raw_person_data(self, key):
         if isinstance(key, bytes):
             key = str(key, "utf-8")
@@ -1592,14 +1841,14 @@ class DBAPI(DbGeneric):
             "SELECT json_data FROM person WHERE handle = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_person_from_id_data(self, key):
         self.dbapi.execute(
             "SELECT json_data FROM person WHERE gid = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_family_data(self, key):
         if isinstance(key, bytes):
@@ -1608,14 +1857,14 @@ class DBAPI(DbGeneric):
             "SELECT json_data FROM family WHERE handle = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_family_from_id_data(self, key):
         self.dbapi.execute(
             "SELECT json_data FROM family WHERE gid = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_source_data(self, key):
         if isinstance(key, bytes):
@@ -1624,14 +1873,14 @@ class DBAPI(DbGeneric):
             "SELECT json_data FROM source WHERE handle = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_source_from_id_data(self, key):
         self.dbapi.execute(
             "SELECT json_data FROM source WHERE gid = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_citation_data(self, key):
         if isinstance(key, bytes):
@@ -1640,14 +1889,14 @@ class DBAPI(DbGeneric):
             "SELECT json_data FROM citation WHERE handle = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_citation_from_id_data(self, key):
         self.dbapi.execute(
             "SELECT json_data FROM citation WHERE gid = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_event_data(self, key):
         if isinstance(key, bytes):
@@ -1656,14 +1905,14 @@ class DBAPI(DbGeneric):
             "SELECT json_data FROM event WHERE handle = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_event_from_id_data(self, key):
         self.dbapi.execute(
             "SELECT json_data FROM event WHERE gid = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_media_data(self, key):
         if isinstance(key, bytes):
@@ -1672,14 +1921,14 @@ class DBAPI(DbGeneric):
             "SELECT json_data FROM media WHERE handle = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_media_from_id_data(self, key):
         self.dbapi.execute(
             "SELECT json_data FROM media WHERE gid = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_place_data(self, key):
         if isinstance(key, bytes):
@@ -1688,14 +1937,14 @@ class DBAPI(DbGeneric):
             "SELECT json_data FROM place WHERE handle = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_place_from_id_data(self, key):
         self.dbapi.execute(
             "SELECT json_data FROM place WHERE gid = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_repository_data(self, key):
         if isinstance(key, bytes):
@@ -1704,7 +1953,7 @@ class DBAPI(DbGeneric):
             "SELECT json_data FROM repository WHERE handle = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_repository_from_id_data(self, key):
         if isinstance(key, bytes):
@@ -1713,7 +1962,7 @@ class DBAPI(DbGeneric):
             "SELECT json_data FROM repository WHERE handle = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_note_data(self, key):
         if isinstance(key, bytes):
@@ -1722,14 +1971,14 @@ class DBAPI(DbGeneric):
             "SELECT json_data FROM note WHERE handle = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_note_from_id_data(self, key):
         self.dbapi.execute(
             "SELECT json_data FROM note WHERE gid = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def _get_raw_tag_data(self, key):
         if isinstance(key, bytes):
@@ -1737,7 +1986,7 @@ class DBAPI(DbGeneric):
         self.dbapi.execute("SELECT json_data FROM tag WHERE handle = ?", [key])
         row = self.dbapi.fetchone()
         if row:
-            return json.loads(row[0])
+            return self.serializer.string_to_data(row[0])
 
     def get_surname_list(self):
         """
@@ -1901,22 +2150,58 @@ class DBAPI(DbGeneric):
         Does not commit.
         """
         table = item.__class__.__name__
-        fields = self.get_table_func(table, "class_func").get_secondary_fields()
-        fields = [field for (field, direction) in fields]
-        sets = []
+        (statement, fields) = self._get_secondary_update(table)
         values = []
-        for field in fields:
-            value = item.get_field(field, self, ignore_errors=True)
-            field = self._hash_name(item.__class__.__name__, field)
-            sets.append("%s = ?" % field)
-            values.append(value)
+        joined = {}
+        for (field, join) in fields:
+            if join:
+                # a path from another table, joined once per handle:
+                (name, handle_type, path) = join
+                handle = getattr(item, name)
+                if handle not in joined:
+                    try:
+                        joined[handle] = (handle_type.join(self, handle)
+                                          if handle else None)
+                    except HandleError:
+                        joined[handle] = None
+                obj = joined[handle]
+                values.append(obj.get_field(path, self, ignore_errors=True)
+                              if obj else None)
+            elif "." in field:
+                # a path into the object:
+                values.append(item.get_field(field, self, ignore_errors=True))
+            else:
+                values.append(getattr(item, field))
         if len(values) > 0:
-            table_name = table.lower()
-            self.dbapi.execute("UPDATE %s SET %s where handle = ?;"
-                               % (table_name, ", ".join(sets)),
-                               self._sql_cast_list(table, sets, values)
+            self.dbapi.execute(statement,
+                               self._sql_cast_list(table, fields, values)
                                + [item.handle])
 
+    def _get_secondary_update(self, table):
+        """
+        Return the UPDATE statement of the secondary columns of a table,
+        and the fields of its parameters, made once per table. Fields
+        from a referenced object come with (handle field, its type, the
+        path in the referenced object).
+        """
+        update = self._secondary_updates.get(table)
+        if update is None:
+            class_func = self.get_table_func(table, "class_func")
+            schema = class_func.get_schema()
+            fields = []
+            sets = []
+            for (field, direction) in class_func.get_secondary_fields():
+                (name, dot, path) = field.partition(".")
+                if path and isinstance(schema.get(name), HandleClass):
+                    fields.append((field, (name, schema[name], path)))
+                else:
+                    fields.append((field, None))
+                sets.append("%s = ?" % self._hash_name(table, field))
+            update = ("UPDATE %s SET %s where handle = ?;"
+                      % (table.lower(), ", ".join(sets)), fields)
+            self._secondary_updates[table] = update
+        return update
+
     def _sql_cast_list(self, table, fields, values):
         """
         Given a list of field names and values, return the values
@@ -1924,65 +2209,201 @@ class DBAPI(DbGeneric):
         """
         return [v if not isinstance(v, bool) else int(v) for v in values]
 
-    def _sql_repr(self, value):
+    def _sql_param(self, value):
         """
-        Given a Python value, turn it into a SQL value.
+        Given a Python value, turn it into a SQL parameter value.
         """
-        if value is True:
-            return "1"
-        elif value is False:
-            return "0"
+        if isinstance(value, bool):
+            return int(value)
         elif value is None:
-            return '""'
-        elif isinstance(value, list):
-            return repr(tuple(value))
+            return ""
         else:
-            return repr(value)
+            return value
 
-    def _build_where_clause_recursive(self, table, where):
+    def _build_condition(self, expression, db_op, value, params):
+        """
+        Build the SQL text comparing expression with value, appending
+        the value(s) to params.
+        """
+        if db_op in ["IS NULL", "IS NOT NULL"]:
+            return "(%s %s)" % (expression, db_op)
+        elif db_op in ["IS", "IS NOT"] and value is None:
+            return "(%s %s NULL)" % (expression, db_op)
+        elif isinstance(value, (list, tuple)):
+            params.extend([self._sql_param(v) for v in value])
+            return "(%s %s (%s))" % (expression, db_op,
+                                     ", ".join(["?"] * len(value)))
+        else:
+            params.append(self._sql_param(value))
+            return "(%s %s ?)" % (expression, db_op)
+
+    def _build_where_clause_recursive(self, table, where, params,
+                                      secondary_fields):
         """
         where - (field, op, value)
                - ["NOT", where]
                - ["AND", (where, ...)]
                - ["OR", (where, ...)]
+
+        Returns the SQL text with a placeholder for each value;
+        the values are appended to params, in order. Fields that
+        are not secondary fields are looked up in json_data.
         """
         if where is None:
             return ""
         elif len(where) == 3:
             field, db_op, value = where
-            return "(%s %s %s)" % (self._hash_name(table, field),
-                                   db_op, self._sql_repr(value))
+            hashed_field = self._hash_name(table, field)
+            if hashed_field in secondary_fields:
+                return self._build_condition(hashed_field, db_op, value,
+                                             params)
+            segments, ptype = self._json_path(table, field, db_op, value)
+            source = "json_data"
+            from_items = []
+            for (position, segment) in enumerate(segments[:-1]):
+                from_item, source = self.dbapi.json_each(
+                    source, segment, "json_each_%s" % position)
+                from_items.append(from_item)
+            condition = self._build_condition(
+                self.dbapi.json_extract(source, segments[-1], ptype),
+                db_op, value, params)
+            # A list matches if any of its items does; as in Python,
+            # an empty list is itself compared, and only differs:
+            for from_item in reversed(from_items):
+                if db_op in ["!=", "<>", "IS NOT"]:
+                    condition = ("(EXISTS (SELECT 1 FROM %s WHERE %s) OR "
+                                 "NOT EXISTS (SELECT 1 FROM %s))" % (
+                                     from_item, condition, from_item))
+                else:
+                    condition = "(EXISTS (SELECT 1 FROM %s WHERE %s))" % (
+                        from_item, condition)
+            return condition
         elif where[0] in ["AND", "OR"]:
-            parts = [self._build_where_clause_recursive(table, part)
+            parts = [self._build_where_clause_recursive(table, part, params,
+                                                        secondary_fields)
                      for part in where[1]]
             return "(%s)" % ((" %s " % where[0]).join(parts))
         else:
-            return "(NOT %s)" % self._build_where_clause_recursive(table,
-                                                                   where[1])
+            return "(NOT %s)" % self._build_where_clause_recursive(
+                table, where[1], params, secondary_fields)
 
-    def _build_where_clause(self, table, where):
+    def _build_where_clause(self, table, where, params, secondary_fields):
         """
         where - a list in where format
+        params - list to which the where values are appended
+        secondary_fields - hashed names of the fields with a column
         return - "WHERE conditions..."
         """
-        parts = self._build_where_clause_recursive(table, where)
+        parts = self._build_where_clause_recursive(table, where, params,
+                                                   secondary_fields)
         if parts:
             return "WHERE " + parts
         else:
             return ""
 
-    def _build_order_clause(self, table, order_by):
+    def _build_limit_clause(self, start, limit, params):
+        """
+        start - position to start
+        limit - count to get; -1 for all
+        params - list to which the limit values are appended
+
+        Only whether there is a limit and an offset shows in the
+        text, so that paging through results reuses one statement.
+        """
+        if limit == -1:
+            clause = "LIMIT -1"
+        else:
+            clause = "LIMIT ?"
+            params.append(limit)
+        if start:
+            clause += " OFFSET ?"
+            params.append(start)
+        return clause
+
+    def _build_order_clause(self, table, order_by, secondary_fields):
         """
         order_by - [(field, "ASC" | "DESC"), ...]
+        secondary_fields - hashed names of the fields with a column
         """
         if order_by:
-            order_clause = ", ".join(["%s %s" % (self._hash_name(table, field),
-                                                 dir)
-                                      for (field, dir) in order_by])
-            return "ORDER BY " + order_clause
+            order_phrases = []
+            for (field, direction) in order_by:
+                hashed_field = self._hash_name(table, field)
+                if hashed_field in secondary_fields:
+                    expression = hashed_field
+                else:
+                    segments, ptype = self._json_path(table, field)
+                    expression = self.dbapi.json_extract("json_data",
+                                                         segments[0], ptype)
+                order_phrases.append("%s %s" % (expression, direction))
+            return "ORDER BY " + ", ".join(order_phrases)
         else:
             return ""
 
+    def _json_path(self, table, field, db_op=None, value=None):
+        """
+        Resolve a field into its location within json_data.
+
+        Returns (segments, type) where segments is a list of paths, one
+        for each list that is iterated plus the path to the value itself;
+        each path is a list of keys and list positions. type is the
+        Python type of the value. Returns (None, None) if the value can't
+        be reached in json_data (for example, it needs a join) or can't
+        be compared in SQL.
+
+        db_op and value, if given, are the where operator and value the
+        field is compared with. A GrampsType is compared by its int value
+        or its string, following the type of value.
+        """
+        from gprime.lib.grampstype import GrampsType
+        from gprime.lib.handle import HandleClass
+        class_func = self.get_table_func(table, "class_func")
+        chain = class_func.get_field_alias(field).split(".")
+        segments = [[]]
+        path = class_func
+        in_list = False
+        for part in chain:
+            if part.isdigit():
+                if not in_list:
+                    return None, None
+                segments[-1].append(int(part))
+                in_list = False
+                continue
+            if in_list:
+                segments.append([])
+                in_list = False
+            if (isinstance(path, HandleClass) or
+                    not hasattr(path, "get_schema")):
+                return None, None
+            schema = path.get_schema()
+            if part not in schema or part == "_class":
+                return None, None
+            path = schema[part]
+            segments[-1].append(part)
+            if isinstance(path, (list, tuple)):
+                path = path[0]
+                in_list = True
+        if in_list:
+            segments.append([])
+        if isinstance(value, (list, tuple)) and value:
+            value = value[0]
+        if isinstance(path, HandleClass):
+            path = str
+        elif isinstance(path, type) and issubclass(path, GrampsType):
+            if isinstance(value, int) and not isinstance(value, bool):
+                segments[-1].append("value")
+                path = int
+            elif isinstance(value, str):
+                segments[-1].append("string")
+                path = str
+            else:
+                return None, None
+        if path not in [str, int, float, bool]:
+            return None, None
+        if len(segments) > 1 and db_op in ["IS NULL", "IS NOT NULL"]:
+            return None, None
+        return segments, path
+
     def _build_select_fields(self, table, select_fields, secondary_fields):
         """
         fields - [field, ...]
@@ -1998,21 +2419,28 @@ class DBAPI(DbGeneric):
 
     def _check_order_by_fields(self, table, order_by, secondary_fields):
         """
-        Check to make sure all order_by fields are defined. If not, then
-        we need to do the Python-based order.
+        Check to make sure all order_by fields can be ordered in SQL,
+        either as secondary fields or as single values in json_data.
+        If not, then we need to do the Python-based order.
 
         secondary_fields are hashed.
         """
         if order_by:
             for (field, directory) in order_by:
-                if self._hash_name(table, field) not in secondary_fields:
+                if self._hash_name(table, field) in secondary_fields:
+                    continue
+                if not self._supports_json_paths():
+                    return False
+                segments, ptype = self._json_path(table, field)
+                if segments is None or len(segments) > 1:
                     return False
         return True
 
     def _check_where_fields(self, table, where, secondary_fields):
         """
-        Check to make sure all where fields are defined. If not, then
-        we need to do the Python-based select.
+        Check to make sure all where fields can be selected in SQL,
+        either as secondary fields or as values in json_data. If not,
+        then we need to do the Python-based select.
 
         secondary_fields are hashed.
         """
@@ -2032,10 +2460,110 @@ class DBAPI(DbGeneric):
         elif len(where) == 3: # (name, db_op, value)
             (name, db_op, value) = where
             # just the ones we need for where
-            return self._hash_name(table, name) in secondary_fields
+            if self._hash_name(table, name) in secondary_fields:
+                return True
+            if not self._supports_json_paths():
+                return False
+            segments, ptype = self._json_path(table, name, db_op, value)
+            return segments is not None
+
+    def _get_secondary_fields(self, table):
+        """
+        Return the hashed names of the SQL columns of the table.
+        """
+        return ([self._hash_name(table, field)
+                 for (field, ptype)
+                 in self.get_table_func(
+                     table, "class_func").get_secondary_fields()]
+                + ["handle"])
+                # handle is a sql field, but not listed in secondaries
+
+    def _select_page(self, table, fields=None, start=0, limit=-1,
+                     where=None, order_by=None, seek=None):
+        """
+        Return a list of the rows of a page of a select (see _select), and
+        the total number of rows matching where, whatever the page.
+
+        When the total is not cached and the select can be done in SQL,
+        it comes with the page in a single query, from COUNT(*) OVER().
+        """
+        secondary_fields = self._get_secondary_fields(table)
+        if (seek or (fields and fields[0] == "count(1)") or
+                not getattr(self.dbapi, "supports_window_functions", False) or
+                self._get_cached_total(table, where) is not None or
+                not self._check_where_fields(table, where, secondary_fields) or
+                not self._check_order_by_fields(table, order_by,
+                                                secondary_fields)):
+            return super()._select_page(table, fields, start, limit, where,
+                                        order_by, seek)
+        rows = []
+        total = None
+        for (row, total) in self._select(table, fields, start, limit, where,
+                                         order_by, with_total=True):
+            rows.append(row)
+        if total is None: # past the last page
+            total = next(self._select(table, ["count(1)"], where=where))
+        self._set_cached_total(table, where, total)
+        return (rows, total)
+
+    def _seek_page(self, table, fields, limit, where, order_by, seek):
+        """
+        Return a list of the limit rows following a row in the selection,
+        or preceding it if before (see DbReadBase._seek_page).
+
+        When the order_by fields are all columns and where can be done in
+        SQL, the rows are selected with a where clause on the keys, so
+        that the database can start from its index rather than walk the
+        rows up to the position.
+        """
+        secondary_fields = self._get_secondary_fields(table)
+        if (not self._check_where_fields(table, where, secondary_fields) or
+                not all(self._hash_name(table, field) in secondary_fields
+                        for (field, direction) in order_by)):
+            return super()._seek_page(table, fields, limit, where, order_by,
+                                      seek)
+        (keys, before) = seek
+        seek_where = self._build_seek_where(order_by, keys, before)
+        if where:
+            seek_where = ["AND", [where, seek_where]]
+        if before:
+            order_by = [(field, "ASC" if direction == "DESC" else "DESC")
+                        for (field, direction) in order_by]
+        rows = list(self._select(table, fields, 0, limit, seek_where,
+                                 order_by))
+        if before:
+            rows.reverse()
+        return rows
+
+    def _build_seek_where(self, order_by, keys, before):
+        """
+        Return a where matching the rows that come after keys, the values
+        of the order_by fields of a row, or before them if before, in the
+        order of the database (where NULL sorts first or last).
+        """
+        nulls_first = getattr(self.dbapi, "nulls_first", True)
+        conditions = []
+        same = []
+        for ((field, direction), value) in zip(order_by, keys):
+            ascending = (direction != "DESC") != before
+            if value is None:
+                if ascending == nulls_first:
+                    past = (field, "IS NOT NULL", None)
+                else: # nothing comes after NULL
+                    past = None
+                equal = (field, "IS NULL", None)
+            else:
+                past = (field, ">" if ascending else "<", value)
+                if ascending != nulls_first:
+                    past = ["OR", [past, (field, "IS NULL", None)]]
+                equal = (field, "=", value)
+            if past is not None:
+                conditions.append(["AND", same + [past]] if same else past)
+            same = same + [equal]
+        return ["OR", conditions]
 
     def _select(self, table, fields=None, start=0, limit=-1,
-                where=None, order_by=None):
+                where=None, order_by=None, with_total=False):
         """
         Default implementation of a select for those databases
         that don't support SQL. Returns a list of dicts, total,
@@ -2050,13 +2578,10 @@ class DBAPI(DbGeneric):
                  ["OR",  [where, where, ...]]      |
                  ["NOT",  where]
         order_by - [[fieldname, "ASC" | "DESC"], ...]
+        with_total - yield (row, total) pairs, total being the number of
+                     rows matching where; only for selects done in SQL
         """
-        secondary_fields = ([self._hash_name(table, field)
-                             for (field, ptype)
-                             in self.get_table_func(
-                                 table, "class_func").get_secondary_fields()]
-                            + ["handle"])
-                        # handle is a sql field, but not listed in secondaries
+        secondary_fields = self._get_secondary_fields(table)
         # If no fields, then we need objects:
         # Check to see if where matches SQL fields:
         table_name = table.lower()
@@ -2083,28 +2608,33 @@ class DBAPI(DbGeneric):
             fields = hashed_fields
             select_fields = self._build_select_fields(table, fields,
                                                       secondary_fields)
-        where_clause = self._build_where_clause(table, where)
-        order_clause = self._build_order_clause(table, order_by)
+        params = []
+        where_clause = self._build_where_clause(table, where, params,
+                                                secondary_fields)
+        order_clause = self._build_order_clause(table, order_by,
+                                                secondary_fields)
+        limit_clause = self._build_limit_clause(start, limit, params)
         if get_count_only:
             select_fields = ["1"]
-        if start:
-            query = "SELECT %s FROM %s %s %s LIMIT %s, %s " % (
-                ", ".join(select_fields),
-                table_name, where_clause, order_clause, start, limit
-            )
-        else:
-            query = "SELECT %s FROM %s %s %s LIMIT %s" % (
-                ", ".join(select_fields),
-                table_name, where_clause, order_clause, limit
-            )
+        query = "SELECT %s FROM %s %s %s %s" % (
+            ", ".join(select_fields +
+                      (["COUNT(*) OVER()"] if with_total else [])),
+            table_name, where_clause, order_clause, limit_clause
+        )
         if get_count_only:
-            self.dbapi.execute("SELECT count(1) from (%s) AS temp_select;"
-                               % query)
+            self.dbapi.execute_prepared(
+                "SELECT count(1) from (%s) AS temp_select;" % query, params)
             rows = self.dbapi.fetchall()
             yield rows[0][0]
             return
-        self.dbapi.execute(query)
-        rows = self.dbapi.fetchall()
+        if 0 <= limit <= PREPARED_ROWS_LIMIT:
+            # A page, which is small enough to be read at once; a
+            # streamed query is not prepared, as a PostgreSQL cursor
+            # can only be declared for a SELECT, not for an EXECUTE:
+            self.dbapi.execute_prepared(query, params)
+            rows = self.dbapi.fetchall()
+        else:
+            rows = self.dbapi.iter_rows(query, params)
         for row in rows:
             if fields[0] != "json_data":
                 obj = None # don't build it if you don't need it
@@ -2117,19 +2647,24 @@ class DBAPI(DbGeneric):
                         if obj is None:  # we need it! create it and cache it:
                             obj = self.get_table_func(table,
                                                       "class_func").create( # no need for db
-                                                          json.loads(row[0]))
+                                                          self.serializer.string_to_data(row[0]),
+                                                          lazy=True)
                         # get the field, even if we need to do a join:
                         # FIXME: possible optimize:
                         #     do a join in select for this if needed:
                         field = field.replace("__", ".")
                         data[field] = obj.get_field(field, self,
                                                     ignore_errors=True)
-                yield data
+                result = data
+            else:
+                result = self.get_table_func(table,
+                                             "class_func").create(
+                                                 self.serializer.string_to_data(row[0]), self,
+                                                 lazy=True)
+            if with_total:
+                yield (result, row[-1])
             else:
-                obj = self.get_table_func(table,
-                                          "class_func").create(
-                                              json.loads(row[0]), self)
-                yield obj
+                yield result
 
     def get_summary(self):
         """
@@ -2166,6 +2701,7 @@ class DBAPI(DbGeneric):
                             data.get("email", old_data["email"]),
                             username])
         self.dbapi.commit()
+        self.emit('user-update', (username,))
 
     def add_user(self, username, password, permissions, data):
         """
@@ -2184,6 +2720,7 @@ class DBAPI(DbGeneric):
                             data.get("email", ""),
                            ])
         self.dbapi.commit()
+        self.emit('user-add', (username,))
 
     def decode_permissions(self, permissions):
         retval = set()
@@ -2251,3 +2788,4 @@ class DBAPI(DbGeneric):
         """
         self.dbapi.execute("DELETE FROM user WHERE username = ?;", [username])
         self.dbapi.commit()
+        self.emit('user-delete', (username,))
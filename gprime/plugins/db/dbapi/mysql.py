@@ -19,11 +19,27 @@
 #
 
 import MySQLdb
+import MySQLdb.cursors
 import re
+import threading
 
 MySQLdb.paramstyle = 'qmark' ## Doesn't work
 
+# Number of rows fetched at a time by iter_rows:
+FETCH_SIZE = 1000
+
 class MySQL:
+    ## Lists in JSON can't be iterated before MySQL 8 (JSON_TABLE);
+    ## fields not in columns are selected in Python:
+    supports_json_paths = False
+    ## Window functions, such as COUNT(*) OVER(), need MySQL 8;
+    ## totals are counted with a query of their own:
+    supports_window_functions = False
+    ## NULL sorts before any value in ascending order:
+    nulls_first = True
+    ## TEXT columns, such as json_data, only take text of their charset:
+    supports_binary = False
+
     @classmethod
     def get_summary(cls):
         """
@@ -39,10 +55,50 @@ class MySQL:
         }
         return summary
 
+    ## Each thread has a connection of its own:
+    threadsafe = True
+
     def __init__(self, *args, **kwargs):
-        self.connection = MySQLdb.connect(*args, **kwargs)
-        self.connection.autocommit(True)
-        self.cursor = self.connection.cursor()
+        self.args = args
+        self.kwargs = kwargs
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self._connect()
+
+    def _connect(self):
+        """
+        Set the connection and cursor of the current thread.
+        """
+        connection = MySQLdb.connect(*self.args, **self.kwargs)
+        connection.autocommit(True)
+        with self.lock:
+            self.connections.append(connection)
+        self.local.connection = connection
+        self.local.cursor = connection.cursor()
+        self.local.in_transaction = False
+
+    @property
+    def connection(self):
+        if not hasattr(self.local, "connection"):
+            self._connect()
+        return self.local.connection
+
+    @property
+    def cursor(self):
+        if not hasattr(self.local, "cursor"):
+            self._connect()
+        return self.local.cursor
+
+    @property
+    def in_transaction(self):
+        if not hasattr(self.local, "in_transaction"):
+            self._connect()
+        return self.local.in_transaction
+
+    @in_transaction.setter
+    def in_transaction(self, value):
+        self.local.in_transaction = value
 
     def _hack_query(self, query):
         ## Workaround: no qmark support:
@@ -72,25 +128,101 @@ class MySQL:
         query = self._hack_query(query)
         self.cursor.execute(query, args)
 
+    def execute_prepared(self, query, args=[]):
+        ## MySQLdb has no server-side prepared statements:
+        self.execute(query, args)
+
+    def executemany(self, query, args):
+        query = self._hack_query(query)
+        self.cursor.executemany(query, args)
+
     def fetchone(self):
         return self.cursor.fetchone()
 
     def fetchall(self):
         return self.cursor.fetchall()
 
+    def _get_stream_connection(self):
+        """
+        Return an idle streaming connection of the current thread,
+        connecting a new one only if they are all in use.
+        """
+        if not hasattr(self.local, "stream_connections"):
+            self.local.stream_connections = []
+        if self.local.stream_connections:
+            return self.local.stream_connections.pop()
+        connection = MySQLdb.connect(*self.args, **self.kwargs)
+        ## Each query sees the latest commits, as on the main connection:
+        connection.autocommit(True)
+        with self.lock:
+            self.connections.append(connection)
+        return connection
+
+    def iter_rows(self, query, args=[]):
+        """
+        Iterate over the rows of the query, fetching FETCH_SIZE rows at a
+        time from an unbuffered SSCursor.
+
+        An unbuffered result blocks its connection until it is read to
+        the end, so it is read on a streaming connection of the thread,
+        which is kept for the next call once the cursor is closed. Inside
+        a transaction that connection could not see the uncommitted rows;
+        the result is then buffered on a cursor of the main connection.
+        """
+        query = self._hack_query(query)
+        if self.in_transaction:
+            cursor = self.connection.cursor()
+            cursor.execute(query, args)
+            try:
+                yield from cursor.fetchall()
+            finally:
+                cursor.close()
+            return
+        connection = self._get_stream_connection()
+        idle = self.local.stream_connections
+        cursor = connection.cursor(MySQLdb.cursors.SSCursor)
+        try:
+            cursor.execute(query, args)
+            rows = cursor.fetchmany(FETCH_SIZE)
+            while rows:
+                yield from rows
+                rows = cursor.fetchmany(FETCH_SIZE)
+        finally:
+            ## Closing reads any rows left, freeing the connection:
+            cursor.close()
+            idle.append(connection)
+
     def commit(self):
         self.cursor.execute("COMMIT;");
+        self.in_transaction = False
 
     def begin(self):
         self.cursor.execute("BEGIN;");
+        self.in_transaction = True
 
     def rollback(self):
         self.connection.rollback()
+        self.in_transaction = False
 
     def table_exists(self, table):
         self.cursor.execute("SELECT COUNT(*) FROM information_schema.tables "
                             "WHERE table_name='%s';" % table)
         return self.fetchone()[0] != 0
 
+    def index_exists(self, index):
+        self.cursor.execute("SELECT COUNT(*) FROM information_schema.statistics "
+                            "WHERE table_schema = DATABASE() "
+                            "AND index_name = %s;", [index])
+        return self.fetchone()[0] != 0
+
+    def drop_index(self, index, table):
+        ## No DROP INDEX IF EXISTS in MySQL:
+        if self.index_exists(index):
+            self.cursor.execute("DROP INDEX %s ON %s;" % (index, table))
+
     def close(self):
-        self.connection.close()
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+        self.local = threading.local()
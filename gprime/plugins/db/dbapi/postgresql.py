@@ -19,11 +19,37 @@
 #
 
 import psycopg2
+import psycopg2.extensions
 import re
+import itertools
+import threading
 
 psycopg2.paramstyle = 'format'
 
+# Prepared statements kept per connection before they are all released:
+MAX_PREPARED_STATEMENTS = 100
+
+# Number of rows fetched at a time by iter_rows:
+FETCH_SIZE = 1000
+
+# Casts from the text of a JSON value to its Python type:
+JSON_CASTS = {
+    int: "::integer",
+    float: "::double precision",
+    bool: "::boolean::integer",
+}
+
+# A quoted literal, such as a JSON path, or a "desc" column name:
+DESC_COLUMN = re.compile("('[^']*')|desc")
+
 class Postgresql:
+    supports_json_paths = True
+    supports_window_functions = True
+    ## NULL sorts after any value in ascending order:
+    nulls_first = False
+    ## TEXT columns, such as json_data, only take text:
+    supports_binary = False
+
     @classmethod
     def get_summary(cls):
         """
@@ -39,15 +65,55 @@ class Postgresql:
         }
         return summary
 
+    ## Each thread has a connection of its own:
+    threadsafe = True
+
     def __init__(self, *args, **kwargs):
-        self.connection = psycopg2.connect(*args, **kwargs)
-        self.connection.autocommit = True
-        self.cursor = self.connection.cursor()
+        self.args = args
+        self.kwargs = kwargs
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self.cursor_number = itertools.count()
+        self._connect()
+
+    def _connect(self):
+        """
+        Set the connection, cursor and prepared statements of the
+        current thread.
+        """
+        connection = psycopg2.connect(*self.args, **self.kwargs)
+        connection.autocommit = True
+        with self.lock:
+            self.connections.append(connection)
+        self.local.connection = connection
+        self.local.cursor = connection.cursor()
+        self.local.statements = {}
+
+    @property
+    def connection(self):
+        if not hasattr(self.local, "connection"):
+            self._connect()
+        return self.local.connection
+
+    @property
+    def cursor(self):
+        if not hasattr(self.local, "cursor"):
+            self._connect()
+        return self.local.cursor
+
+    @property
+    def statements(self):
+        if not hasattr(self.local, "statements"):
+            self._connect()
+        return self.local.statements
 
     def _hack_query(self, query):
         query = query.replace("?", "%s")
         query = query.replace("REGEXP", "~")
-        query = query.replace("desc", "desc_")
+        ## desc is a keyword; leave the keys in JSON paths alone:
+        query = DESC_COLUMN.sub(lambda match: match.group(1) or "desc_",
+                                query)
         query = query.replace("BLOB", "bytea")
         ## LIMIT offset, count
         ## count can be -1, for all
@@ -77,6 +143,40 @@ class Postgresql:
             self.cursor.execute("rollback")
             raise
 
+    def execute_prepared(self, sql, args=None):
+        """
+        Execute sql as a server-side prepared statement, preparing
+        it on first use so that later calls skip parsing and planning.
+        """
+        name = self.statements.get(sql)
+        if name is None:
+            if len(self.statements) >= MAX_PREPARED_STATEMENTS:
+                self.cursor.execute("DEALLOCATE ALL;")
+                self.statements.clear()
+            name = "gprime_%d" % len(self.statements)
+            number = itertools.count(1)
+            prepared = re.sub("%s", lambda match: "$%d" % next(number),
+                              self._hack_query(sql).rstrip("; "))
+            try:
+                self.cursor.execute("PREPARE %s AS %s;" % (name, prepared))
+            except:
+                self.cursor.execute("rollback")
+                raise
+            self.statements[sql] = name
+        if args:
+            self.execute("EXECUTE %s (%s);" % (name, ", ".join(["?"] * len(args))),
+                         args)
+        else:
+            self.execute("EXECUTE %s;" % name)
+
+    def executemany(self, sql, args):
+        sql = self._hack_query(sql)
+        try:
+            self.cursor.executemany(sql, args)
+        except:
+            self.cursor.execute("rollback")
+            raise
+
     def fetchone(self):
         try:
             return self.cursor.fetchone()
@@ -86,6 +186,78 @@ class Postgresql:
     def fetchall(self):
         return self.cursor.fetchall()
 
+    def _get_stream_connection(self):
+        """
+        Return an idle streaming connection of the current thread,
+        connecting a new one only if they are all in use.
+        """
+        if not hasattr(self.local, "stream_connections"):
+            self.local.stream_connections = []
+        if self.local.stream_connections:
+            return self.local.stream_connections.pop()
+        ## Not in autocommit, so that a cursor can be declared in it:
+        connection = psycopg2.connect(*self.args, **self.kwargs)
+        with self.lock:
+            self.connections.append(connection)
+        return connection
+
+    def _fetch_declared(self, cursor, name, sql, args):
+        """
+        Declare the named cursor in the current transaction of the
+        cursor's connection, and iterate over its rows, fetching
+        FETCH_SIZE rows at a time. The named cursor is closed when
+        the iteration ends or is closed.
+        """
+        cursor.execute("DECLARE %s NO SCROLL CURSOR FOR %s" % (name, sql),
+                       args)
+        try:
+            while True:
+                cursor.execute("FETCH FORWARD %d FROM %s;" %
+                               (FETCH_SIZE, name))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            ## Unless the transaction has already ended or failed:
+            if (cursor.connection.get_transaction_status() ==
+                    psycopg2.extensions.TRANSACTION_STATUS_INTRANS):
+                cursor.execute("CLOSE %s;" % name)
+
+    def iter_rows(self, sql, args=None):
+        """
+        Run the query in a named, server-side cursor, and iterate over
+        the resulting rows, fetching FETCH_SIZE rows at a time.
+
+        A named cursor only lives in a transaction, which the commits
+        made while iterating must not end, so it is declared on a
+        streaming connection of the thread, in a transaction that is
+        ended once the rows are read; the connection is then kept for
+        the next call. Inside a transaction, that connection could not
+        see the uncommitted rows; the cursor is then declared in the
+        transaction of the main connection.
+        """
+        sql = self._hack_query(sql).rstrip("; ")
+        name = "gprime_cursor_%d" % next(self.cursor_number)
+        if (self.connection.get_transaction_status() !=
+                psycopg2.extensions.TRANSACTION_STATUS_IDLE):
+            cursor = self.connection.cursor()
+            try:
+                yield from self._fetch_declared(cursor, name, sql, args)
+            finally:
+                cursor.close()
+            return
+        connection = self._get_stream_connection()
+        idle = self.local.stream_connections
+        cursor = connection.cursor()
+        try:
+            yield from self._fetch_declared(cursor, name, sql, args)
+        finally:
+            cursor.close()
+            ## Nothing was written; this ends the transaction:
+            connection.rollback()
+            idle.append(connection)
+
     def begin(self):
         self.cursor.execute("BEGIN;")
 
@@ -93,12 +265,31 @@ class Postgresql:
         self.cursor.execute("COMMIT;")
 
     def rollback(self):
-        self.connection.rollback()
+        ## The connection is in autocommit, so psycopg2 would not end the
+        ## transaction of begin():
+        self.cursor.execute("ROLLBACK;")
 
     def table_exists(self, table):
         self.cursor.execute("SELECT COUNT(*) FROM information_schema.tables "
                             "WHERE table_name=%s;", [table])
         return self.fetchone()[0] != 0
 
+    def json_extract(self, expression, path, ptype):
+        return "((%s)::jsonb #>> '{%s}')%s" % (
+            expression, ",".join([str(part) for part in path]),
+            JSON_CASTS.get(ptype, ""))
+
+    def json_each(self, expression, path, alias):
+        return ("jsonb_array_elements((%s)::jsonb #> '{%s}') AS %s(value)"
+                % (expression, ",".join([str(part) for part in path]), alias),
+                "%s.value" % alias)
+
+    def drop_index(self, index, table):
+        self.cursor.execute("DROP INDEX IF EXISTS %s;" % index)
+
     def close(self):
-        self.connection.close()
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+        self.local = threading.local()
@@ -30,9 +30,13 @@ Backend for sqlite database.
 import sqlite3
 import logging
 import re
+import threading
 
 sqlite3.paramstyle = 'qmark'
 
+# Number of rows fetched at a time by iter_rows:
+FETCH_SIZE = 1000
+
 #-------------------------------------------------------------------------
 #
 # Sqlite class
@@ -43,6 +47,13 @@ class Sqlite:
     The Sqlite class is an interface between the DBAPI class which is the Gramps
     backend for the DBAPI interface and the sqlite3 python module.
     """
+    ## Window functions, such as COUNT(*) OVER(), came in sqlite 3.25:
+    supports_window_functions = sqlite3.sqlite_version_info >= (3, 25, 0)
+    ## NULL sorts before any value in ascending order:
+    nulls_first = True
+    ## bytes are stored as they are, even in TEXT columns:
+    supports_binary = True
+
     @classmethod
     def get_summary(cls):
         """
@@ -64,6 +75,11 @@ class Sqlite:
 
         This connects to a sqlite3 database and creates a cursor instance.
 
+        Each thread using the instance gets a connection and cursor of its
+        own, in WAL mode so that readers and the writer do not block each
+        other. An in-memory database only exists on its one connection,
+        which is then shared by all threads (threadsafe is False).
+
         :param args: arguments to be passed to the sqlite3 connect class at
                      creation.
         :type args: list
@@ -72,10 +88,55 @@ class Sqlite:
         :type kwargs: list
         """
         self.log = logging.getLogger(".sqlite")
-        self.connection = sqlite3.connect(*args, **kwargs)
-        self.cursor = self.connection.cursor()
+        self.args = args
+        self.kwargs = kwargs
+        self.threadsafe = ":memory:" not in args[:1]
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
         self.queries = {}
-        self.connection.create_function("regexp", 2, regexp)
+        try:
+            self.cursor.execute("SELECT json('{}');")
+            self.supports_json_paths = True
+        except sqlite3.OperationalError:
+            # sqlite3 was built without the JSON1 extension
+            self.supports_json_paths = False
+
+    def _connect(self):
+        """
+        Set the connection and cursor of the current thread.
+        """
+        with self.lock:
+            if self.threadsafe or not self.connections:
+                connection = sqlite3.connect(*self.args,
+                                             check_same_thread=False,
+                                             **self.kwargs)
+                connection.create_function("regexp", 2, regexp)
+                if self.threadsafe:
+                    connection.execute("PRAGMA journal_mode=WAL;")
+                self.connections.append(connection)
+            else:
+                connection = self.connections[0]
+        self.local.connection = connection
+        self.local.cursor = connection.cursor()
+
+    @property
+    def connection(self):
+        """
+        The connection of the current thread.
+        """
+        if not hasattr(self.local, "connection"):
+            self._connect()
+        return self.local.connection
+
+    @property
+    def cursor(self):
+        """
+        The cursor of the current thread.
+        """
+        if not hasattr(self.local, "cursor"):
+            self._connect()
+        return self.local.cursor
 
     def execute(self, *args, **kwargs):
         """
@@ -89,6 +150,36 @@ class Sqlite:
         self.log.debug(args)
         self.cursor.execute(*args, **kwargs)
 
+    def execute_prepared(self, *args, **kwargs):
+        """
+        Executes an SQL statement that is run repeatedly with different
+        parameters.
+
+        The sqlite3 module keeps a per-connection cache of compiled
+        statements keyed on the SQL text, so repeated statements are
+        neither parsed nor planned again.
+
+        :param args: arguments to be passed to the sqlite3 execute statement
+        :type args: list
+        :param kwargs: arguments to be passed to the sqlite3 execute statement
+        :type kwargs: list
+        """
+        self.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        """
+        Executes an SQL statement against all parameter sequences.
+
+        :param args: arguments to be passed to the sqlite3 executemany
+                     statement
+        :type args: list
+        :param kwargs: arguments to be passed to the sqlite3 executemany
+                       statement
+        :type kwargs: list
+        """
+        self.log.debug(args[0])
+        self.cursor.executemany(*args, **kwargs)
+
     def fetchone(self):
         """
         Fetches the next row of a query result set, returning a single sequence,
@@ -103,6 +194,30 @@ class Sqlite:
         """
         return self.cursor.fetchall()
 
+    def iter_rows(self, *args, **kwargs):
+        """
+        Executes an SQL query on a cursor of its own, and iterates over
+        the resulting rows, fetching FETCH_SIZE rows at a time.
+
+        The shared cursor stays free for other statements while the rows
+        are consumed.
+
+        :param args: arguments to be passed to the sqlite3 execute statement
+        :type args: list
+        :param kwargs: arguments to be passed to the sqlite3 execute statement
+        :type kwargs: list
+        """
+        self.log.debug(args)
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(*args, **kwargs)
+            rows = cursor.fetchmany(FETCH_SIZE)
+            while rows:
+                yield from rows
+                rows = cursor.fetchmany(FETCH_SIZE)
+        finally:
+            cursor.close()
+
     def begin(self):
         """
         Start a transaction manually. This transactions usually persist until
@@ -151,6 +266,52 @@ class Sqlite:
                      "WHERE type='index' AND name='%s';" % index)
         return self.fetchone()[0] != 0
 
+    def json_extract(self, expression, path, ptype):
+        """
+        Return the SQL expression for a value inside a JSON document.
+
+        :param expression: SQL expression of the JSON document.
+        :type expression: str
+        :param path: keys and list positions leading to the value.
+        :type path: list
+        :param ptype: Python type of the value.
+        :type ptype: type
+        :returns: SQL expression of the value.
+        :rtype: str
+        """
+        if not path:
+            return expression
+        return "json_extract(%s, '%s')" % (expression, json_path(path))
+
+    def json_each(self, expression, path, alias):
+        """
+        Return a table expression iterating over a JSON list.
+
+        :param expression: SQL expression of the JSON document.
+        :type expression: str
+        :param path: keys and list positions leading to the list.
+        :type path: list
+        :param alias: name of the table expression.
+        :type alias: str
+        :returns: the table expression, and the SQL expression of the
+                  current list item.
+        :rtype: tuple
+        """
+        return ("json_each(%s, '%s') AS %s" % (expression, json_path(path),
+                                               alias),
+                "%s.value" % alias)
+
+    def drop_index(self, index, table):
+        """
+        Drop the specified SQL database index, if it exists.
+
+        :param index: index name to drop.
+        :type index: str
+        :param table: table name the index belongs to.
+        :type table: str
+        """
+        self.execute("DROP INDEX IF EXISTS %s;" % index)
+
     def table_column_exists(self, table, column):
         """
         Test whether the specified SQL database table.column exists.
@@ -170,7 +331,23 @@ class Sqlite:
         Close the current database.
         """
         self.log.debug("closing database...")
-        self.connection.close()
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+        self.local = threading.local()
+
+def json_path(path):
+    """
+    Format a list of keys and list positions as a sqlite JSON path.
+
+    :param path: keys and list positions.
+    :type path: list
+    :returns: the JSON path, for example '$.primary_name.surname_list[0]'
+    :rtype: str
+    """
+    return "$" + "".join([("[%d]" if isinstance(part, int) else ".%s") % part
+                          for part in path])
 
 def regexp(expr, value):
     """
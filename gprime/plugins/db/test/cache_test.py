@@ -0,0 +1,110 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2016 Gramps Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+""" Tests for the raw data cache """
+
+import unittest
+
+from gprime.db import make_database
+from gprime.errors import HandleError
+from gprime.lib import Person, Name, Surname
+
+class RawCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        db = make_database("inmemorydb")
+        db.load(None)
+        with db.get_transaction_class()("Test", db, batch=True) as trans:
+            person = Person()
+            person.primary_name = Name()
+            person.primary_name.surname_list.append(Surname())
+            person.primary_name.surname_list[0].surname = "Smith"
+            person.gid = "I0001"
+            db.add_person(person, trans)
+        self.handle = person.handle
+        self.db = db
+
+    def test_hits_and_misses(self):
+        self.db.get_person_from_handle(self.handle)
+        self.db.get_person_from_handle(self.handle)
+        self.db.get_raw_person_data(self.handle)
+        stats = self.db.get_cache_stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["size"], 1)
+
+    def test_commit_invalidates(self):
+        person = self.db.get_person_from_handle(self.handle)
+        person.gid = "I0002"
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            self.db.commit_person(person, trans)
+        self.assertEqual(self.db.get_person_from_handle(self.handle).gid,
+                         "I0002")
+
+    def test_remove_invalidates(self):
+        self.db.get_person_from_handle(self.handle)
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            self.db.remove_person(self.handle, trans)
+        self.assertRaises(HandleError, self.db.get_person_from_handle,
+                          self.handle)
+
+    def test_get_from_handles(self):
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            person = Person()
+            person.gid = "I0002"
+            self.db.add_person(person, trans)
+        handles = [person.handle, self.handle, person.handle]
+        people = self.db.get_people_from_handles(handles)
+        self.assertEqual([obj.handle for obj in people], handles)
+        self.assertEqual(self.db.get_cache_stats()["misses"], 2)
+        self.db.get_people_from_handles(handles)
+        self.assertEqual(self.db.get_cache_stats()["hits"], 2)
+
+    def test_get_from_handles_missing(self):
+        self.assertRaises(HandleError, self.db.get_people_from_handles,
+                          [self.handle, "missing"])
+
+    def test_raw_data_copy(self):
+        data = self.db.get_raw_person_data(self.handle)
+        data["gid"] = "I0002"
+        data["primary_name"]["surname_list"][0]["surname"] = "Jones"
+        self.assertEqual(self.db.get_cache_stats()["size"], 1)
+        for data in [self.db.get_raw_person_data(self.handle),
+                     self.db._get_raw_data("Person", self.handle)]:
+            self.assertEqual(data["gid"], "I0001")
+            self.assertEqual(
+                data["primary_name"]["surname_list"][0]["surname"], "Smith")
+        self.assertEqual(self.db.get_person_from_handle(self.handle).gid,
+                         "I0001")
+
+    def test_disabled(self):
+        self.db.set_cache_size(0)
+        self.db.get_person_from_handle(self.handle)
+        self.db.get_person_from_handle(self.handle)
+        stats = self.db.get_cache_stats()
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["size"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
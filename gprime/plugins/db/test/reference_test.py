@@ -0,0 +1,174 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2016 Gramps Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+""" Tests for the DB-API reference map """
+
+import unittest
+
+from unittest import mock
+
+from gprime.db import make_database
+from gprime.lib import Person, Name, Surname, Family, ChildRef
+
+class ReferenceMapTest(unittest.TestCase):
+
+    def setUp(self):
+        db = make_database("inmemorydb")
+        db.load(None)
+        with db.get_transaction_class()("Test", db, batch=True) as trans:
+            self.people = []
+            for i in range(5):
+                person = Person()
+                person.primary_name = Name()
+                person.primary_name.surname_list.append(Surname())
+                person.primary_name.surname_list[0].surname = "Smith"
+                person.gid = "I%04d" % i
+                db.add_person(person, trans)
+                self.people.append(person)
+            family = Family()
+            family.gid = "F0001"
+            family.father_handle = self.people[0].handle
+            family.mother_handle = self.people[1].handle
+            for child in self.people[2:]:
+                childref = ChildRef()
+                childref.ref = child.handle
+                family.add_child_ref(childref)
+            db.add_family(family, trans)
+        self.family = family
+        self.db = db
+
+    def test_reindex_reference_map(self):
+        for person in self.people:
+            self.assertEqual(list(self.db.find_backlink_handles(person.handle)),
+                             [("Family", self.family.handle)])
+
+    def test_reindex_reference_map_progress(self):
+        progress = []
+        self.db.reindex_reference_map(progress.append)
+        self.assertEqual(progress[0], 0)
+        self.assertEqual(progress[-1], 100)
+        self.assertEqual(progress, sorted(progress))
+
+    def test_reindex_reference_map_indexes(self):
+        self.db.reindex_reference_map(lambda percent: None)
+        self.assertTrue(self.db.dbapi.index_exists("reference_obj_handle"))
+        self.assertTrue(self.db.dbapi.index_exists("reference_ref_handle"))
+        self.assertTrue(self.db.dbapi.index_exists("reference_backlinks"))
+
+    def test_reindex_reference_map_failure(self):
+        # the indexes are made again when the rebuild fails:
+        with mock.patch.object(self.db.dbapi, "executemany",
+                               side_effect=RuntimeError("failed")):
+            self.assertRaises(RuntimeError, self.db.reindex_reference_map,
+                              lambda percent: None)
+        self.assertTrue(self.db.dbapi.index_exists("reference_obj_handle"))
+        self.assertTrue(self.db.dbapi.index_exists("reference_backlinks"))
+        # and when a rebuild failed before making them:
+        self.db.dbapi.drop_index("reference_backlinks", "reference")
+        self.db.reindex_reference_map(lambda percent: None)
+        self.assertTrue(self.db.dbapi.index_exists("reference_backlinks"))
+        self.test_reindex_reference_map()
+
+    @mock.patch("gprime.plugins.db.dbapi.dbapi.REFERENCE_BATCH_SIZE", 2)
+    def test_reindex_reference_map_aborted(self):
+        # as on PostgreSQL, where a failed transaction takes no more
+        # statements until it is rolled back:
+        dbapi = self.db.dbapi
+        (execute, executemany, rollback) = (dbapi.execute, dbapi.executemany,
+                                            dbapi.rollback)
+        state = {"aborted": False, "calls": 0}
+        def aborted_execute(*args, **kwargs):
+            if state["aborted"]:
+                raise RuntimeError("current transaction is aborted")
+            return execute(*args, **kwargs)
+        def failing_executemany(*args, **kwargs):
+            state["calls"] += 1
+            # the references of the family, after those of the people:
+            if state["calls"] == 1:
+                state["aborted"] = True
+                raise RuntimeError("first error")
+            return executemany(*args, **kwargs)
+        def aborted_rollback():
+            state["aborted"] = False
+            rollback()
+        person = Person()
+        person.gid = "I0005"
+        with mock.patch.object(dbapi, "execute", aborted_execute), \
+             mock.patch.object(dbapi, "executemany", failing_executemany), \
+             mock.patch.object(dbapi, "rollback", aborted_rollback):
+            with self.assertRaisesRegex(RuntimeError, "^first error$"):
+                with self.db.get_transaction_class()("Test", self.db,
+                                                     batch=True) as trans:
+                    self.db.add_person(person, trans)
+        self.assertEqual(state["calls"], 1)
+        # the batch was rolled back, and the indexes made again:
+        self.assertIsNone(self.db.get_person_from_gid("I0005"))
+        self.assertTrue(dbapi.index_exists("reference_obj_handle"))
+        self.assertTrue(dbapi.index_exists("reference_backlinks"))
+        self.test_reindex_reference_map()
+
+    def test_update_backlinks(self):
+        self.db.dbapi.execute("SELECT rowid, ref_handle FROM reference;")
+        rowids = dict([(handle, rowid)
+                       for (rowid, handle) in self.db.dbapi.fetchall()])
+        self.family.remove_child_handle(self.people[4].handle)
+        self.family.father_handle = None
+        self.db.update_backlinks(self.family)
+        self.assertEqual(list(self.db.find_backlink_handles(
+            self.people[0].handle)), [])
+        self.assertEqual(list(self.db.find_backlink_handles(
+            self.people[4].handle)), [])
+        # Unchanged references are left in place:
+        self.db.dbapi.execute("SELECT rowid, ref_handle FROM reference;")
+        for (rowid, handle) in self.db.dbapi.fetchall():
+            self.assertEqual(rowids[handle], rowid)
+        self.family.father_handle = self.people[4].handle
+        self.db.update_backlinks(self.family)
+        self.assertEqual(list(self.db.find_backlink_handles(
+            self.people[4].handle)), [("Family", self.family.handle)])
+
+    def test_get_backlinks(self):
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            for i in range(3):
+                family = Family()
+                family.father_handle = self.people[0].handle
+                self.db.add_family(family, trans)
+        handle = self.people[0].handle
+        backlinks = sorted(self.db.find_backlink_handles(handle))
+        self.assertEqual(self.db.get_backlinks(handle), backlinks)
+        pages = []
+        after = None
+        while True:
+            page = self.db.get_backlinks(handle, after=after, limit=3)
+            if not page:
+                break
+            pages.append(page)
+            after = page[-1]
+        self.assertEqual([len(page) for page in pages], [3, 1])
+        self.assertEqual(sum(pages, []), backlinks)
+        self.assertEqual(self.db.get_backlinks(handle,
+                                               include_classes=["Person"]),
+                         [])
+        self.assertEqual(self.db.get_backlink_counts(handle), {"Family": 4})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,294 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2016 Gramps Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+""" Tests for the DB-API select engine """
+
+import unittest
+
+from unittest import mock
+
+from gprime.db import make_database
+from gprime.db.generic import DbGeneric
+from gprime.proxy import PrivateProxyDb
+from gprime.lib import Person, Name, Surname, EventRef, EventRoleType
+
+class SelectTest(unittest.TestCase):
+
+    def setUp(self):
+        db = make_database("inmemorydb")
+        db.load(None)
+        with db.get_transaction_class()("Test", db, batch=True) as trans:
+            for (i, surname) in enumerate(["O'Brien", "Smith", "Smith",
+                                           'Say "Cheese"']):
+                person = Person()
+                person.primary_name = Name()
+                person.primary_name.surname_list.append(Surname())
+                person.primary_name.surname_list[0].surname = surname
+                person.gid = "I%04d" % i
+                nickname = Name()
+                nickname.first_name = "Nick%s" % i
+                person.alternate_names.append(nickname)
+                event_ref = EventRef()
+                event_ref.role = EventRoleType(EventRoleType.WITNESS if i == 2
+                                               else EventRoleType.PRIMARY)
+                person.add_event_ref(event_ref)
+                db.add_person(person, trans)
+        self.db = db
+
+    def select_gids(self, **kwargs):
+        return [row["gid"] for row in self.db._select("Person", ["gid"],
+                                                      **kwargs)]
+
+    def test_quoted_values(self):
+        self.assertEqual(
+            self.select_gids(where=("primary_name.surname_list.0.surname",
+                                    "=", "O'Brien")),
+            ["I0000"])
+        self.assertEqual(
+            self.select_gids(where=("primary_name.surname_list.0.surname",
+                                    "=", 'Say "Cheese"')),
+            ["I0003"])
+
+    def test_in(self):
+        self.assertEqual(
+            self.select_gids(where=("gid", "IN", ["I0001", "I0003"]),
+                             order_by=[("gid", "ASC")]),
+            ["I0001", "I0003"])
+
+    def test_paging(self):
+        self.assertEqual(
+            self.select_gids(order_by=[("gid", "DESC")], start=1, limit=2),
+            ["I0002", "I0001"])
+        self.assertEqual(
+            self.select_gids(order_by=[("gid", "ASC")], start=3),
+            ["I0003"])
+
+    def test_count(self):
+        count = next(self.db._select(
+            "Person", ["count(1)"],
+            where=["AND", [("primary_name.surname_list.0.surname", "=",
+                            "Smith"),
+                           ["NOT", ("gid", "=", "I0001")]]]))
+        self.assertEqual(count, 1)
+
+    def test_json_where(self):
+        self.assertEqual(
+            self.select_gids(where=("alternate_names.first_name",
+                                    "=", "Nick1")),
+            ["I0001"])
+        self.assertEqual(
+            self.select_gids(where=("event_ref_list.role", "=",
+                                    EventRoleType.WITNESS)),
+            ["I0002"])
+        self.assertEqual(
+            self.select_gids(where=["NOT", ("event_ref_list.role", "IN",
+                                            [EventRoleType.PRIMARY])]),
+            ["I0002"])
+
+    def test_json_where_lists(self):
+        # as selected in Python, where an empty list differs from any value:
+        for where in [("family_list", "!=", "F0000"),
+                      ("family_list", "=", "F0000"),
+                      ("alternate_names.first_name", "!=", "Nick1"),
+                      ("alternate_names.surname_list.surname", "!=", "Smith"),
+                      ["NOT", ("family_list", "!=", "F0000")]]:
+            self.assertEqual(
+                self.select_gids(where=where, order_by=[("gid", "ASC")]),
+                [row["gid"] for row in DbGeneric._select(
+                    self.db, "Person", ["gid"], where=where,
+                    order_by=[("gid", "ASC")])])
+        self.assertEqual(
+            self.select_gids(where=("family_list", "!=", "F0000"),
+                             order_by=[("gid", "ASC")]),
+            ["I0000", "I0001", "I0002", "I0003"])
+
+    def test_json_order_by(self):
+        self.assertEqual(
+            self.select_gids(order_by=[("alternate_names.0.first_name",
+                                        "DESC")]),
+            ["I0003", "I0002", "I0001", "I0000"])
+        self.assertEqual(
+            [person.gid for person in self.db.iter_people(
+                order_by=[("alternate_names.0.first_name", "DESC")])],
+            ["I0003", "I0002", "I0001", "I0000"])
+
+    def test_json_path(self):
+        self.assertEqual(self.db._json_path("Person", "surname"),
+                         ([["primary_name", "surname_list", 0, "surname"]],
+                          str))
+        self.assertEqual(self.db._json_path("Person",
+                                            "alternate_names.surname_list.surname"),
+                         ([["alternate_names"], ["surname_list"], ["surname"]],
+                          str))
+        self.assertEqual(self.db._json_path("Person", "family_list"),
+                         ([["family_list"], []], str))
+        # joins are done in Python:
+        self.assertEqual(self.db._json_path("Person", "event_ref_list.ref.gid"),
+                         (None, None))
+
+    @mock.patch("gprime.plugins.db.dbapi.sqlite.FETCH_SIZE", 1)
+    def test_streaming_with_lookups(self):
+        # the streamed rows must not be disturbed by queries made
+        # while they are consumed:
+        gids = []
+        for person in self.db.iter_people(order_by=[("gid", "ASC")]):
+            gids.append(self.db.get_person_from_handle(person.handle).gid)
+            self.db.get_person_handles()
+        self.assertEqual(gids, ["I0000", "I0001", "I0002", "I0003"])
+
+    def test_prepared_pages(self):
+        # pages are read from a prepared statement, other selects streamed:
+        with mock.patch.object(self.db.dbapi, "execute_prepared",
+                               wraps=self.db.dbapi.execute_prepared) as prepared, \
+             mock.patch.object(self.db.dbapi, "iter_rows",
+                               wraps=self.db.dbapi.iter_rows) as iter_rows:
+            self.assertEqual(
+                self.select_gids(order_by=[("gid", "ASC")], start=2, limit=2),
+                ["I0002", "I0003"])
+            self.assertEqual(prepared.call_count, 1)
+            self.assertEqual(iter_rows.call_count, 0)
+            self.assertEqual(len(self.select_gids()), 4)
+            self.assertEqual(prepared.call_count, 1)
+            self.assertEqual(iter_rows.call_count, 1)
+
+    def test_iter_handles_by_gid(self):
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            person = Person()
+            person.gid = "H0000"
+            self.db.add_person(person, trans)
+        handles = list(self.db.iter_handles_by_gid("Person"))
+        self.assertEqual([self.db.get_person_from_handle(handle).gid
+                          for handle in handles],
+                         ["H0000", "I0000", "I0001", "I0002", "I0003"])
+        # as sorted in Python:
+        self.assertEqual(handles,
+                         list(DbGeneric.iter_handles_by_gid(self.db,
+                                                            "Person")))
+        private = self.db.get_person_from_handle(handles[1])
+        private.set_privacy(True)
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            self.db.commit_person(private, trans)
+        self.assertEqual(
+            list(PrivateProxyDb(self.db).iter_handles_by_gid("Person")),
+            handles[:1] + handles[2:])
+
+    def test_page(self):
+        where = ("primary_name.surname_list.0.surname", "LIKE", "S%")
+        (rows, total) = self.db._select_page("Person", ["gid"], start=0,
+                                             limit=1, where=where,
+                                             order_by=[("gid", "ASC")])
+        self.assertEqual([row["gid"] for row in rows], ["I0001"])
+        self.assertEqual(total, 3)
+        # past the last page:
+        self.assertEqual(self.db._select_page("Person", ["gid"], start=10,
+                                              limit=1, where=where),
+                         ([], 3))
+        # in Python:
+        where = ("event_ref_list.role", "=", EventRoleType.WITNESS)
+        with mock.patch.object(self.db, "_supports_json_paths",
+                               return_value=False):
+            (rows, total) = self.db._select_page("Person", ["gid"], start=0,
+                                                 limit=1, where=where)
+        self.assertEqual([row["gid"] for row in rows], ["I0002"])
+        self.assertEqual(total, 1)
+
+    def test_page_totals_cache(self):
+        where = ("gid", ">", "I0001")
+        self.assertEqual(self.db._select_page("Person", ["gid"], limit=1,
+                                              where=where)[1], 2)
+        with mock.patch.object(self.db.dbapi, "supports_window_functions",
+                               False):
+            with mock.patch.object(self.db, "_select",
+                                   wraps=self.db._select) as select:
+                self.assertEqual(self.db._select_page(
+                    "Person", ["gid"], start=1, limit=1, where=where)[1], 2)
+                # the total was not counted again:
+                self.assertEqual(select.call_count, 1)
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            person = Person()
+            person.gid = "I0004"
+            self.db.add_person(person, trans)
+        self.assertEqual(self.db._select_page("Person", ["gid"], limit=1,
+                                              where=where)[1], 3)
+
+    def page_gids(self, queryset, cursor=None, **kwargs):
+        queryset.order(*kwargs.get("order", ["gid"]))
+        queryset.limit(count=kwargs.get("count", 2))
+        if cursor:
+            queryset.seek(cursor)
+        (rows, total) = queryset.page("gid")
+        return [row["gid"] for row in rows]
+
+    def test_seek(self):
+        for order in [["gid"], ["-surname", "gid"]]:
+            queryset = self.db.Person
+            expected = [row["gid"] for row in self.db._select(
+                "Person", ["gid"],
+                order_by=[(field.lstrip("-"),
+                           "DESC" if field.startswith("-") else "ASC")
+                          for field in order] + [("handle", "ASC")])]
+            gids = self.page_gids(queryset, order=order)
+            next_cursor = queryset.next_cursor
+            self.assertEqual(self.page_gids(queryset, next_cursor, order=order),
+                             expected[2:])
+            # back to the first page:
+            self.assertEqual(self.page_gids(queryset, queryset.previous_cursor,
+                                            order=order),
+                             expected[:2])
+            self.assertEqual(gids, expected[:2])
+            # in Python:
+            with mock.patch.object(self.db, "_supports_json_paths",
+                                   return_value=False):
+                with mock.patch.object(self.db, "_get_secondary_fields",
+                                       return_value=["handle"]):
+                    self.assertEqual(self.page_gids(queryset, next_cursor,
+                                                    order=order),
+                                     expected[2:])
+        # a cursor is only good for its order:
+        self.assertRaises(ValueError, self.page_gids, self.db.Person,
+                          next_cursor, order=["-gid"])
+
+    def test_seek_nulls(self):
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            for gid in ["I0004", "I0005"]:
+                person = Person()
+                person.gid = gid
+                self.db.add_person(person, trans)
+        self.db.dbapi.execute("UPDATE person SET primary_name__surname_list"
+                              "__0__surname = NULL WHERE gid > ?;",
+                              ["I0003"])
+        for order in [["surname", "gid"], ["-surname", "-gid"]]:
+            expected = []
+            queryset = self.db.Person
+            gids = self.page_gids(queryset, order=order, count=1)
+            while gids:
+                expected.extend(gids)
+                gids = self.page_gids(queryset, queryset.next_cursor,
+                                      order=order, count=1)
+            self.assertEqual(sorted(expected),
+                             ["I%04d" % i for i in range(6)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2016 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+""" Tests for the json_data serializers """
+
+import json
+import unittest
+
+from gprime.db import make_database
+from gprime.lib import Person, Name, Surname, Attribute
+from gprime.lib.handle import HandleClass
+from gprime.plugins.db.dbapi.serializer import (JSONSerializer,
+                                                MarshalSerializer,
+                                                get_serializer)
+
+class SerializerTest(unittest.TestCase):
+
+    def setUp(self):
+        db = make_database("inmemorydb")
+        db.load(None)
+        with db.get_transaction_class()("Test", db, batch=True) as trans:
+            for (i, surname) in enumerate(["Smith", "Jones", "@Smith"]):
+                person = Person()
+                person.primary_name = Name()
+                person.primary_name.surname_list.append(Surname())
+                person.primary_name.surname_list[0].surname = surname
+                person.gid = "I%04d" % i
+                attribute = Attribute()
+                attribute.set_value("@%s" % i)
+                person.add_attribute(attribute)
+                db.add_person(person, trans)
+        self.db = db
+
+    def get_structs(self):
+        return [self.db.get_raw_person_data(handle)
+                for handle in sorted(self.db.get_person_handles())]
+
+    def test_round_trip(self):
+        for binary in [True, False]:
+            serializer = MarshalSerializer.create(binary)
+            for struct in self.get_structs():
+                string = serializer.data_to_string(struct)
+                self.assertIsInstance(string, bytes if binary else str)
+                self.assertEqual(serializer.string_to_data(string), struct)
+            # handles and tuples are read back as from JSON:
+            person = self.db.get_person_from_handle(
+                self.get_structs()[0]["handle"])
+            struct = person.to_struct()
+            self.assertIsInstance(struct["handle"], HandleClass)
+            value = {"handle": struct["handle"], "pair": (1, ("a", None))}
+            data = serializer.string_to_data(
+                serializer.data_to_string(value))
+            self.assertEqual(data, json.loads(json.dumps(value)))
+            self.assertIs(type(data["handle"]), str)
+            # the format is kept in the state:
+            copy = get_serializer("marshal", serializer.get_state())
+            self.assertEqual(copy.get_state(), serializer.get_state())
+            self.assertEqual(
+                copy.string_to_data(serializer.data_to_string(struct)),
+                serializer.string_to_data(serializer.data_to_string(struct)))
+
+    def test_json_key_order(self):
+        # keys are written as to_struct orders them, not sorted:
+        serializer = JSONSerializer()
+        self.assertEqual(serializer.data_to_string({"b": 1, "a": [2]}),
+                         '{"b": 1, "a": [2]}')
+        # rows written sorted by earlier versions read back the same:
+        structs = self.get_structs()
+        for struct in structs:
+            self.db.dbapi.execute(
+                "UPDATE person SET json_data = ? WHERE handle = ?;",
+                [json.dumps(struct, sort_keys=True), struct["handle"]])
+        self.db.clear_cache()
+        self.assertEqual(self.get_structs(), structs)
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, get_serializer, "unknown")
+
+    def test_set_serializer(self):
+        structs = self.get_structs()
+        self.assertEqual(self.db.get_metadata("serializer")["name"], "json")
+        self.db.set_serializer("marshal")
+        self.assertEqual(self.db.get_metadata("serializer"),
+                         {"name": "marshal",
+                          "state": self.db.serializer.get_state()})
+        # sqlite stores the bytes as they are:
+        self.assertTrue(self.db.serializer.binary)
+        self.db.dbapi.execute("SELECT json_data FROM person;")
+        self.assertIsInstance(self.db.dbapi.fetchone()[0], bytes)
+        self.db.clear_cache()
+        self.assertEqual(self.get_structs(), structs)
+        # queries on fields fall back to Python:
+        self.assertEqual(
+            [person.gid for person in self.db.iter_people(
+                order_by=[("primary_name.surname_list.0.surname", "DESC")])],
+            ["I0000", "I0001", "I0002"])
+        self.db.set_serializer("json")
+        self.db.clear_cache()
+        self.assertEqual(self.get_structs(), structs)
+
+if __name__ == "__main__":
+    unittest.main()
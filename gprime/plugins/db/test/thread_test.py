@@ -0,0 +1,84 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2016 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+""" Tests for using a database from several threads """
+
+import shutil
+import tempfile
+import threading
+import unittest
+
+from gprime.db import make_database
+from gprime.lib import Person
+
+class ThreadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        db = make_database("dbapi")
+        db.write_version(self.directory)
+        db.load(self.directory)
+        with db.get_transaction_class()("Test", db, batch=True) as trans:
+            for i in range(100):
+                person = Person()
+                person.gid = "I%04d" % i
+                db.add_person(person, trans)
+        self.db = db
+
+    def tearDown(self):
+        self.db.dbapi.close()
+        shutil.rmtree(self.directory)
+
+    def test_readers_and_writers(self):
+        errors = []
+        counts = []
+        def read():
+            try:
+                for i in range(5):
+                    handles = list(self.db.get_person_handles())
+                    counts.append(len(self.db.get_people_from_handles(handles)))
+            except Exception as exc:
+                errors.append(exc)
+        def write(name):
+            try:
+                for i in range(5):
+                    with self.db.get_transaction_class()(
+                            "Test", self.db, batch=True) as trans:
+                        person = Person()
+                        person.gid = "%s%04d" % (name, i)
+                        self.db.add_person(person, trans)
+            except Exception as exc:
+                errors.append(exc)
+        threads = ([threading.Thread(target=read) for i in range(4)] +
+                   [threading.Thread(target=write, args=(name,))
+                    for name in "AB"])
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertTrue(all(count >= 100 for count in counts))
+        self.assertEqual(self.db.get_number_of_people(), 110)
+        # each thread had a connection of its own:
+        self.assertGreater(len(self.db.dbapi.connections), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+""" Tests for the user table """
+
+import unittest
+
+from gprime.db import make_database
+
+class UserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_database("inmemorydb")
+        self.db.load(None)
+        self.signals = []
+        for signal in ["user-add", "user-update", "user-delete"]:
+            self.db.connect(signal,
+                            lambda user, signal=signal:
+                            self.signals.append((signal, user)))
+
+    def test_signals(self):
+        self.db.add_user(username="tester", password="",
+                         permissions={"edit"}, data={})
+        self.db.update_user_data("tester", {"language": "fr"})
+        self.assertEqual(self.db.get_user_data("tester")["language"], "fr")
+        self.db.remove_user("tester")
+        self.assertIsNone(self.db.get_user_data("tester"))
+        self.assertEqual(self.signals, [("user-add", "tester"),
+                                        ("user-update", "tester"),
+                                        ("user-delete", "tester")])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -121,28 +121,8 @@ QUALITY_MAP = {
     Citation.CONF_VERY_LOW  : "0",
     }
 
-
-#-------------------------------------------------------------------------
-#
-# sort_handles_by_id
-#
-#-------------------------------------------------------------------------
-def sort_handles_by_id(handle_list, handle_to_object):
-    """
-    Sort a list of handles by the GID.
-
-    The function that returns the object from the handle needs to be supplied
-    so that we get the right object.
-
-    """
-    sorted_list = []
-    for handle in handle_list:
-        obj = handle_to_object(handle)
-        if obj:
-            data = (obj.get_gid(), handle)
-            sorted_list.append (data)
-    sorted_list.sort()
-    return sorted_list
+# Size of the buffer of the GEDCOM file, in bytes:
+WRITE_BUFFER_SIZE = 1024 * 1024
 
 #-------------------------------------------------------------------------
 #
@@ -214,6 +194,7 @@ class GedcomWriter(UpdateCallback):
         self.dbase = database
         self.dirname = None
         self.gedcom_file = None
+        self._write = None
 
         # The number of different stages other than any of the optional filters
         # which the write_gedcom_file method will call.
@@ -237,7 +218,9 @@ class GedcomWriter(UpdateCallback):
         """
 
         self.dirname = os.path.dirname (filename)
-        with open(filename, "w", encoding='utf-8') as self.gedcom_file:
+        with open(filename, "w", encoding='utf-8',
+                  buffering=WRITE_BUFFER_SIZE) as self.gedcom_file:
+            self._write = self.gedcom_file.write
             self._header(filename)
             self._submitter()
             self._individuals()
@@ -262,7 +245,13 @@ class GedcomWriter(UpdateCallback):
 
         """
         assert(token)
-        if textlines:
+        if not textlines:
+            self._write("%d %s\n" % (level, token))
+        elif ("\n" not in textlines and "\r" not in textlines and
+              (not limit or len(textlines) <= limit)):
+            # the usual case, a line that needs no breaking up:
+            self._write("%d %s %s\n" % (level, token, textlines))
+        else:
             # break the line into multiple lines if a newline is found
             textlines = textlines.replace('\n\r', '\n')
             textlines = textlines.replace('\r', '\n')
@@ -276,11 +265,9 @@ class GedcomWriter(UpdateCallback):
                     txt = prefix.join(breakup(text, limit))
                 else:
                     txt = text
-                self.gedcom_file.write("%d %s %s\n" % (token_level, token, txt))
+                self._write("%d %s %s\n" % (token_level, token, txt))
                 token_level = level + 1
                 token = "CONT"
-        else:
-            self.gedcom_file.write("%d %s\n" % (level, token))
 
     def _header(self, filename):
         """
@@ -379,26 +366,17 @@ class GedcomWriter(UpdateCallback):
         """
         Write the individual people to the gedcom file.
 
-        Since people like to have the list sorted by ID value, we need to go
-        through a sorting step. We need to reset the progress bar, otherwise,
-        people will be confused when the progress bar is idle.
+        Since people like to have the list sorted by ID value, the people
+        are read in the order of their GIDs. We need to reset the progress
+        bar, otherwise, people will be confused when the progress bar is
+        idle.
 
         """
         self.reset(_("Writing individuals"))
         self.progress_cnt += 1
         self.update(self.progress_cnt)
-        phandles = self.dbase.iter_person_handles()
-
-        sorted_list = []
-        for handle in phandles:
-            person = self.dbase.get_person_from_handle(handle)
-            if person:
-                data = (person.get_gid(), handle)
-                sorted_list.append(data)
-        sorted_list.sort()
-
-        for data in sorted_list:
-            self._person(self.dbase.get_person_from_handle(data[1]))
+        for handle in self.dbase.iter_handles_by_gid("Person"):
+            self._person(self.dbase.get_person_from_handle(handle))
 
     def _person(self, person):
         """
@@ -770,15 +748,7 @@ class GedcomWriter(UpdateCallback):
         self.reset(_("Writing families"))
         self.progress_cnt += 1
         self.update(self.progress_cnt)
-        # generate a list of (GRAMPS_ID, HANDLE) pairs. This list
-        # can then be sorted by the sort routine, which will use the
-        # first value of the tuple as the sort key.
-        sorted_list = sort_handles_by_id(self.dbase.get_family_handles(),
-                                         self.dbase.get_family_from_handle)
-
-        # loop through the sorted list, pulling of the handle. This list
-        # has already been sorted by GRAMPS_ID
-        for family_handle in [hndl[1] for hndl in sorted_list]:
+        for family_handle in self.dbase.iter_handles_by_gid("Family"):
             self._family(self.dbase.get_family_from_handle(family_handle))
 
     def _family(self, family):
@@ -936,13 +906,10 @@ class GedcomWriter(UpdateCallback):
         self.reset(_("Writing sources"))
         self.progress_cnt += 1
         self.update(self.progress_cnt)
-        sorted_list = sort_handles_by_id(self.dbase.get_source_handles(),
-                                         self.dbase.get_source_from_handle)
-
-        for (source_id, handle) in sorted_list:
+        for handle in self.dbase.iter_handles_by_gid("Source"):
             source = self.dbase.get_source_from_handle(handle)
             if source is None: continue
-            self._writeln(0, '@%s@' % source_id, 'SOUR')
+            self._writeln(0, '@%s@' % source.get_gid(), 'SOUR')
             if source.get_title():
                 self._writeln(1, 'TITL', source.get_title())
 
@@ -971,10 +938,7 @@ class GedcomWriter(UpdateCallback):
         self.reset(_("Writing notes"))
         self.progress_cnt += 1
         self.update(self.progress_cnt)
-        sorted_list = sort_handles_by_id(self.dbase.get_note_handles(),
-                                         self.dbase.get_note_from_handle)
-
-        for note_handle in [hndl[1] for hndl in sorted_list]:
+        for note_handle in self.dbase.iter_handles_by_gid("Note"):
             note = self.dbase.get_note_from_handle(note_handle)
             if note is None: continue
             self._note_record(note)
@@ -1009,15 +973,12 @@ class GedcomWriter(UpdateCallback):
         self.reset(_("Writing repositories"))
         self.progress_cnt += 1
         self.update(self.progress_cnt)
-        sorted_list = sort_handles_by_id(self.dbase.get_repository_handles(),
-                                         self.dbase.get_repository_from_handle)
-
         # GEDCOM only allows for a single repository per source
 
-        for (repo_id, handle) in sorted_list:
+        for handle in self.dbase.iter_handles_by_gid("Repository"):
             repo = self.dbase.get_repository_from_handle(handle)
             if repo is None: continue
-            self._writeln(0, '@%s@' % repo_id, 'REPO' )
+            self._writeln(0, '@%s@' % repo.get_gid(), 'REPO' )
             if repo.get_name():
                 self._writeln(1, 'NAME', repo.get_name())
             for addr in repo.get_address_list():
@@ -35,11 +35,15 @@ Gramps' XML file format.
 # Standard python modules
 #
 #-------------------------------------------------------------------------
+import io
+import re
+import sys
 import time
 import shutil
 import os
-import codecs
-from xml.sax.saxutils import escape
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 #------------------------------------------------------------------------
 #
@@ -76,15 +80,39 @@ try:
 except:
     _gzip_ok = 0
 
-# table for skipping control chars from XML except 09, 0A, 0D
-strip_dict = dict.fromkeys(list(range(9))+list(range(11,13))+list(range(14, 32)))
+# control chars to skip from XML, all but 09, 0A, 0D
+CONTROL_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
 
 def escxml(d):
-    return escape(d,
-                  {'"' : '&quot;',
-                   '<' : '&lt;',
-                   '>' : '&gt;',
-                   }) if d else ""
+    if not d:
+        return ""
+    return d.replace("&", "&amp;").replace("<", "&lt;").replace(
+        ">", "&gt;").replace('"', "&quot;")
+
+# Objects of a table rendered at a time, by a worker process:
+CHUNK_SIZE = 500
+
+# Exports of fewer objects are rendered in the writing process, as
+# starting the worker processes would take longer:
+PARALLEL_MIN_OBJECTS = 20000
+
+# Text written is collected, and encoded, until it reaches this size:
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# The writer of each table of objects, and its XML element:
+TABLE_WRITERS = [
+    ("Tag", "tags", "write_tag"),
+    ("Event", "events", "write_event"),
+    ("Person", "people", "write_person"),
+    ("Family", "families", "write_family"),
+    ("Citation", "citations", "write_citation"),
+    ("Source", "sources", "write_source"),
+    ("Place", "places", "write_place_obj"),
+    ("Media", "objects", "write_object"),
+    ("Repository", "repositories", "write_repository"),
+    ("Note", "notes", "write_note"),
+    ]
+TABLE_METHODS = {table: method for (table, element, method) in TABLE_WRITERS}
 
 #-------------------------------------------------------------------------
 #
@@ -97,7 +125,7 @@ class GrampsXmlWriter(UpdateCallback):
     """
 
     def __init__(self, db, strip_photos=0, compress=1, version="unknown",
-                 user=None):
+                 user=None, workers=None):
         """
         Initialize, but does not write, an XML file.
 
@@ -107,8 +135,10 @@ class GrampsXmlWriter(UpdateCallback):
         >              1: remove everything expect the filename (eg gpkg)
         >              2: remove leading slash (quick write)
         compress - attempt to compress the database
+        workers - number of processes rendering the objects of large
+                  databases (default: the number of CPUs)
         """
-        UpdateCallback.__init__(self, user.callback)
+        UpdateCallback.__init__(self, user.callback if user else None)
         self.user = user
         self.compress = compress
         if not _gzip_ok:
@@ -116,15 +146,20 @@ class GrampsXmlWriter(UpdateCallback):
         self.db = db
         self.strip_photos = strip_photos
         self.version = version
+        self.workers = workers or os.cpu_count() or 1
 
         self.status = None
+        self.g = None
+        self.out = None
+        self.parallel = False
+        self.compress_parts = False
+        self.pool = None
 
     def write(self, filename):
         """
         Write the database to the specified file.
         """
         if filename == '-':
-            import sys
             g = sys.stdout.buffer
             self.compress = False
         else:
@@ -157,22 +192,18 @@ class GrampsXmlWriter(UpdateCallback):
 
             self.fileroot = os.path.dirname(filename)
             try:
-                if self.compress and _gzip_ok:
-                    try:
-                        g = gzip.open(filename,"wb")
-                    except:
-                        g = open(filename,"wb")
-                else:
-                    g = open(filename,"wb")
+                g = open(filename,"wb")
             except IOError as msg:
                 LOG.warning(str(msg))
                 raise DbWriteFailure(_('Failure writing %s') % filename,
                                         str(msg))
                 return 0
 
-        self.g = codecs.getwriter("utf8")(g)
-
+        out = self.open_output(g)
         self.write_xml_data()
+        self.flush()
+        if out is not g:
+            out.close()
         if filename != '-':
             g.close()
         return 1
@@ -181,43 +212,107 @@ class GrampsXmlWriter(UpdateCallback):
         """
         Write the database to the specified file handle.
         """
+        out = self.open_output(handle)
+        self.write_xml_data()
+        self.flush()
+        out.close()
+        return 1
+
+    def open_output(self, g):
+        """
+        Set up the writing to the binary stream, and return the stream
+        to close when done: a gzip stream on it, when compressing.
 
+        The objects of large databases are rendered, and encoded, by
+        worker processes (see write_objects), which also compress what
+        they render, when compressing: the file then has a gzip member
+        for each part, rather than a single one, but reads the same.
+        """
+        self.g = io.StringIO()
+        self.out = g
+        self.parallel = (self.workers > 1 and
+                         self.count_objects() >= PARALLEL_MIN_OBJECTS)
+        self.compress_parts = False
         if self.compress and _gzip_ok:
-            try:
-                g = gzip.GzipFile(mode="wb", fileobj=handle)
-            except:
-                g = handle
-        else:
-            g = handle
+            if self.parallel:
+                self.compress_parts = True
+            else:
+                try:
+                    self.out = gzip.GzipFile(mode="wb", fileobj=g)
+                except:
+                    pass
+        return self.out
 
-        self.g = codecs.getwriter("utf8")(g)
+    def count_objects(self):
+        return sum(self.db.get_table_func(table, "count_func")()
+                   for (table, element, method) in TABLE_WRITERS)
 
-        self.write_xml_data()
-        g.close()
-        return 1
+    def flush(self):
+        """
+        Write the text collected in self.g out.
+        """
+        text = self.g.getvalue()
+        if text:
+            self.g = io.StringIO()
+            self.write_bytes(text.encode("utf-8"))
+
+    def write_bytes(self, data):
+        if self.compress_parts:
+            data = gzip.compress(data)
+        self.out.write(data)
+
+    def write_objects(self, table, handles):
+        """
+        Write the objects of the table with the handles, in the order of
+        the handles, read a chunk at a time.
+
+        With a pool of worker processes, the structs of each chunk are
+        sent to a worker, which renders them; up to two chunks a worker
+        are under way, and their XML is written in order as it comes.
+        """
+        write_func = getattr(self, TABLE_METHODS[table])
+        handle_func = self.db.get_table_func(table, "handle_func")
+        pending = deque()
+        for start in range(0, len(handles), CHUNK_SIZE):
+            chunk = handles[start:start + CHUNK_SIZE]
+            if self.pool is None:
+                # every field is written, so whole objects are made
+                # rather than lazy ones:
+                self.db.prefetch(table, chunk)
+                for handle in chunk:
+                    obj = handle_func(handle)
+                    if obj:
+                        write_func(obj, 2)
+                    self.update()
+                if self.g.tell() >= WRITE_BUFFER_SIZE:
+                    self.flush()
+                continue
+            objects = self.db.get_from_handles(table, chunk)
+            structs = [obj.to_struct() for obj in objects if obj]
+            # the plugin may have been loaded under its file name, which
+            # the worker processes can't import:
+            from gprime.plugins.export import exportxml
+            pending.append((len(chunk), self.pool.submit(
+                exportxml.render_objects, table, structs,
+                self.strip_photos, self.compress_parts)))
+            if len(pending) >= 2 * self.workers:
+                self.write_rendered(*pending.popleft())
+        while pending:
+            self.write_rendered(*pending.popleft())
+
+    def write_rendered(self, count, future):
+        data = future.result()
+        self.flush()
+        self.out.write(data)
+        for i in range(count):
+            self.update()
 
     def write_xml_data(self):
 
         date = time.localtime(time.time())
         owner = self.db.get_researcher()
 
-        person_len = self.db.get_number_of_people()
-        family_len = self.db.get_number_of_families()
-        event_len = self.db.get_number_of_events()
-        citation_len = self.db.get_number_of_citations()
-        source_len = self.db.get_number_of_sources()
-        place_len = self.db.get_number_of_places()
-        repo_len = self.db.get_number_of_repositories()
-        obj_len = self.db.get_number_of_media()
-        note_len = self.db.get_number_of_notes()
-        tag_len = self.db.get_number_of_tags()
-
-        total_steps = (person_len + family_len + event_len + citation_len +
-                       source_len + place_len + repo_len + obj_len + note_len +
-                       tag_len
-                      )
-
-        self.set_total(total_steps)
+        self.set_total(self.count_objects())
 
         self.g.write('<?xml version="1.0" encoding="UTF-8"?>\n')
         self.g.write('<!DOCTYPE database '
@@ -249,103 +344,29 @@ class GrampsXmlWriter(UpdateCallback):
         # by the time we get to person's names
         self.write_name_formats()
 
-        # Write table objects
-        if tag_len > 0:
-            self.g.write("  <tags>\n")
-            for key in sorted(self.db.get_tag_handles()):
-                tag = self.db.get_tag_from_handle(key)
-                if tag:
-                    self.write_tag(tag, 2)
-                self.update()
-            self.g.write("  </tags>\n")
-
-        # Write primary objects
-        if event_len > 0:
-            self.g.write("  <events>\n")
-            for handle in sorted(self.db.get_event_handles()):
-                event = self.db.get_event_from_handle(handle)
-                if event:
-                    self.write_event(event,2)
-                self.update()
-            self.g.write("  </events>\n")
-
-        if person_len > 0:
-            self.g.write("  <people")
-            person = self.db.get_default_person()
-            if person:
-                self.g.write(' home="_%s"' % person.handle)
-            self.g.write('>\n')
-
-            for handle in sorted(self.db.get_person_handles()):
-                person = self.db.get_person_from_handle(handle)
-                if person:
-                    self.write_person(person, 2)
-                self.update()
-            self.g.write("  </people>\n")
-
-        if family_len > 0:
-            self.g.write("  <families>\n")
-            for handle in sorted(self.db.iter_family_handles()):
-                family = self.db.get_family_from_handle(handle)
-                if family:
-                    self.write_family(family,2)
-                self.update()
-            self.g.write("  </families>\n")
-
-        if citation_len > 0:
-            self.g.write("  <citations>\n")
-            for handle in sorted(self.db.get_citation_handles()):
-                citation = self.db.get_citation_from_handle(handle)
-                if citation:
-                    self.write_citation(citation,2)
-                self.update()
-            self.g.write("  </citations>\n")
-
-        if source_len > 0:
-            self.g.write("  <sources>\n")
-            for handle in sorted(self.db.get_source_handles()):
-                source = self.db.get_source_from_handle(handle)
-                if source:
-                    self.write_source(source,2)
-                self.update()
-            self.g.write("  </sources>\n")
-
-        if place_len > 0:
-            self.g.write("  <places>\n")
-            for key in sorted(self.db.get_place_handles()):
-                # try:
-                place = self.db.get_place_from_handle(key)
-                if place:
-                    self.write_place_obj(place,2)
-                self.update()
-            self.g.write("  </places>\n")
-
-        if obj_len > 0:
-            self.g.write("  <objects>\n")
-            for handle in sorted(self.db.get_media_handles()):
-                obj = self.db.get_media_from_handle(handle)
-                if obj:
-                    self.write_object(obj,2)
-                self.update()
-            self.g.write("  </objects>\n")
-
-        if repo_len > 0:
-            self.g.write("  <repositories>\n")
-            for key in sorted(self.db.get_repository_handles()):
-                repo = self.db.get_repository_from_handle(key)
-                if repo:
-                    self.write_repository(repo,2)
-                self.update()
-            self.g.write("  </repositories>\n")
-
-        if note_len > 0:
-            self.g.write("  <notes>\n")
-            for key in sorted(self.db.get_note_handles()):
-                note = self.db.get_note_from_handle(key)
-                if note:
-                    self.write_note(note, 2)
-                self.update()
-            self.g.write("  </notes>\n")
+        if self.parallel:
+            # worker processes start afresh, rather than as copies of
+            # this one:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"))
+        try:
+            for (table, element, method) in TABLE_WRITERS:
+                if not self.db.get_table_func(table, "count_func")():
+                    continue
+                self.g.write("  <%s" % element)
+                if table == "Person":
+                    person = self.db.get_default_person()
+                    if person:
+                        self.g.write(' home="_%s"' % person.handle)
+                self.g.write('>\n')
+                self.write_objects(table, sorted(
+                    self.db.get_table_func(table, "handles_func")()))
+                self.g.write("  </%s>\n" % element)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
 
         # Data is written, now write bookmarks.
         self.write_bookmarks()
@@ -448,8 +469,8 @@ class GrampsXmlWriter(UpdateCallback):
         self.g.write('/>\n')
 
     def fix(self, line):
-        l = str(line)
-        l = l.strip().translate(strip_dict)
+        l = str(line).strip()
+        l = CONTROL_CHARS.sub("", l)
         return escxml(l)
 
     def write_note_list(self, note_list,indent=0):
@@ -1294,6 +1315,29 @@ class GrampsXmlWriter(UpdateCallback):
 
         self.g.write("%s</object>\n" % ("  "*index))
 
+#-------------------------------------------------------------------------
+#
+# render_objects
+#
+#-------------------------------------------------------------------------
+def render_objects(table, structs, strip_photos, compress):
+    """
+    Return the XML of the objects of the table, from their structs,
+    encoded, and compressed to a gzip member if compress. Run by the
+    worker processes of GrampsXmlWriter.write_objects.
+    """
+    import gprime.lib
+    class_func = getattr(gprime.lib, table)
+    writer = GrampsXmlWriter(None, strip_photos)
+    writer.g = io.StringIO()
+    write_func = getattr(writer, TABLE_METHODS[table])
+    for struct in structs:
+        write_func(class_func.create(struct), 2)
+    data = writer.g.getvalue().encode("utf-8")
+    if compress:
+        data = gzip.compress(data)
+    return data
+
 #-------------------------------------------------------------------------
 #
 #
@@ -1355,9 +1399,9 @@ class XmlWriter(GrampsXmlWriter):
     Writes a database to the XML file.
     """
 
-    def __init__(self, dbase, user, strip_photos, compress=1):
+    def __init__(self, dbase, user, strip_photos, compress=1, workers=None):
         GrampsXmlWriter.__init__(
-            self, dbase, strip_photos, compress, VERSION, user)
+            self, dbase, strip_photos, compress, VERSION, user, workers)
         self.user = user
 
     def write(self, filename):
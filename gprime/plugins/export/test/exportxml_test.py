@@ -0,0 +1,125 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+""" Tests for the Gramps XML export """
+
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from xml.sax.saxutils import escape
+
+from gprime.merge.diff import import_as_dict
+from gprime.cli.user import User
+from gprime.const import DATA_DIR
+from gprime.plugins.export import exportxml
+
+TEST_DIR = os.path.abspath(os.path.join(DATA_DIR, "tests"))
+EXAMPLE = os.path.join(TEST_DIR, "example.gramps")
+
+# The escaping of the writer before it was rendered in chunks:
+STRIP_DICT = dict.fromkeys(list(range(9)) + list(range(11, 13)) +
+                           list(range(14, 32)))
+
+def old_escxml(d):
+    return escape(d,
+                  {'"' : '&quot;',
+                   '<' : '&lt;',
+                   '>' : '&gt;',
+                   }) if d else ""
+
+def old_fix(self, line):
+    l = str(line)
+    l = l.strip().translate(STRIP_DICT)
+    return old_escxml(l)
+
+class ExportXmlTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = import_as_dict(EXAMPLE, User())
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def export(self, compress=False, workers=1):
+        """
+        Export the database, and return the bytes of the XML.
+        """
+        filename = os.path.join(self.tmp_dir, "export.gramps")
+        writer = exportxml.GrampsXmlWriter(self.db, 0, compress, "test",
+                                           workers=workers)
+        writer.write(filename)
+        with open(filename, "rb") as fp:
+            data = fp.read()
+        os.remove(filename)
+        if compress:
+            self.assertEqual(data[:2], b"\x1f\x8b")
+            data = gzip.decompress(data)
+        return data
+
+    def get_expected(self):
+        """
+        The export with the escaping of the previous writer, made once.
+        """
+        cls = self.__class__
+        if not hasattr(cls, "expected"):
+            with mock.patch.object(exportxml, "escxml", old_escxml), \
+                 mock.patch.object(exportxml.GrampsXmlWriter, "fix",
+                                   old_fix):
+                cls.expected = self.export()
+        return cls.expected
+
+    def test_escaping(self):
+        self.assertEqual(exportxml.escxml('<a href="x">&amp;</a>'),
+                         old_escxml('<a href="x">&amp;</a>'))
+        self.assertEqual(exportxml.GrampsXmlWriter.fix(None, " a\x01\tb\x1f "),
+                         "a\tb")
+        expected = self.get_expected()
+        self.assertEqual(self.export(), expected)
+
+    @mock.patch.object(exportxml, "WRITE_BUFFER_SIZE", 1000)
+    @mock.patch.object(exportxml, "CHUNK_SIZE", 7)
+    def test_chunks(self):
+        self.assertEqual(self.export(), self.get_expected())
+
+    @mock.patch.object(exportxml, "PARALLEL_MIN_OBJECTS", 1)
+    def test_workers(self):
+        with mock.patch.object(exportxml, "ProcessPoolExecutor",
+                               wraps=exportxml.ProcessPoolExecutor) as pool:
+            self.assertEqual(self.export(workers=2), self.get_expected())
+        self.assertEqual(pool.call_args[1]["max_workers"], 2)
+
+    def test_gzip(self):
+        self.assertEqual(self.export(compress=True), self.get_expected())
+
+    @mock.patch.object(exportxml, "PARALLEL_MIN_OBJECTS", 1)
+    def test_gzip_workers(self):
+        # a gzip member for each part, which reads as one file:
+        self.assertEqual(self.export(compress=True, workers=2),
+                         self.get_expected())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -38,7 +38,7 @@ from gprime.const import LOCALE as glocale
 _ = glocale.translation.gettext
 import re
 import logging
-import collections
+import collections.abc
 LOG = logging.getLogger(".ImportXML")
 
 #-------------------------------------------------------------------------
@@ -734,7 +734,7 @@ class GrampsParser(UpdateCallback):
         if (orig_handle in self.import_handles and
                 target in self.import_handles[orig_handle]):
             handle = self.import_handles[handle][target][HANDLE]
-            if not isinstance(prim_obj, collections.Callable):
+            if not isinstance(prim_obj, collections.abc.Callable):
                 # This method is called by a start_<primary_object> method.
                 get_raw_obj_data = {"person": self.db.get_raw_person_data,
                                     "family": self.db.get_raw_family_data,
@@ -778,7 +778,7 @@ class GrampsParser(UpdateCallback):
                 while has_handle_func(handle):
                     handle = create_id()
             self.import_handles[orig_handle] = {target: [handle, False]}
-        if isinstance(prim_obj, collections.Callable): # method is called by a reference
+        if isinstance(prim_obj, collections.abc.Callable): # method is called by a reference
             prim_obj = prim_obj()
         else:
             self.import_handles[orig_handle][target][INSTANTIATED] = True
@@ -863,7 +863,7 @@ class GrampsParser(UpdateCallback):
             handle = create_id()
             while has_handle_func(handle):
                 handle = create_id()
-            if isinstance(prim_obj, collections.Callable):
+            if isinstance(prim_obj, collections.abc.Callable):
                 prim_obj = prim_obj()
             prim_obj.set_handle(handle)
             prim_obj.set_gid(gid)
@@ -1605,7 +1605,8 @@ class IdFinder:
         """
         Initialize the object.
         """
-        self.ids = set(keys)
+        self.ids = set(key.decode('utf-8') if isinstance(key, bytes) else key
+                       for key in keys)
         self.index = 0
         self.prefix = prefix
 
@@ -1618,11 +1619,10 @@ class IdFinder:
         @rtype: str
         """
         index = self.prefix % self.index
-        # self.ids contains 'bytes' data
-        while index.encode('utf-8') in self.ids:
+        while index in self.ids:
             self.index += 1
             index = self.prefix % self.index
-        self.ids.add(index.encode('utf-8'))
+        self.ids.add(index)
         self.index += 1
         return index
 
@@ -1632,20 +1632,29 @@ class IdFinder:
 #
 #-------------------------------------------------------------------------
 class IdMapper:
+    """
+    Map the IDs of a GEDCOM file to GRAMPS' IDs, keeping the ID where it
+    is not in the database, nor given out earlier in the import.
 
+    The IDs given out are kept in a set, so that each lookup takes the
+    same time however many records came before. The database is still
+    asked about the rest, as it gives IDs to objects added without one.
+    """
     def __init__(self, trans, find_next, id2user_format):
         self.trans = trans
         self.find_next = find_next
         self.id2user_format = id2user_format
         self.swap = {}
+        self.taken = set()
 
     def __getitem__(self, gid):
         if gid == "":
             # We need to find the next GID provided it is not already
             # the target of a swap
             new_val = self.find_next()
-            while new_val in list(self.swap.values()):
+            while new_val in self.taken:
                 new_val = self.find_next()
+            self.taken.add(new_val)
         else:
             # remove any @ signs
             gid = self.clean(gid)
@@ -1662,16 +1671,17 @@ class IdMapper:
                 bformatted_gid = formatted_gid
                 if isinstance(bformatted_gid, str):
                     bformatted_gid = bformatted_gid.encode('utf-8')
-                if self.trans.get(bformatted_gid) or \
-                        (formatted_gid in list(self.swap.values())):
+                if (formatted_gid in self.taken or
+                        self.trans.get(bformatted_gid)):
                     new_val = self.find_next()
-                    while new_val in list(self.swap.values()):
+                    while new_val in self.taken:
                         new_val = self.find_next()
                 else:
                     new_val = formatted_gid
             # we need to distinguish between I1 and I0001, so we record the map
             # from the original format
             self.swap[gid] = new_val
+            self.taken.add(new_val)
         return new_val
 
     def clean(self, gid):
@@ -1696,7 +1706,6 @@ class GedcomParser(UpdateCallback):
 
     __TRUNC_MSG = _("Your GEDCOM file is corrupted. "
                     "It appears to have been truncated.")
-    _EMPTY_LOC = Location().to_struct()
 
     SyntaxError = "Syntax Error"
     BadFile = "Not a GEDCOM file"
@@ -2563,16 +2572,6 @@ class GedcomParser(UpdateCallback):
             }
         self.func_list.append(self.note_parse_tbl)
 
-        # look for existing place titles, build a map
-        self.place_names = defaultdict(list)
-        cursor = dbase.get_place_cursor()
-        data = next(cursor)
-        while data:
-            (handle, val) = data
-            self.place_names[val[2]].append(handle)
-            data = next(cursor)
-        cursor.close()
-
         enc = stage_one.get_encoding()
 
         if enc == "ANSEL":
@@ -2802,45 +2801,23 @@ class GedcomParser(UpdateCallback):
             self.dbase.add_note(note, self.trans)
         return note
 
-    def __loc_is_empty(self, location):
-        """
-        Determines whether a location is empty.
-
-        @param location: The current location
-        @type location: gen.lib.Location
-        @return True of False
-        """
-        if location is None:
-            return True
-        elif location.to_struct() == self._EMPTY_LOC:
-            return True
-        elif location.is_empty():
-            return True
-        return False
-
     def __find_place(self, title, location, placeref_list):
         """
-        Finds an existing place based on the title and primary location.
+        Finds an existing place based on the title, primary location and
+        enclosing places, in the PlaceIndex of the place_import.
 
         @param title: The place title
         @type title: string
         @param location: The current location
         @type location: gen.lib.Location
+        @param placeref_list: The enclosing places
+        @type placeref_list: list of gen.lib.PlaceRef
         @return gen.lib.Place
         """
-        for place_handle in self.place_names[title]:
-            place = self.dbase.get_place_from_handle(place_handle)
-            if place.get_title() == title:
-                if self.__loc_is_empty(location) and \
-                   self.__loc_is_empty(self.__get_first_loc(place)) and \
-                   place.get_placeref_list() == placeref_list:
-                    return place
-                elif (not self.__loc_is_empty(location) and \
-                      not self.__loc_is_empty(self.__get_first_loc(place)) and
-                      self.__get_first_loc(place).is_equivalent(location) == IDENTICAL) and \
-                      place.get_placeref_list() == placeref_list:
-                    return place
-        return None
+        handle = self.place_import.places.find(title, location, placeref_list)
+        if handle is None:
+            return None
+        return self.dbase.get_place_from_handle(handle)
 
     def __add_place(self, event, sub_state):
         """
@@ -2866,13 +2843,17 @@ class GedcomParser(UpdateCallback):
                 # if 'location was created, then store it, now that we have a handle.
                 if location:
                     self.place_import.store_location(location, place.handle)
-                self.place_names[place.get_title()].append(place.get_handle())
+                self.place_import.places.add(place)
                 event.set_place_handle(place.get_handle())
             else:
+                data = place.to_struct()
                 place.merge(sub_state.place)
                 place_title = _pd.display(self.dbase, place)
                 location = sub_state.pf.load_place(self.place_import, place, place_title)
-                self.dbase.commit_place(place, self.trans)
+                # places are referred to again and again; write only changes:
+                if place.to_struct() != data:
+                    self.dbase.commit_place(place, self.trans)
+                    self.place_import.places.add(place)
                 if location:
                     self.place_import.store_location(location, place.handle)
                 event.set_place_handle(place.get_handle())
@@ -3803,7 +3784,8 @@ class GedcomParser(UpdateCallback):
         event = line.data
         event.set_gid(self.emapper.find_next())
         event_ref = EventRef()
-        self.dbase.add_event(event, self.trans)
+        # written once, by commit_event below:
+        event.set_handle(create_id())
 
         sub_state = CurrentState()
         sub_state.person = state.person
@@ -4494,7 +4476,7 @@ class GedcomParser(UpdateCallback):
                 place.set_title(title)
                 place.name.set_value(title)
                 self.dbase.add_place(place, self.trans)
-                self.place_names[place.get_title()].append(place.get_handle())
+                self.place_import.places.add(place)
             else:
                 pass
             state.lds_ord.set_place_handle(place.handle)
@@ -4854,7 +4836,8 @@ class GedcomParser(UpdateCallback):
         event.set_gid(self.emapper.find_next())
         event_ref = EventRef()
         event_ref.set_role(EventRoleType.FAMILY)
-        self.dbase.add_event(event, self.trans)
+        # written once, by commit_event below:
+        event.set_handle(create_id())
 
         sub_state = CurrentState()
         sub_state.person = state.person
@@ -4909,7 +4892,8 @@ class GedcomParser(UpdateCallback):
         # in case a description ever shows up
         if line.data and line.data != 'Y':
             event.set_description(line.data)
-        self.dbase.add_event(event, self.trans)
+        # written once, by commit_event below:
+        event.set_handle(create_id())
 
         sub_state = CurrentState()
         sub_state.person = state.person
@@ -5542,10 +5526,11 @@ class GedcomParser(UpdateCallback):
             if place is None:
                 place = state.place
                 self.dbase.add_place(place, self.trans)
-                self.place_names[place.get_title()].append(place.get_handle())
+                self.place_import.places.add(place)
             else:
                 place.merge(state.place)
                 self.dbase.commit_place(place, self.trans)
+                self.place_import.places.add(place)
             place_title = _pd.display(self.dbase, place)
             state.pf.load_place(self.place_import, place, place_title)
 
@@ -7620,7 +7605,8 @@ class GedcomParser(UpdateCallback):
 
         if description and description != 'Y':
             event.set_description(description)
-        self.dbase.add_event(event, self.trans)
+        # written once, by commit_event below:
+        event.set_handle(create_id())
 
         sub_state = CurrentState()
         sub_state.level = state.level + 1
@@ -7648,7 +7634,8 @@ class GedcomParser(UpdateCallback):
         if description and description != 'Y':
             event.set_description(description)
 
-        self.dbase.add_event(event, self.trans)
+        # written once, by commit_event below:
+        event.set_handle(create_id())
 
         sub_state = CurrentState()
         sub_state.family = state.family
@@ -21,7 +21,7 @@
 """
 Helper class for importing places.
 """
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 
 #-------------------------------------------------------------------------
 #
@@ -30,6 +30,78 @@ from collections import OrderedDict
 #-------------------------------------------------------------------------
 from gprime.lib import Place, PlaceName, PlaceType, PlaceRef
 
+#-------------------------------------------------------------------------
+#
+# PlaceIndex class
+#
+#-------------------------------------------------------------------------
+def get_fingerprint(title, location, placeref_list):
+    """
+    Return what identifies a place when importing: its title and its first
+    alternate location (None when empty). Places enclosed by other places
+    are kept apart, as the importers always did, and have no fingerprint.
+    """
+    if placeref_list is None or placeref_list:
+        return None
+    if location is None or location.is_empty():
+        location = None
+    else:
+        location = tuple(sorted(location.to_struct().items()))
+    return (title, location)
+
+class PlaceIndex:
+    """
+    The handles of the places of the database, by fingerprint, so that
+    finding a place again is a single lookup, whatever the number of
+    places with the same title.
+
+    The places of the database are read once, when first needed; places
+    added or changed during the import are given to add().
+    """
+    def __init__(self, db):
+        self.db = db
+        self.handles = None
+        self.fingerprints = {}
+
+    def load(self):
+        self.handles = defaultdict(list)
+        for place in self.db.iter_places():
+            self.add(place)
+
+    def add(self, place):
+        """
+        Index a place that was added or changed.
+        """
+        if self.handles is None:
+            self.load()
+        locations = place.get_alternate_locations()
+        fingerprint = get_fingerprint(place.get_title(),
+                                      locations[0] if locations else None,
+                                      place.get_placeref_list())
+        old = self.fingerprints.get(place.handle)
+        if old == fingerprint:
+            return
+        if old is not None:
+            self.handles[old].remove(place.handle)
+        if fingerprint is None:
+            self.fingerprints.pop(place.handle, None)
+        else:
+            self.handles[fingerprint].append(place.handle)
+            self.fingerprints[place.handle] = fingerprint
+
+    def find(self, title, location, placeref_list):
+        """
+        Return the handle of the first place indexed with the title,
+        location and enclosing places, or None.
+        """
+        if self.handles is None:
+            self.load()
+        fingerprint = get_fingerprint(title, location, placeref_list)
+        if fingerprint is None:
+            return None
+        handles = self.handles.get(fingerprint)
+        return handles[0] if handles else None
+
 #-------------------------------------------------------------------------
 #
 # PlaceImport class
@@ -43,6 +115,7 @@ class PlaceImport:
         self.db = db
         self.loc2handle = {}
         self.handle2loc = OrderedDict()
+        self.places = PlaceIndex(db)
 
     def store_location(self, location, handle):
         """
@@ -100,6 +173,8 @@ class PlaceImport:
                 placeref.ref = parent
                 place.set_placeref_list([placeref])
                 self.db.commit_place(place, trans, place.get_change_time())
+                if self.places.handles is not None:
+                    self.places.add(place)
 
     def __add_place(self, name, type_num, parent, title, trans):
         """
@@ -117,4 +192,6 @@ class PlaceImport:
             place.set_placeref_list([placeref])
         handle = self.db.add_place(place, trans)
         self.db.commit_place(place, trans)
+        if self.places.handles is not None:
+            self.places.add(place)
         return handle
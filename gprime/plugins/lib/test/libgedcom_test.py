@@ -0,0 +1,246 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+""" Tests for the GEDCOM import """
+
+import os
+import re
+import sys
+import glob
+import time
+import unittest
+from unittest import mock
+
+from gprime.db import make_database
+from gprime.db.dbconst import EVENT_KEY
+from gprime.lib import Person, Event
+from gprime.cli.user import User
+from gprime.const import DATA_DIR
+from gprime.config import config
+from gprime.utils.id import create_id
+from gprime.plugins.lib import libgedcom
+from gprime.plugins.lib.libgedcom import IdFinder, IdMapper, GedcomParser
+from gprime.plugins.importer.importgedcom import importData
+
+TEST_DIR = os.path.abspath(os.path.join(DATA_DIR, "tests"))
+LINK = re.compile(r"(gramps://\w+/handle/)(\w+)")
+TABLES = ['Person', 'Family', 'Source', 'Citation', 'Event', 'Media',
+          'Place', 'Repository', 'Note', 'Tag']
+
+def old_create_id():
+    """
+    How the parser wrote an event before it was written once: added to
+    the database as soon as made, and committed again when parsed.
+    """
+    caller = sys._getframe(1).f_locals
+    event = caller.get("event")
+    parser = caller.get("self")
+    if (isinstance(parser, GedcomParser) and isinstance(event, Event) and
+            not event.handle):
+        return parser.dbase.add_event(event, parser.trans)
+    return create_id()
+
+def old_add_place(self, event, sub_state):
+    """
+    How the parser added a place before: committing a place found again
+    whether or not it changed.
+    """
+    if sub_state.place:
+        place = self._GedcomParser__find_place(
+            sub_state.place.get_title(),
+            self._GedcomParser__get_first_loc(sub_state.place),
+            sub_state.place.get_placeref_list())
+        if place is None:
+            place = sub_state.place
+            place_title = libgedcom._pd.display(self.dbase, place)
+            location = sub_state.pf.load_place(self.place_import, place,
+                                               place_title)
+            self.dbase.add_place(place, self.trans)
+            if location:
+                self.place_import.store_location(location, place.handle)
+            self.place_import.places.add(place)
+            event.set_place_handle(place.get_handle())
+        else:
+            place.merge(sub_state.place)
+            place_title = libgedcom._pd.display(self.dbase, place)
+            location = sub_state.pf.load_place(self.place_import, place,
+                                               place_title)
+            self.dbase.commit_place(place, self.trans)
+            self.place_import.places.add(place)
+            if location:
+                self.place_import.store_location(location, place.handle)
+            event.set_place_handle(place.get_handle())
+
+def replace_handles(struct, keys):
+    """
+    Return the struct without change times, and with the handles
+    replaced by the keys of their objects.
+    """
+    if isinstance(struct, dict):
+        return {name: replace_handles(value, keys)
+                for (name, value) in struct.items() if name != "change"}
+    elif isinstance(struct, (list, tuple)):
+        return [replace_handles(value, keys) for value in struct]
+    elif struct in keys:
+        return keys[struct]
+    elif isinstance(struct, str):
+        # as in the links of notes:
+        return LINK.sub(lambda match: "%s%s" % (match.group(1),
+                                                keys.get(match.group(2))),
+                        struct)
+    return struct
+
+class IdFinderTest(unittest.TestCase):
+
+    def test_find_next(self):
+        # the keys may be bytes, as of the BSDDB databases:
+        finder = IdFinder([b"E0000", "E0002"], "E%04d")
+        self.assertEqual([finder.find_next() for i in range(3)],
+                         ["E0001", "E0003", "E0004"])
+        self.assertEqual(finder.ids,
+                         set(["E0000", "E0001", "E0002", "E0003", "E0004"]))
+
+    def test_database(self):
+        db = make_database("inmemorydb")
+        db.load(None)
+        with db.get_transaction_class()("Test", db, batch=True) as trans:
+            for gid in ["E0000", "E0001", "E0003"]:
+                event = Event()
+                event.gid = gid
+                db.add_event(event, trans)
+        finder = IdFinder(db.get_gids(EVENT_KEY), db.event_prefix)
+        self.assertEqual([finder.find_next() for i in range(2)],
+                         ["E0002", "E0004"])
+
+class IdMapperTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_database("inmemorydb")
+        self.db.load(None)
+        self.mapper = self.make_mapper()
+
+    def make_mapper(self):
+        return IdMapper(self.db.id_trans, self.db.find_next_person_gid,
+                        self.db.id2user_format)
+
+    def add_person(self, gid):
+        person = Person()
+        person.gid = gid
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            self.db.add_person(person, trans)
+
+    def test_keep(self):
+        # a free ID is kept, formatted, and found again:
+        self.assertEqual(self.mapper["@I5@"], "I0005")
+        self.assertEqual(self.mapper["I5"], "I0005")
+        self.assertEqual(self.mapper["@I0007@"], "I0007")
+        self.assertEqual(self.mapper.map(), {"I5": "I0005", "I0007": "I0007"})
+
+    def test_taken(self):
+        # I1 and I0001 both format as I0001, and the second gets a new ID:
+        self.assertEqual(self.mapper["@I0001@"], "I0001")
+        self.assertEqual(self.mapper["@I1@"], "I0000")
+        self.assertEqual(self.mapper["@I0001@"], "I0001")
+        self.assertEqual(self.mapper["@I1@"], "I0000")
+        # and a new ID is not one given out earlier in the import:
+        self.assertEqual(self.mapper["@I0002@"], "I0002")
+        self.assertEqual(self.mapper["@I2@"], "I0003")
+        self.assertEqual(len(set(self.mapper.map().values())), 4)
+
+    def test_database(self):
+        self.add_person("I0001")
+        self.add_person("I0002")
+        mapper = self.make_mapper()
+        self.assertEqual(mapper["@I1@"], "I0000")
+        self.assertEqual(mapper["@I0002@"], "I0003")
+        self.assertEqual(mapper["@I0004@"], "I0004")
+        self.assertEqual(mapper["@I3@"], "I0005")
+
+    def test_no_gid(self):
+        # records without an ID get new ones, not given out to the others:
+        self.assertEqual(self.mapper["@I0000@"], "I0000")
+        self.assertEqual(self.mapper[""], "I0001")
+        self.assertEqual(self.mapper[""], "I0002")
+        self.assertEqual(self.mapper["@I0003@"], "I0003")
+        self.assertEqual(self.mapper[""], "I0004")
+        self.assertEqual(self.mapper.map(), {"I0000": "I0000",
+                                             "I0003": "I0003"})
+
+    def test_clean(self):
+        self.assertEqual(self.mapper.clean(" @I1@ "), "I1")
+        self.assertEqual(self.mapper.clean("@"), "@")
+        self.assertEqual(self.mapper.clean("I1"), "I1")
+
+class GedcomImportTest(unittest.TestCase):
+
+    def setUp(self):
+        # the notes of a submission are cited by the default source:
+        default_source = config.get('preferences.default-source')
+        config.set('preferences.default-source', True)
+        self.addCleanup(config.set, 'preferences.default-source',
+                        default_source)
+
+    def import_file(self, filename):
+        """
+        Import the file, and return its objects by table and GID (name of
+        tags), with the number of events and places written.
+        """
+        db = make_database("inmemorydb")
+        db.load(None)
+        with mock.patch.object(db, "commit_event",
+                               wraps=db.commit_event) as commit_event, \
+             mock.patch.object(db, "commit_place",
+                               wraps=db.commit_place) as commit_place, \
+             mock.patch.object(time, "localtime",
+                               return_value=time.localtime(0)):
+            # the notes about missing objects tell the time of the import
+            importData(db, filename, User())
+        keys = {}
+        structs = {}
+        for table in TABLES:
+            for handle in db.get_table_func(table, "handles_func")():
+                obj = db.get_table_func(table, "handle_func")(handle)
+                key = (table, obj.name if table == "Tag" else obj.gid)
+                keys[obj.handle] = key
+                structs[key] = obj.to_struct()
+        objects = {key: replace_handles(struct, keys)
+                   for (key, struct) in structs.items()}
+        return (objects, commit_event.call_count, commit_place.call_count)
+
+    def test_unchanged(self):
+        filenames = sorted(glob.glob(os.path.join(TEST_DIR, "*.ged")))
+        self.assertTrue(filenames)
+        for filename in filenames:
+            (objects, events, places) = self.import_file(filename)
+            with mock.patch.object(libgedcom, "create_id", old_create_id), \
+                 mock.patch.object(GedcomParser,
+                                   "_GedcomParser__add_place", old_add_place):
+                (old_objects, old_events, old_places) = \
+                    self.import_file(filename)
+            name = os.path.basename(filename)
+            self.assertEqual(objects, old_objects, name)
+            # each event is written once:
+            self.assertEqual(events, len([key for key in objects
+                                          if key[0] == "Event"]), name)
+            self.assertLessEqual(places, old_places, name)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+""" Tests for the index of places found again while importing """
+
+import unittest
+
+from gprime.db import make_database
+from gprime.lib import Place, Location, PlaceRef
+from gprime.lib.const import IDENTICAL
+from gprime.plugins.lib.libplaceimport import PlaceIndex, get_fingerprint
+
+def make_location(city, country="USA"):
+    location = Location()
+    location.set_city(city)
+    location.set_country(country)
+    return location
+
+def loc_is_empty(location):
+    return location is None or location.is_empty()
+
+def old_find(db, title, location, placeref_list):
+    """
+    How the GEDCOM importer found a place again before the PlaceIndex:
+    comparing every place with the same title.
+    """
+    for place in db.iter_places():
+        if place.get_title() != title:
+            continue
+        locations = place.get_alternate_locations()
+        first = locations[0] if locations else None
+        if place.get_placeref_list() != placeref_list:
+            continue
+        if loc_is_empty(location) and loc_is_empty(first):
+            return place.handle
+        elif (not loc_is_empty(location) and not loc_is_empty(first) and
+              first.is_equivalent(location) == IDENTICAL):
+            return place.handle
+    return None
+
+class PlaceIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_database("inmemorydb")
+        self.db.load(None)
+        self.places = {}
+        self.add_place("plain", "Springfield")
+        self.add_place("empty", "Springfield", Location())
+        self.add_place("ohio", "Springfield", make_location("Springfield"))
+        self.add_place("illinois", "Springfield",
+                       make_location("Springfield", "Illinois"))
+        parent = self.add_place("parent", "Ohio")
+        placeref = PlaceRef()
+        placeref.ref = parent.handle
+        self.add_place("enclosed", "Dayton", placeref_list=[placeref])
+
+    def add_place(self, name, title, location=None, placeref_list=None):
+        place = Place()
+        place.set_title(title)
+        place.name.set_value(title)
+        if location is not None:
+            place.add_alternate_locations(location)
+        if placeref_list:
+            place.set_placeref_list(placeref_list)
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            self.db.add_place(place, trans)
+        self.places[name] = place
+        return place
+
+    def test_find(self):
+        index = PlaceIndex(self.db)
+        cases = [
+            ("Springfield", None, []),
+            ("Springfield", Location(), []),
+            ("Springfield", make_location("Springfield"), []),
+            ("Springfield", make_location("Springfield", "Illinois"), []),
+            ("Springfield", make_location("Springfield", "Oregon"), []),
+            ("Springfield", make_location("Shelbyville"), []),
+            ("Shelbyville", make_location("Springfield"), []),
+            ("Ohio", None, []),
+            ]
+        for (title, location, placeref_list) in cases:
+            self.assertEqual(index.find(title, location, placeref_list),
+                             old_find(self.db, title, location, placeref_list),
+                             (title, location and location.to_struct()))
+        # an empty location is as none, and the first place is found:
+        self.assertEqual(index.find("Springfield", Location(), []),
+                         self.places["plain"].handle)
+        self.assertEqual(index.find("Springfield",
+                                    make_location("Springfield"), []),
+                         self.places["ohio"].handle)
+        self.assertEqual(index.find("Springfield",
+                                    make_location("Springfield", "Illinois"),
+                                    []),
+                         self.places["illinois"].handle)
+        self.assertIsNone(index.find("Springfield",
+                                     make_location("Springfield", "Oregon"),
+                                     []))
+
+    def test_never_found(self):
+        index = PlaceIndex(self.db)
+        enclosed = self.places["enclosed"]
+        # places within other places:
+        self.assertIsNone(index.find("Dayton", None,
+                                     enclosed.get_placeref_list()))
+        self.assertIsNone(old_find(self.db, "Dayton", None,
+                                   enclosed.get_placeref_list()))
+        self.assertIsNone(index.find("Dayton", None, []))
+        self.assertIsNone(get_fingerprint("Dayton", None,
+                                          enclosed.get_placeref_list()))
+        self.assertNotIn(enclosed.handle, index.fingerprints)
+        # nor LDS places, which have no enclosing places to compare:
+        self.assertIsNone(index.find("Springfield", None, None))
+        self.assertIsNone(old_find(self.db, "Springfield", None, None))
+        self.assertIsNone(get_fingerprint("Springfield", None, None))
+
+    def test_add(self):
+        index = PlaceIndex(self.db)
+        self.assertEqual(index.find("Shelbyville", None, []), None)
+        place = self.add_place("new", "Shelbyville")
+        index.add(place)
+        self.assertEqual(index.find("Shelbyville", None, []), place.handle)
+        # a merge gives it a first location, under which it is found:
+        other = Place()
+        other.add_alternate_locations(make_location("Shelbyville"))
+        place.merge(other)
+        with self.db.get_transaction_class()("Test", self.db,
+                                             batch=True) as trans:
+            self.db.commit_place(place, trans)
+        index.add(place)
+        self.assertIsNone(index.find("Shelbyville", None, []))
+        self.assertEqual(index.find("Shelbyville",
+                                    make_location("Shelbyville"), []),
+                         place.handle)
+        self.assertEqual(index.find("Shelbyville",
+                                    make_location("Shelbyville"), []),
+                         old_find(self.db, "Shelbyville",
+                                  make_location("Shelbyville"), []))
+        # and enclosed in another, it is no longer found:
+        placeref = PlaceRef()
+        placeref.ref = self.places["parent"].handle
+        place.set_placeref_list([placeref])
+        index.add(place)
+        self.assertIsNone(index.find("Shelbyville",
+                                     make_location("Shelbyville"), []))
+        self.assertNotIn(place.handle, index.fingerprints)
+        # adding a place again does not index it twice:
+        index.add(self.places["ohio"])
+        self.assertEqual(index.handles[index.fingerprints[
+            self.places["ohio"].handle]], [self.places["ohio"].handle])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -31,7 +31,7 @@ Proxy class for the Gramps databases. Apply filter
 #
 #-------------------------------------------------------------------------
 from gprime.db.base import sort_objects
-from .proxybase import ProxyDbBase
+from .proxybase import ProxyDbBase, PREFETCH_BATCH_SIZE
 from ..lib import (Date, Person, Name, Surname, NameOriginType, Family, Source,
                    Citation, Event, Media, Place, Repository, Note, Tag)
 
@@ -68,11 +68,13 @@ class FilterProxyDb(ProxyDbBase):
             self.nlist = set(self.db.iter_note_handles())
 
         self.flist = set()
-        for handle in self.plist:
-            person = self.db.get_person_from_handle(handle)
-            if person:
-                self.flist.update(person.get_family_handle_list())
-                self.flist.update(person.get_parent_family_handle_list())
+        plist = list(self.plist)
+        for i in range(0, len(plist), PREFETCH_BATCH_SIZE):
+            for person in self.db.get_people_from_handles(
+                    plist[i:i + PREFETCH_BATCH_SIZE]):
+                if person:
+                    self.flist.update(person.get_family_handle_list())
+                    self.flist.update(person.get_parent_family_handle_list())
         self.__tables = {
             'Person':
             {
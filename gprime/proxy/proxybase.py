@@ -39,6 +39,10 @@ from ..db.base import DbReadBase, DbWriteBase, sort_objects
 from ..lib import (Citation, Event, Family, Media, Note, Person, Place,
                    Repository, Source, Tag)
 
+# Number of objects read ahead from the underlying database by
+# get_from_handles:
+PREFETCH_BATCH_SIZE = 1000
+
 class ProxyCursor:
     """
     A cursor for moving through proxied data.
@@ -498,6 +502,14 @@ class ProxyDbBase(DbReadBase):
         """
         return filter(self.include_tag, self.db.iter_tag_handles())
 
+    def iter_handles_by_gid(self, table):
+        """
+        Return an iterator over the handles of a primary table, ordered by
+        GID, of the objects included by the proxy.
+        """
+        return filter(getattr(self, "include_" + table.lower()),
+                      self.db.iter_handles_by_gid(table))
+
     def __iter_object(self, selector, method, order_by=None):
         """ Helper function to return an iterator over an object class """
         retval = filter(lambda obj:
@@ -578,6 +590,29 @@ class ProxyDbBase(DbReadBase):
         return self.__iter_object(self.include_tag,
                                   self.db.iter_tags, order_by)
 
+    def get_from_handles(self, table, handles):
+        """
+        Return a list of the objects of the table with the given handles,
+        in the same order, as returned by this proxy. The objects are read
+        from the real database in batches, then passed through the proxy
+        one at a time.
+        """
+        handle_func = self.get_table_func(table, "handle_func")
+        handles = list(handles)
+        objects = []
+        for i in range(0, len(handles), PREFETCH_BATCH_SIZE):
+            batch = handles[i:i + PREFETCH_BATCH_SIZE]
+            self.basedb.prefetch(table, batch)
+            objects.extend(handle_func(handle) for handle in batch)
+        return objects
+
+    def prefetch(self, table, handles):
+        """
+        Load the objects of the table with the given handles into the
+        cache of the real database.
+        """
+        self.basedb.prefetch(table, handles)
+
     @staticmethod
     def gfilter(predicate, obj):
         """
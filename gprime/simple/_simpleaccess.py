@@ -23,6 +23,8 @@
 """
 Provide a simplified database access interface to the Gramps database.
 """
+from itertools import islice
+
 from ..lib import (Person, Family, Event, Source, Place, Citation,
                    Media, Repository, Note, Date, Tag)
 from ..lib.handle import HandleClass
@@ -37,6 +39,9 @@ from ..config import config
 from ..const import LOCALE as glocale
 _ = glocale.translation.gettext
 
+# Number of objects read at a time by the all_* iterators:
+FETCH_BATCH_SIZE = 1000
+
 #-------------------------------------------------------------------------
 #
 # Local functions
@@ -382,8 +387,8 @@ class SimpleAccess:
                 if family:
                     reflist = family.get_event_ref_list()
                     if reflist:
-                        elist = [ self.dbase.get_event_from_handle(ref.ref)
-                                  for ref in reflist ]
+                        elist = self.dbase.get_events_from_handles(
+                            [ref.ref for ref in reflist])
                         events = [ evnt for evnt in elist
                                    if event.type == EventType.MARRIAGE ]
                         if events:
@@ -413,8 +418,8 @@ class SimpleAccess:
                 if family:
                     reflist = family.get_event_ref_list()
                     if reflist:
-                        elist = [ self.dbase.get_event_from_handle(ref.ref)
-                                  for ref in reflist ]
+                        elist = self.dbase.get_events_from_handles(
+                            [ref.ref for ref in reflist])
                         events = [ evnt for evnt in elist
                                    if event.type == EventType.MARRIAGE ]
                         if events:
@@ -441,11 +446,11 @@ class SimpleAccess:
                 family_id = family_handle_list[0]
                 family = self.dbase.get_family_from_handle(family_id)
 
-                return [ self.dbase.get_person_from_handle(hndl.ref)
-                         for hndl in family.get_child_ref_list() ]
+                return self.dbase.get_people_from_handles(
+                    [hndl.ref for hndl in family.get_child_ref_list()])
         elif isinstance(obj, Family):
-            return [ self.dbase.get_person_from_handle(hndl.ref)
-                     for hndl in obj.get_child_ref_list() ]
+            return self.dbase.get_people_from_handles(
+                [hndl.ref for hndl in obj.get_child_ref_list()])
         return []
 
     def father(self, obj):
@@ -693,8 +698,7 @@ class SimpleAccess:
 
         if obj:
             event_handles = [ ref.ref for ref in obj.get_event_ref_list() ]
-            events = [ self.dbase.get_event_from_handle(h)
-                       for h in event_handles ]
+            events = self.dbase.get_events_from_handles(event_handles)
             if restrict:
                 restrict = [ r.lower() for r in restrict ]
                 events = [ event for event in events
@@ -717,7 +721,7 @@ class SimpleAccess:
 
         if obj:
             handles = [ ref.ref for ref in obj.get_source_references() ]
-            return list(map(self.dbase.get_source_from_handle, handles))
+            return self.dbase.get_sources_from_handles(handles)
         else:
             return []
 
@@ -736,8 +740,8 @@ class SimpleAccess:
         assert(person is None or isinstance(person, Person))
 
         if person:
-            return [ self.dbase.get_family_from_handle(handle)
-                     for handle in person.get_family_handle_list() ]
+            return self.dbase.get_families_from_handles(
+                person.get_family_handle_list())
         return []
 
     def child_in(self, person):
@@ -755,11 +759,11 @@ class SimpleAccess:
         assert(person is None or isinstance(person, Person))
 
         if person:
-            return [ self.dbase.get_family_from_handle(handle)
-                     for handle in person.get_parent_family_handle_list() ]
+            return self.dbase.get_families_from_handles(
+                person.get_parent_family_handle_list())
         return []
 
-    def __all_objects(self, gen_cursor, get_object):
+    def __all_objects(self, gen_cursor, table):
         """
         Return a all the objects of a particular type in the database, one
         at a time as an iterator. The user can treat this just like a list.
@@ -769,8 +773,12 @@ class SimpleAccess:
         """
 
         with gen_cursor() as cursor:
-            for key, data in cursor:
-                yield get_object(key)
+            cursor = iter(cursor)
+            while True:
+                keys = [key for key, data in islice(cursor, FETCH_BATCH_SIZE)]
+                if not keys:
+                    break
+                yield from self.dbase.get_from_handles(table, keys)
 
     def all_people(self):
         """
@@ -788,9 +796,9 @@ class SimpleAccess:
             # data[3] is primary_name; data[3][5][0][0] is surname
             slist = sorted((data[3][5][0][0], key) for key, data in cursor)
 
-        for info in slist:
-            obj = self.dbase.get_person_from_handle(info[1])
-            yield obj
+        for i in range(0, len(slist), FETCH_BATCH_SIZE):
+            yield from self.dbase.get_people_from_handles(
+                [info[1] for info in slist[i:i + FETCH_BATCH_SIZE]])
 
     def all_families(self):
         """
@@ -804,7 +812,7 @@ class SimpleAccess:
         :rtype: list
         """
         return self.__all_objects(self.dbase.get_family_cursor,
-                                  self.dbase.get_family_from_handle)
+                                  "Family")
 
     def all_events(self):
         """
@@ -818,7 +826,7 @@ class SimpleAccess:
         :rtype: list
         """
         return self.__all_objects(self.dbase.get_event_cursor,
-                                  self.dbase.get_event_from_handle)
+                                  "Event")
 
     def all_sources(self):
         """
@@ -829,7 +837,7 @@ class SimpleAccess:
         :rtype: list
         """
         return self.__all_objects(self.dbase.get_source_cursor,
-                                  self.dbase.get_source_from_handle)
+                                  "Source")
 
     def all_citations(self):
         """
@@ -840,7 +848,7 @@ class SimpleAccess:
         :rtype: list
         """
         return self.__all_objects(self.dbase.get_citation_cursor,
-                                  self.dbase.get_citation_from_handle)
+                                  "Citation")
 
     def all_repositories(self):
         """
@@ -851,7 +859,7 @@ class SimpleAccess:
         :rtype: list
         """
         return self.__all_objects(self.dbase.get_repository_cursor,
-                                  self.dbase.get_repository_from_handle)
+                                  "Repository")
 
     def all_media(self):
         """
@@ -862,7 +870,7 @@ class SimpleAccess:
         :rtype: list
         """
         return self.__all_objects(self.dbase.get_media_cursor,
-                                  self.dbase.get_media_from_handle)
+                                  "Media")
 
     def all_places(self):
         """
@@ -873,7 +881,7 @@ class SimpleAccess:
         :rtype: list
         """
         return self.__all_objects(self.dbase.get_place_cursor,
-                                  self.dbase.get_place_from_handle)
+                                  "Place")
 
     def all_notes(self):
         """
@@ -884,7 +892,7 @@ class SimpleAccess:
         :rtype: list
         """
         return self.__all_objects(self.dbase.get_note_cursor,
-                                  self.dbase.get_note_from_handle)
+                                  "Note")
 
     def all_tags(self):
         """
@@ -895,7 +903,7 @@ class SimpleAccess:
         :rtype: list
         """
         return self.__all_objects(self.dbase.get_tag_cursor,
-                                  self.dbase.get_tag_from_handle)
+                                  "Tag")
 
     def title(self, source):
         """
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Time the mapping of the IDs of a synthetic GEDCOM file to GRAMPS' IDs,
+as the GEDCOM import does for each record: half of the records have
+IDs that collide once formatted (I1 and I0001), and every tenth has no
+ID, so both the kept and the newly found IDs are timed. The time per
+record should stay the same as the records grow.
+
+    PYTHONPATH=. python3 scripts/benchmark_gedcom_ids.py [RECORDS ...]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from gprime.db import make_database
+from gprime.plugins.lib.libgedcom import IdMapper
+
+def write_gedcom(filename, count):
+    with open(filename, "w") as fp:
+        fp.write("0 HEAD\n1 CHAR UTF-8\n")
+        for i in range(count):
+            if i % 10 == 9:
+                fp.write("0 INDI\n")
+            elif i % 2:
+                fp.write("0 @I%d@ INDI\n" % (i // 2))
+            else:
+                fp.write("0 @I%04d@ INDI\n" % (i // 2))
+            fp.write("1 NAME Person /Number%d/\n" % i)
+        fp.write("0 TRLR\n")
+
+def read_ids(filename):
+    ids = []
+    with open(filename) as fp:
+        for line in fp:
+            if line.startswith("0 @"):
+                ids.append(line.split()[1])
+            elif line.startswith("0 INDI"):
+                ids.append("")
+    return ids
+
+def main(sizes):
+    database = make_database("inmemorydb")
+    database.load(None)
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "synthetic.ged")
+    try:
+        for count in sizes:
+            write_gedcom(filename, count)
+            ids = read_ids(filename)
+            mapper = IdMapper(database.id_trans,
+                              database.find_next_person_gid,
+                              database.id2user_format)
+            database.pmap_index = 0
+            start = time.perf_counter()
+            for gid in ids:
+                mapper[gid]
+            seconds = time.perf_counter() - start
+            print("%8d records: %8.2f s %6.2f us/record" %
+                  (count, seconds, seconds / count * 1e6))
+    finally:
+        os.remove(filename)
+        os.rmdir(directory)
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000])
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2016 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Time Handle(), get_schema() and get_field() on handle fields.
+
+    PYTHONPATH=. python3 scripts/benchmark_handle.py [NUMBER]
+"""
+
+import sys
+import timeit
+
+from gprime.lib import (Person, Family, Event, Place, Source, Citation,
+                        Media, Repository, Note, Tag)
+from gprime.lib.handle import Handle
+
+def main(number):
+    classes = [Person, Family, Event, Place, Source, Citation, Media,
+               Repository, Note, Tag]
+    family = Family()
+    family.handle = "F0001"
+    family.father_handle = "I0001"
+    tests = [
+        ("Handle()", lambda: Handle("Person", "I0001")),
+        ("get_schema()", lambda: [cls.get_schema() for cls in classes]),
+        ("get_field()", lambda: family.get_field("father_handle")),
+    ]
+    for (name, func) in tests:
+        seconds = timeit.timeit(func, number=number)
+        print("%-14s %9.0f calls/s" % (name, number / seconds))
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Time the thumbnails of a gallery page requested at once: rendered one
+after another in the server (before), and by the ImageRenderer's pool of
+processes, with JPEG draft mode and requests for the same thumbnail
+sharing one rendering (after).
+
+    PYTHONPATH=. python3 scripts/benchmark_images.py [IMAGES [WORKERS]]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+from concurrent.futures import wait
+
+from PIL import Image
+
+from gprime.app.handlers.imagehandler import (FileSystemCacher, ImageRenderer,
+                                              THUMBNAIL_WIDTHS, JPEG_QUALITY,
+                                              get_thumbnail, render_image)
+
+# Each thumbnail is asked for this many times, as by pages open at once:
+REQUESTS_PER_THUMBNAIL = 2
+
+def make_images(directory, count):
+    filenames = []
+    for i in range(count):
+        filename = os.path.join(directory, "image%d.jpg" % i)
+        image = Image.linear_gradient("L").resize((3000, 2000)).convert("RGB")
+        image.save(filename, quality=JPEG_QUALITY)
+        filenames.append(filename)
+    return filenames
+
+def get_thumbnails(filenames):
+    thumbnails = []
+    for filename in filenames:
+        with Image.open(filename) as image:
+            thumbnail = get_thumbnail(os.path.basename(filename), image.size,
+                                      THUMBNAIL_WIDTHS[0])
+        thumbnails.append((filename,) + thumbnail)
+    return thumbnails * REQUESTS_PER_THUMBNAIL
+
+def before(thumbnails):
+    for (filename, path, box, size) in thumbnails:
+        with Image.open(filename) as image:
+            render_image(image, box, size, False, 0, "default", "JPEG",
+                         JPEG_QUALITY)
+
+def after(thumbnails, directory, workers):
+    cacher = FileSystemCacher(directory, 1024 * 1024 * 1024)
+    renderer = ImageRenderer(cacher, workers)
+    # start the worker processes, as the server has them running:
+    wait([renderer.pool.submit(time.sleep, 0) for i in range(workers)])
+    start = time.perf_counter()
+    futures = []
+    for (filename, path, box, size) in thumbnails:
+        source = os.stat(filename)
+        futures.append(renderer.render(cacher.make_key(filename, source, path),
+                                       filename, box, size))
+    wait(futures)
+    seconds = time.perf_counter() - start
+    metrics = renderer.get_metrics()
+    renderer.shutdown()
+    return (seconds, metrics)
+
+def main(count, workers):
+    directory = tempfile.mkdtemp()
+    try:
+        thumbnails = get_thumbnails(make_images(directory, count))
+        start = time.perf_counter()
+        before(thumbnails)
+        seconds = time.perf_counter() - start
+        print("%d requests, one after another: %6.2f s" %
+              (len(thumbnails), seconds))
+        (seconds, metrics) = after(thumbnails,
+                                   os.path.join(directory, "cache"), workers)
+        print("%d requests, %d processes:      %6.2f s "
+              "(%d rendered, %d shared)" %
+              (len(thumbnails), workers, seconds, metrics["rendered"],
+               metrics["coalesced"]))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 40,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 4)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2016 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Compare the json_data serializers: bytes stored per object, and objects
+encoded and decoded per second, on synthetic people or on the objects of
+a Gramps XML file.
+
+    PYTHONPATH=. python3 scripts/benchmark_serializer.py [PEOPLE | FILE]
+"""
+
+import gc
+import io
+import sys
+import time
+import contextlib
+
+from gprime.db import make_database
+from gprime.lib import (Person, Name, Surname, Event, EventRef, EventType,
+                        Attribute, Date)
+from gprime.plugins.db.dbapi.dbapi import PRIMARY_TABLES
+from gprime.plugins.db.dbapi.serializer import SERIALIZERS
+
+# Runs timed for each serializer:
+REPEAT = 5
+
+def make_people(db, count):
+    with db.get_transaction_class()("Benchmark", db, batch=True) as trans:
+        for i in range(count):
+            event = Event()
+            event.set_type(EventType.BIRTH)
+            event.set_date_object(Date(1800 + i % 200, 1 + i % 12, 1))
+            db.add_event(event, trans)
+            person = Person()
+            person.gid = "I%05d" % i
+            person.primary_name = Name()
+            person.primary_name.first_name = "Given%d" % i
+            person.primary_name.surname_list.append(Surname())
+            person.primary_name.surname_list[0].surname = "Surname%d" % (i % 50)
+            event_ref = EventRef()
+            event_ref.ref = event.handle
+            person.add_event_ref(event_ref)
+            attribute = Attribute()
+            attribute.set_value("Value%d" % i)
+            person.add_attribute(attribute)
+            db.add_person(person, trans)
+
+def import_file(db, filename):
+    from gprime.cli.user import User
+    from gprime.plugins.importer.importxml import importData
+    with contextlib.redirect_stdout(io.StringIO()):
+        importData(db, filename, User())
+
+def main(source):
+    db = make_database("inmemorydb")
+    db.load(None)
+    if source.isdigit():
+        make_people(db, int(source))
+    else:
+        import_file(db, source)
+    for name in sorted(SERIALIZERS):
+        db.set_serializer(name)
+        strings = []
+        for table in PRIMARY_TABLES:
+            strings.extend(row[0] for row in db.dbapi.iter_rows(
+                "SELECT json_data FROM %s;" % table.lower()))
+        count = len(strings)
+        size = sum(len(string) for string in strings)
+        serializer = db.serializer
+        structs = [serializer.string_to_data(string) for string in strings]
+        # the best of REPEAT runs, without the objects of earlier runs:
+        decode = encode = float("inf")
+        for run in range(REPEAT):
+            gc.collect()
+            start = time.perf_counter()
+            for string in strings:
+                serializer.string_to_data(string)
+            decode = min(decode, time.perf_counter() - start)
+            start = time.perf_counter()
+            for struct in structs:
+                serializer.data_to_string(struct)
+            encode = min(encode, time.perf_counter() - start)
+        del structs
+        print("%-10s %d objects %7.0f bytes/object %9.0f decoded/s "
+              "%9.0f encoded/s" %
+              (name, count, size / count, count / decode, count / encode))
+    db.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "2000")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+#
+# gPrime - A web-based genealogy program
+#
+# Copyright (C) 2017 gPrime Development Team
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Time the user settings that BaseHandler.get_template_dict, and the
+permission checks of a page, look up on each request: from the
+UserCache, after the user was changed (read from the database again),
+and making a Locale per request, as done before the UserCache.
+
+    PYTHONPATH=. python3 scripts/benchmark_user_data.py [NUMBER]
+"""
+
+import sys
+import timeit
+
+import gprime.const
+from gprime.db import make_database
+from gprime.utils.locale import Locale
+from gprime.app.users import UserCache
+
+USER = "tester"
+
+def request(cache):
+    data = cache.get(USER)
+    data["css"]
+    data["_"]("Person")
+    "edit" in data["permissions"]
+    "delete" in data["permissions"]
+
+def main(number):
+    database = make_database("inmemorydb")
+    database.load(None)
+    database.add_user(username=USER, password="",
+                      permissions={"add", "edit"}, data={"language": "fr"})
+    cache = UserCache(database)
+    def changed():
+        cache.clear(USER)
+        request(cache)
+    def uncached():
+        data = database.get_user_data(USER)
+        Locale(lang=data["language"]).translation.gettext("Person")
+    tests = [
+        ("cached", lambda: request(cache)),
+        ("changed", changed),
+        ("no cache", uncached),
+    ]
+    for (name, func) in tests:
+        seconds = timeit.timeit(func, number=number)
+        print("%-9s %8.2f us/request" % (name, seconds / number * 1e6))
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)